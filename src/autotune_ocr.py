@@ -0,0 +1,121 @@
+import os
+import time
+import argparse
+import yaml
+from cell_extract import OcrVote, order_configs, ocr_cell_text
+
+# OCR config autotuner.
+#
+# tests/compare_cells.py sweeps psm/oem/threshold over two cells. Here every
+# config of the same sweep reads every labeled cell of the test grids
+# (tests/png with tests/grids_expected.txt), and each call is timed. The
+# recorded texts are then replayed through the vote of recognize_gray for
+# candidate config lists: the prefixes of the configs ranked by accuracy,
+# and ranked by accuracy per second. Each list gives an accuracy and a mean
+# OCR time per cell; the lists no other list beats on both are the Pareto
+# frontier. The fastest list within --max-accuracy-loss of the best one is
+# written as YAML in the format of src/ocr_config.yaml:
+#
+#   python3 src/autotune_ocr.py --max-accuracy-loss 0.01 --out logs/ocr_config.yaml
+
+PSMS = [6, 7, 8, 10, 11, 13]
+OEMS = [1, 3]
+THRESHOLDS = [None, 127, 180, 200]
+
+def sweep_configs():
+    return [{'psm': psm, 'oem': oem, 'thresh': thresh} for oem in OEMS for psm in PSMS for thresh in THRESHOLDS]
+
+def measure(configs, labeled, read=ocr_cell_text):
+    """Reads every labeled (digit, gray) cell with every config.
+
+    Returns (texts, latencies): texts[cell][config], and the mean seconds per
+    call of each config.
+    """
+    texts = [[None] * len(configs) for _ in labeled]
+    latencies = []
+    for cfg_idx, cfg in enumerate(configs):
+        start_time = time.perf_counter()
+        for cell_idx, (digit, gray) in enumerate(labeled):
+            texts[cell_idx][cfg_idx] = read(gray, cfg)
+        latencies.append((time.perf_counter() - start_time) / max(len(labeled), 1))
+    return texts, latencies
+
+def replay(texts, digits, order, latencies):
+    """Accuracy and mean OCR seconds per cell of the vote over configs `order`."""
+    correct, seconds = 0, 0.0
+    for cell_texts, digit in zip(texts, digits):
+        vote = OcrVote()
+        decided = None
+        for pos, cfg_idx in enumerate(order):
+            if vote.settled(len(order) - pos):
+                break
+            seconds += latencies[cfg_idx]
+            decided = vote.add(cell_texts[cfg_idx])
+            if decided:
+                break
+        decided = decided or vote.decide()
+        if decided is not None and decided[0] == digit:
+            correct += 1
+    return correct / max(len(digits), 1), seconds / max(len(digits), 1)
+
+def candidate_orders(texts, digits, latencies):
+    indices = list(range(len(latencies)))
+    by_accuracy = order_configs(indices, list(zip(texts, digits)))
+    hits = {idx: sum(cell_texts[idx] == digit for cell_texts, digit in zip(texts, digits)) for idx in indices}
+    by_speed = sorted(indices, key=lambda idx: -hits[idx] / max(latencies[idx], 1e-9))
+    orders = []
+    for ranked in (by_accuracy, by_speed):
+        for length in range(1, len(ranked) + 1):
+            if ranked[:length] not in orders:
+                orders.append(ranked[:length])
+    return orders
+
+def pareto_frontier(points):
+    """The (accuracy, seconds, order) points not beaten on both, fastest first."""
+    frontier = []
+    for point in sorted(points, key=lambda point: (point[1], -point[0])):
+        if not frontier or point[0] > frontier[-1][0]:
+            frontier.append(point)
+    return frontier
+
+def choose(frontier, max_accuracy_loss=0.0):
+    best = max(accuracy for accuracy, _, _ in frontier)
+    return next(point for point in frontier if point[0] >= best - max_accuracy_loss)
+
+def write_configs(configs, path, comment=None):
+    with open(path, 'w') as f:
+        if comment:
+            f.write(''.join(f'# {line}\n' for line in comment.splitlines()))
+        yaml.dump({'tesseract_configs': configs}, f, sort_keys=False)
+
+def main():
+    # the harvesting of labeled cells is shared with the template bank builder
+    from build_template_bank import harvest, EXPECTED_GRIDS, PNG_DIR
+    parser = argparse.ArgumentParser(description='Tune the ordered OCR config list on the labeled test grids')
+    parser.add_argument('--expected', default=EXPECTED_GRIDS, help='Expected grids of the test PNGs')
+    parser.add_argument('--png-dir', default=PNG_DIR, help='Folder of gridN.png for the expected grids')
+    parser.add_argument('--max-accuracy-loss', type=float, default=0.0,
+                        help='Accuracy (0-1) that may be given up for speed, default 0')
+    parser.add_argument('--out', default='logs/ocr_config.yaml', help='Output YAML file')
+    args = parser.parse_args()
+
+    labeled = harvest(args.expected, args.png_dir, cells_dir=None)
+    digits = [digit for digit, _ in labeled]
+    configs = sweep_configs()
+    print(f'Reading {len(labeled)} labeled cells with {len(configs)} configs...')
+    texts, latencies = measure(configs, labeled)
+    points = [replay(texts, digits, order, latencies) + (order,)
+              for order in candidate_orders(texts, digits, latencies)]
+    frontier = pareto_frontier(points)
+    print('Pareto frontier:')
+    for accuracy, seconds, order in frontier:
+        print(f'  accuracy {accuracy:.4f}  {seconds * 1000:8.1f} ms/cell  {len(order):2} configs')
+    accuracy, seconds, order = choose(frontier, args.max_accuracy_loss)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    write_configs([configs[idx] for idx in order], args.out,
+                  f'Tuned by src/autotune_ocr.py on {len(labeled)} labeled cells\n'
+                  f'accuracy {accuracy:.4f}, {seconds * 1000:.1f} ms OCR per cell')
+    print(f'Chose {len(order)} configs: accuracy {accuracy:.4f}, {seconds * 1000:.1f} ms/cell, saved to {args.out}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import argparse
+import threading
+import numpy as np
+import pytesseract
+from png_grid_extractor import process_grid_image, ReadOptions, TEMPLATES, GRID_SIZE
+from cell_extract import TemplateBank
+from build_template_bank import parse_expected_grids, EXPECTED_GRIDS, PNG_DIR
+
+# OCR benchmark on the labeled test grids.
+#
+# Runs process_grid_image over tests/png/gridN.png and compares the grids
+# with tests/grids_expected.txt. The per-cell times are measured with
+# perf_counter around the recognition and returned by process_grid_image,
+# and tesseract calls are counted by wrapping the pytesseract functions.
+# The batch modes recognize many cells at once and only know the mean time
+# per cell, so their percentiles are that mean; "cell_latency" in the JSON
+# tells which it is. The metrics are printed as JSON; with --baseline they
+# are compared with a stored run, and the exit code is 1 when a metric got
+# worse by more than --threshold, or, from a zero baseline, grew by more
+# than its ZERO_BASELINE_SLACK:
+#
+#   python3 src/benchmark_ocr.py --out logs/benchmark_baseline.json
+#   python3 src/benchmark_ocr.py --ocr-mode montage --baseline logs/benchmark_baseline.json
+
+TESSERACT_FUNCTIONS = ['image_to_string', 'image_to_data']
+# (metric, direction): +1 when bigger is better
+COMPARED_METRICS = [('cells_per_s', 1), ('grids_per_s', 1), ('p50_ms', -1), ('p95_ms', -1), ('p99_ms', -1),
+                    ('tesseract_calls_per_cell', -1)]
+# a relative change from 0 means nothing, growth beyond this is a regression
+ZERO_BASELINE_SLACK = {'p50_ms': 0.5, 'p95_ms': 0.5, 'p99_ms': 0.5, 'tesseract_calls_per_cell': 0.0}
+
+class TesseractCounter:
+    """Counts pytesseract calls made inside the with block, from any thread."""
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.originals = {}
+
+    def wrap(self, function):
+        def counted(*args, **kwargs):
+            with self.lock:
+                self.calls += 1
+            return function(*args, **kwargs)
+        return counted
+
+    def __enter__(self):
+        for name in TESSERACT_FUNCTIONS:
+            self.originals[name] = getattr(pytesseract, name)
+            setattr(pytesseract, name, self.wrap(self.originals[name]))
+        return self
+
+    def __exit__(self, *exc):
+        for name, function in self.originals.items():
+            setattr(pytesseract, name, function)
+        return False
+
+def accuracy_by_digit(expected_grids, grids):
+    """{digit or '-': share of its cells read right} and the overall share."""
+    right, total = {}, {}
+    for expected, grid in zip(expected_grids, grids):
+        for row in range(GRID_SIZE):
+            for col in range(GRID_SIZE):
+                value = expected[row][col]
+                total[value] = total.get(value, 0) + 1
+                right[value] = right.get(value, 0) + int(grid[row][col] == value)
+    by_digit = {value: right[value] / total[value] for value in sorted(total)}
+    return by_digit, sum(right.values()) / max(sum(total.values()), 1)
+
+def run_benchmark(labeled, templates=TEMPLATES, options=None):
+    """Runs process_grid_image over [(png path, expected grid)] with the ReadOptions and returns the metrics."""
+    options = options or ReadOptions()
+    grids = []
+    cell_times = []
+    with TesseractCounter() as counter:
+        start_time = time.perf_counter()
+        for img_path, _ in labeled:
+            grids.append(process_grid_image(img_path, templates, options, cell_times=cell_times))
+        seconds = time.perf_counter() - start_time
+    cells = len(labeled) * GRID_SIZE * GRID_SIZE
+    by_digit, accuracy = accuracy_by_digit([grid for _, grid in labeled], grids)
+    times_ms = np.array([cell_time for cell_time, _ in cell_times] or [0.0]) * 1000
+    return {
+        'ocr_mode': options.ocr_mode,
+        'grids': len(labeled),
+        'cells': cells,
+        'seconds': round(seconds, 3),
+        'cells_per_s': round(cells / seconds, 2),
+        'grids_per_s': round(len(labeled) / seconds, 4),
+        'cell_latency': 'batch mean' if any(batch_mean for _, batch_mean in cell_times) else 'measured',
+        'p50_ms': round(float(np.percentile(times_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(times_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(times_ms, 99)), 4),
+        'tesseract_calls': counter.calls,
+        'tesseract_calls_per_cell': round(counter.calls / cells, 3),
+        'accuracy': round(accuracy, 4),
+        'accuracy_by_digit': {value: round(share, 4) for value, share in by_digit.items()},
+    }
+
+def regressions(metrics, baseline, threshold=0.1, accuracy_tolerance=0.0):
+    """Descriptions of the metrics worse than the baseline by more than threshold (relative),
+    or by more than ZERO_BASELINE_SLACK from a zero baseline."""
+    found = []
+    for name, direction in COMPARED_METRICS:
+        old, new = baseline.get(name), metrics.get(name)
+        if old is None or new is None:
+            continue
+        if old == 0:
+            if direction < 0 and new > ZERO_BASELINE_SLACK.get(name, 0.0):
+                found.append(f'{name}: {old} -> {new}')
+            continue
+        change = (new - old) / old * direction
+        if change < -threshold:
+            found.append(f'{name}: {old} -> {new} ({change:+.1%})')
+    if metrics['accuracy'] < baseline.get('accuracy', 0.0) - accuracy_tolerance:
+        found.append(f"accuracy: {baseline['accuracy']} -> {metrics['accuracy']}")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark OCR speed and accuracy on the labeled test grids')
+    parser.add_argument('--expected', default=EXPECTED_GRIDS, help='Expected grids of the test PNGs')
+    parser.add_argument('--png-dir', default=PNG_DIR, help='Folder of gridN.png for the expected grids')
+    parser.add_argument('--ocr-mode', default='cell', help='OCR mode of png_grid_extractor',
+                        choices=['cell', 'montage', 'listfile', 'cluster', 'constraint', 'confidence', 'mlp', 'hog', 'cascade'])
+    parser.add_argument('--threads', type=int, default=1, help='Threads for the cell OCR mode')
+    parser.add_argument('--locate-digits', action='store_true', help='As in png_grid_extractor')
+    parser.add_argument('--template-first', action='store_true', help='As in png_grid_extractor')
+    parser.add_argument('--template-bank', help='As in png_grid_extractor, for --template-first and the template stage')
+    parser.add_argument('--grid-lines', action='store_true', help='As in png_grid_extractor')
+    parser.add_argument('--rectify', action='store_true',
+                        help='As in png_grid_extractor, for grids turned less than 45 degrees from upright')
+    parser.add_argument('--out', help='Write the metrics to this JSON file, e.g. to use as a baseline')
+    parser.add_argument('--baseline', help='Metrics JSON of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative worsening of a speed metric counted as a regression (default 0.1)')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.0,
+                        help='Accuracy drop allowed without a regression (default 0)')
+    args = parser.parse_args()
+
+    labeled = sorted(parse_expected_grids(args.expected, args.png_dir).items())
+    templates = TemplateBank.load(args.template_bank) if args.template_bank else TEMPLATES
+    metrics = run_benchmark(labeled, templates, ReadOptions.from_args(args))
+    print(json.dumps(metrics, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(metrics, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        found = regressions(metrics, baseline, args.threshold, args.accuracy_tolerance)
+        for regression in found:
+            print(f'REGRESSION {regression}')
+        if found:
+            raise SystemExit(1)
+        print(f'No regressions against {args.baseline}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import os
+import re
+import argparse
+from glob import glob
+import cv2
+import numpy as np
+from cell_extract import preprocess_cell, normalized_rows, is_empty_cell, TemplateBank
+from png_grid_extractor import cell_boxes, GRID_SIZE
+from rectify import rectify_grid
+
+# Builds a template bank of several prototypes per digit from labeled cells.
+#
+# Labeled cells come from the test grids (tests/png/gridN.png with
+# tests/grids_expected.txt), from runs whose grids.txt has a grid equal to an
+# expected grid, and from the saved cells in tests/cells. The cells are
+# preprocessed like in OCR, and for every digit k-medoids on correlation
+# picks the prototypes. Build the bank with the --locate-digits,
+# --grid-lines and --rectify of the extractor run, so the prototypes have the
+# same crop. The bank is saved as one .npz file:
+#
+#   python3 src/build_template_bank.py --grids logs/grids.txt --out logs/template_bank.npz
+#   python3 src/png_grid_extractor.py logs/png --template-bank logs/template_bank.npz --template-first
+
+EXPECTED_GRIDS = 'tests/grids_expected.txt'
+PNG_DIR = 'tests/png'
+CELLS_DIR = 'tests/cells'
+PROTOTYPES = 4
+# prototypes from the same print correlate 0.85 or more with the right
+# digit, but digits share most of their background, so the margin is small
+FIRST_SCORE = 0.8
+FIRST_MARGIN = 0.05
+
+def parse_grid_rows(lines):
+    grid = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('|'):
+            row = [c for c in line.replace('|', ' ').split()]
+            if len(row) == GRID_SIZE:
+                grid.append(row)
+    return grid
+
+def parse_expected_grids(path, png_dir):
+    """Returns {png path: grid} for the 'Grid N:' blocks, grid N being png_dir/gridN.png."""
+    with open(path, 'r') as f:
+        text = f.read()
+    grids = {}
+    for m in re.finditer(r'Grid (\d+):\n((?:[+|].*\n?)+)', text):
+        grids[os.path.join(png_dir, f'grid{m.group(1)}.png')] = parse_grid_rows(m.group(2).splitlines())
+    return grids
+
+def parse_run_grids(path):
+    """Returns [(source file, grid)] from a grids.txt written by png_grid_extractor."""
+    runs = []
+    source, lines = None, []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('Source file: '):
+                if source is not None:
+                    runs.append((source, parse_grid_rows(lines)))
+                source, lines = line[len('Source file: '):].strip(), []
+            else:
+                lines.append(line)
+    if source is not None:
+        runs.append((source, parse_grid_rows(lines)))
+    return runs
+
+def harvest_grid(img_path, grid, locate=False, find_lines=False, rectify=False):
+    """(digit, preprocessed cell) for every filled cell of a labeled grid
+    image, cropped like png_grid_extractor with the same options."""
+    img = cv2.imread(img_path)
+    if img is None:
+        return []
+    if rectify:
+        img, _ = rectify_grid(img, GRID_SIZE)
+    samples = []
+    boxes, _ = cell_boxes(img, locate, find_lines)
+    for row, col, x, y, bw, bh in boxes:
+        digit = grid[row][col]
+        if digit.isdigit():
+            gray = preprocess_cell(img[y:y+bh, x:x+bw])
+            if not is_empty_cell(gray):
+                samples.append((digit, gray))
+    return samples
+
+def harvest_cells_dir(cells_dir):
+    # names like grid_2_x_2_y_5_expected_a_1_actual_b_4.png
+    samples = []
+    for path in sorted(glob(os.path.join(cells_dir, '*.png'))):
+        m = re.search(r'_expected_a_(.+?)_actual_', os.path.basename(path))
+        img = cv2.imread(path)
+        if m and m.group(1).isdigit() and img is not None:
+            samples.append((m.group(1), preprocess_cell(img)))
+    return samples
+
+def harvest(expected_path=EXPECTED_GRIDS, png_dir=PNG_DIR, run_grids=(), cells_dir=CELLS_DIR, locate=False,
+            find_lines=False, rectify=False):
+    expected = parse_expected_grids(expected_path, png_dir)
+    labeled = dict(expected)
+    for grids_path in run_grids:
+        for source, grid in parse_run_grids(grids_path):
+            # only runs that read the grid exactly right give trusted labels
+            if grid in expected.values():
+                labeled.setdefault(source, grid)
+    samples = []
+    for img_path, grid in sorted(labeled.items()):
+        samples.extend(harvest_grid(img_path, grid, locate, find_lines, rectify))
+    # the saved cells are padded grid crops, they do not fit a located or rectified bank
+    if cells_dir and os.path.isdir(cells_dir) and not locate and not rectify:
+        samples.extend(harvest_cells_dir(cells_dir))
+    return samples
+
+def kmedoids(vectors, k, iterations=20):
+    """Indices of k medoids of normalized rows, with 1 - correlation as the distance."""
+    n = len(vectors)
+    if n <= k:
+        return list(range(n))
+    similarity = vectors @ vectors.T
+    # start from the overall medoid, then repeatedly the least similar row
+    medoids = [int(np.argmax(similarity.sum(axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmin(similarity[:, medoids].max(axis=1))))
+    for _ in range(iterations):
+        assignment = np.argmax(similarity[:, medoids], axis=1)
+        new_medoids = []
+        for cluster in range(k):
+            members = np.flatnonzero(assignment == cluster)
+            within = similarity[np.ix_(members, members)].sum(axis=1)
+            new_medoids.append(int(members[np.argmax(within)]))
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+    return medoids
+
+def build_bank(samples, prototypes=PROTOTYPES, first_score=FIRST_SCORE, first_margin=FIRST_MARGIN):
+    by_digit = {}
+    for digit, gray in samples:
+        by_digit.setdefault(digit, []).append(gray)
+    pairs = []
+    for digit in sorted(by_digit):
+        grays = by_digit[digit]
+        for idx in kmedoids(normalized_rows(grays), prototypes):
+            pairs.append((digit, grays[idx]))
+    return TemplateBank(pairs, ink_white=False, first_score=first_score, first_margin=first_margin)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a digit template bank from labeled cells')
+    parser.add_argument('--expected', default=EXPECTED_GRIDS, help='Expected grids of the test PNGs')
+    parser.add_argument('--png-dir', default=PNG_DIR, help='Folder of gridN.png for the expected grids')
+    parser.add_argument('--grids', action='append', default=[],
+                        help='grids.txt of a run; grids equal to an expected grid are harvested (repeatable)')
+    parser.add_argument('--cells', default=CELLS_DIR, help='Folder of labeled cell images')
+    parser.add_argument('--prototypes', type=int, default=PROTOTYPES, help='Prototypes per digit')
+    parser.add_argument('--locate-digits', action='store_true',
+                        help='Crop cells like png_grid_extractor --locate-digits')
+    parser.add_argument('--grid-lines', action='store_true',
+                        help='Crop cells like png_grid_extractor --grid-lines')
+    parser.add_argument('--rectify', action='store_true',
+                        help='Crop cells like png_grid_extractor --rectify')
+    parser.add_argument('--out', default='logs/template_bank.npz', help='Output .npz file')
+    args = parser.parse_args()
+
+    samples = harvest(args.expected, args.png_dir, args.grids, args.cells, args.locate_digits, args.grid_lines,
+                      args.rectify)
+    bank = build_bank(samples, args.prototypes)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    bank.save(args.out)
+    counts = {digit: bank.digits.count(digit) for digit in bank.labels}
+    print(f'Harvested {len(samples)} labeled cells, saved {len(bank)} prototypes {counts} to {args.out}')
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import cv2
 import numpy as np
 import pytesseract
@@ -11,12 +13,93 @@ def debug_print(*args, **kwargs):
     if DEBUG:
         print(*args, **kwargs)
 
+CELL_SIZE = 64
+
 def preprocess_cell(cell_img):
     gray = cv2.cvtColor(cell_img, cv2.COLOR_BGR2GRAY)
     gray = cv2.equalizeHist(gray)
-    gray = cv2.resize(gray, (64, 64), interpolation=cv2.INTER_LINEAR)
+    gray = cv2.resize(gray, (CELL_SIZE, CELL_SIZE), interpolation=cv2.INTER_LINEAR)
     return gray
 
+def preprocess_cells(image, rects):
+    """preprocess_cell for the (x, y, w, h) rects of one image, as one (n, 64, 64) array.
+
+    The cells are written straight into the array. OpenCV per crop is kept
+    on purpose: a NumPy histogram equalization over all crops at once, or a
+    multi-channel cv2.resize, measured several times slower for 81 cells.
+    """
+    grays = np.empty((len(rects), CELL_SIZE, CELL_SIZE), dtype=np.uint8)
+    for idx, (x, y, w, h) in enumerate(rects):
+        crop = image[y:y+h, x:x+w]
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        cv2.resize(cv2.equalizeHist(gray), (CELL_SIZE, CELL_SIZE), dst=grays[idx], interpolation=cv2.INTER_LINEAR)
+    return grays
+
+class StackedCell(np.ndarray):
+    """A cell of a CellStack. threshold_cell takes its binarized images from
+    the stack; arrays computed from it are plain cells again."""
+    stack = None
+    index = None
+
+class CellStack:
+    """Preprocessed cells as one (n, 64, 64) array, with one binarized stack
+    per distinct threshold of the OCR configs, computed for all cells at the
+    first threshold_cell of one of them.
+
+    The binarized stacks are made only when a recognizer thresholds, and
+    only for the cells it gets: known cells are taken out first, and the
+    modes without tesseract never threshold. Indexing gives StackedCells,
+    so a CellStack can be passed wherever a list of preprocessed cells is
+    expected.
+    """
+    def __init__(self, grays, thresholds=None):
+        self.grays = np.asarray(grays, dtype=np.uint8).reshape(-1, CELL_SIZE, CELL_SIZE)
+        if thresholds is None:
+            thresholds = {cfg.get('thresh', None) for cfg in load_ocr_configs()}
+        self.thresholds = {thresh for thresh in thresholds if thresh is not None}
+        self.binaries = {}
+
+    def binary(self, thresh):
+        """The binarized stack for one of the thresholds, made on first use."""
+        binary = self.binaries.get(thresh)
+        if binary is None:
+            # cv2.THRESH_BINARY_INV: ink (at or below the threshold) becomes white.
+            # Threads may both make it, the result is the same.
+            binary = self.binaries[thresh] = np.where(self.grays > thresh, 0, 255).astype(np.uint8)
+        return binary
+
+    def __len__(self):
+        return len(self.grays)
+
+    def __getitem__(self, idx):
+        cell = self.grays[idx].view(StackedCell)
+        cell.stack = self
+        cell.index = idx
+        return cell
+
+    def __iter__(self):
+        return (self[idx] for idx in range(len(self)))
+
+    def __array__(self, dtype=None):
+        return self.grays if dtype is None else self.grays.astype(dtype)
+
+    def take(self, indices):
+        """The stack of the cells at `indices`, with the binarized stacks already made."""
+        stack = CellStack.__new__(CellStack)
+        stack.grays = self.grays[list(indices)]
+        stack.thresholds = self.thresholds
+        stack.binaries = {thresh: binary[list(indices)] for thresh, binary in self.binaries.items()}
+        return stack
+
+    @classmethod
+    def concatenate(cls, stacks):
+        stack = cls.__new__(cls)
+        stack.grays = np.concatenate([s.grays for s in stacks]) if stacks else np.empty((0, CELL_SIZE, CELL_SIZE), np.uint8)
+        stack.thresholds = set.intersection(*[s.thresholds for s in stacks]) if stacks else set()
+        made = set.intersection(*[set(s.binaries) for s in stacks]) & stack.thresholds if stacks else set()
+        stack.binaries = {thresh: np.concatenate([s.binaries[thresh] for s in stacks]) for thresh in made}
+        return stack
+
 def load_ocr_configs(yaml_path='src/ocr_config.yaml'):
     if not hasattr(load_ocr_configs, "_cache"):
         load_ocr_configs._cache = {}
@@ -35,63 +118,353 @@ def load_ocr_configs(yaml_path='src/ocr_config.yaml'):
         load_ocr_configs._cache[yaml_path] = configs
         return configs
 
+TEMPLATE_SCORE = 0.4
+TEMPLATE_FIRST_SCORE = 0.7
+TEMPLATE_FIRST_MARGIN = 0.15
+
+def normalized_rows(images):
+    """Flattens images to rows of zero mean and unit length.
+
+    The dot product of two rows is then the TM_CCOEFF_NORMED score of the
+    two equal sized images. A constant image gets a zero row.
+    """
+    rows = np.asarray(images, dtype=np.float64).reshape(len(images), -1)
+    rows = rows - rows.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+
+class TemplateBank:
+    """Digit templates stacked into one (K, pixels) matrix of normalized rows.
+
+    scores() gives the TM_CCOEFF_NORMED score of every cell against every
+    template with one matrix product instead of a matchTemplate call per
+    pair. All templates must have the same shape; cells are resized to it.
+
+    `templates` is a dict of one template per digit, or a list of (digit,
+    template) pairs with several prototypes per digit. `ink_white` tells
+    that the digit is white in the templates, as in the binarized data/
+    templates, while preprocessed cells have a dark digit. first_score and
+    first_margin are the limits of match_first; a bank learned from the
+    same print as the cells can use tighter ones than data/.
+    """
+    def __init__(self, templates, ink_white=True, first_score=TEMPLATE_FIRST_SCORE,
+                 first_margin=TEMPLATE_FIRST_MARGIN):
+        pairs = list(templates.items()) if isinstance(templates, dict) else list(templates)
+        self.digits = [digit for digit, _ in pairs]
+        self.images = [tmpl for _, tmpl in pairs]
+        self.ink_white = ink_white
+        self.first_score = first_score
+        self.first_margin = first_margin
+        shapes = {tmpl.shape for tmpl in self.images}
+        if len(shapes) > 1:
+            raise ValueError(f'Templates have different shapes: {shapes}')
+        self.shape = shapes.pop() if shapes else (64, 64)
+        self.matrix = normalized_rows(self.images) if pairs else np.zeros((0, 1))
+        self.labels = list(dict.fromkeys(self.digits))
+        self.label_index = np.array([self.labels.index(digit) for digit in self.digits], dtype=int)
+
+    def __len__(self):
+        return len(self.digits)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(zip([str(d) for d in data['digits']], data['templates']), ink_white=bool(data['ink_white']),
+                   first_score=float(data['first_score']), first_margin=float(data['first_margin']))
+
+    def save(self, path):
+        np.savez_compressed(path, digits=np.array(self.digits), templates=np.asarray(self.images, dtype=np.uint8),
+                            ink_white=self.ink_white, first_score=self.first_score, first_margin=self.first_margin)
+
+    def scores(self, grays):
+        cells = [gray if gray.shape == self.shape else
+                 cv2.resize(gray, self.shape[::-1], interpolation=cv2.INTER_LINEAR) for gray in grays]
+        return normalized_rows(cells) @ self.matrix.T
+
+    def digit_scores(self, grays):
+        """(cells, labels) matrix of the best prototype score per digit, with the digit dark."""
+        scores = self.scores(grays)
+        if self.ink_white:
+            scores = -scores
+        best = np.full((len(grays), len(self.labels)), -np.inf)
+        for k, label in enumerate(self.label_index):
+            np.maximum(best[:, label], scores[:, k], out=best[:, label])
+        return best
+
+    def match(self, grays):
+        """Best digit per cell as (digit, ok), like template_match_cell."""
+        if not len(self) or not len(grays):
+            return [(None, False)] * len(grays)
+        scores = self.scores(grays)
+        best = scores.argmax(axis=1)
+        return [(self.digits[b], True) if scores[i, b] > TEMPLATE_SCORE else (None, False)
+                for i, b in enumerate(best)]
+
+    def match_first(self, grays):
+        """Digits clear enough to skip OCR, else None, one per cell.
+
+        The templates in data/ are binarized with the digit white, so the
+        fallback match scores the inverted image. Here the digit must match
+        with the right polarity, and beat the second best digit clearly.
+        """
+        if len(self.labels) < 2 or not len(grays):
+            return [None] * len(grays)
+        scores = self.digit_scores(grays)
+        order = np.argsort(-scores, axis=1)
+        results = []
+        for i, row in enumerate(scores):
+            best, second = row[order[i, 0]], row[order[i, 1]]
+            if best >= self.first_score and best - second >= self.first_margin:
+                results.append(self.labels[order[i, 0]])
+            else:
+                results.append(None)
+        return results
+
+def template_bank(templates):
+    return templates if isinstance(templates, TemplateBank) else TemplateBank(templates or {})
+
 def template_match_cell(cell_img, templates):
-    best_digit, best_score = None, -1
-    for digit, tmpl in (templates or {}).items():
-        cell_resized = cv2.resize(cell_img, tmpl.shape[::-1], interpolation=cv2.INTER_LINEAR)
-        res = cv2.matchTemplate(cell_resized, tmpl, cv2.TM_CCOEFF_NORMED)
-        score = res.max()
-        if score > best_score:
-            best_score = score
-            best_digit = digit
-    if best_score > 0.4:
-        return best_digit, True
-    return None, False
-
-def extract_and_recognize_cell(image, x, y, w, h, templates=None):
-    cell_img = image[y:y+h, x:x+w]
-    gray = preprocess_cell(cell_img)
-    debug_print(f"[DEBUG] Processing cell at ({x},{y},{w},{h}), gray shape: {gray.shape}, min: {gray.min()}, max: {gray.max()}, mean: {gray.mean():.2f}")
-    if not np.any(gray == 0):
-        debug_print("[DEBUG] No black pixels found in cell, returning '-' (empty)")
-        return '-', 'none', 0
-    ocr_configs = load_ocr_configs()
-    debug_print(f"[DEBUG] Using {len(ocr_configs)} OCR configs from YAML")
-    ocr_results = []
-    for cfg in ocr_configs:
-        psm = cfg['psm']
-        oem = cfg['oem']
-        thresh = cfg.get('thresh', None)
-        if thresh is not None:
-            _, proc = cv2.threshold(gray, thresh, 255, cv2.THRESH_BINARY_INV)
-        else:
-            proc = gray
-        config_str = f'--psm {psm} --oem {oem} -c tessedit_char_whitelist=123456789'
-        text = pytesseract.image_to_string(proc, config=config_str).strip()
-        debug_print(f"[DEBUG] OCR result for config (psm={psm}, oem={oem}, thresh={thresh}): '{text}'")
+    return template_bank(templates).match([cell_img])[0]
+
+def is_empty_cell(gray):
+    return not np.any(gray == 0)
+
+def threshold_cell(gray, thresh):
+    if thresh is None:
+        return gray
+    stack = getattr(gray, 'stack', None)
+    if stack is not None and thresh in stack.thresholds:
+        return stack.binary(thresh)[gray.index]
+    _, proc = cv2.threshold(gray, thresh, 255, cv2.THRESH_BINARY_INV)
+    return proc
+
+def tesseract_config(psm, oem):
+    return f'--psm {psm} --oem {oem} -c tessedit_char_whitelist=123456789'
+
+def reliability_for_count(count):
+    if count >= 5:
+        return 'high'
+    elif count >= 3:
+        return 'medium'
+    return 'low'
+
+class OcrVote:
+    """Collects OCR texts in config order and decides the cell value.
+
+    add() returns the result as soon as one digit reaches 5 votes, decide()
+    gives the final result after all configs, or None if the vote is too
+    split and the caller should fall back to templates. settled() tells
+    when the remaining configs can no longer change that outcome.
+    """
+    def __init__(self):
+        self.results = []
+
+    def add(self, text):
         if text.isdigit() and len(text) == 1:
-            ocr_results.append(text)
-            # Check for high reliability immediately
-            most_common, count = Counter(ocr_results).most_common(1)[0]
+            self.results.append(text)
+            most_common, count = Counter(self.results).most_common(1)[0]
             if count >= 5:
-                debug_print(f"[DEBUG] Early exit: Decided value: {most_common}, reliability: high, count: {count}")
                 return most_common, 'high', count
-    debug_print(f"[DEBUG] OCR results collected: {ocr_results}")
-    if ocr_results:
-        most_common, count = Counter(ocr_results).most_common(1)[0]
-        if count >= 5:
-            reliability = 'high'
-        elif count >= 3:
-            reliability = 'medium'
-        else:
-            reliability = 'low'
-        if count >= 3 or count > len(ocr_results) // 2:
-            debug_print(f"[DEBUG] Decided value: {most_common}, reliability: {reliability}, count: {count}")
-            return most_common, reliability, count
+        return None
+
+    def decide(self):
+        if not self.results:
+            return None
+        most_common, count = Counter(self.results).most_common(1)[0]
+        if count >= 3 or count > len(self.results) // 2:
+            return most_common, reliability_for_count(count), count
+        return None
+
+    def settled(self, remaining):
+        """True if decide() already gives the final digit and reliability.
+
+        Every one of the `remaining` configs may still vote for any digit.
+        The outcome is fixed when the vote stays too split to be accepted
+        whatever comes, or when no other digit can catch the leader and the
+        leader can neither reach the 5 vote exit nor change reliability
+        class. Only the count can still grow, as with the 5 vote exit.
+        """
+        if remaining == 0:
+            return True
+        counts = Counter(self.results).most_common(2)
+        leader = counts[0][1] if counts else 0
+        runner_up = counts[1][1] if len(counts) > 1 else 0
+        if leader + remaining >= 5:
+            return False
+        total = len(self.results)
+        if leader + remaining < 3:
+            # rejected now and after any k more votes, whichever digit leads
+            if all(leader + k <= (total + k) // 2 for k in range(remaining + 1)):
+                return True
+        if runner_up + remaining >= leader:
+            return False
+        if reliability_for_count(leader) != reliability_for_count(leader + remaining):
+            return False
+        return leader >= 3 or leader > (total + remaining) // 2
+
+def order_configs(configs, samples):
+    """Orders configs so that the ones agreeing most often with the decided digit come first.
+
+    `samples` holds (texts, digit) per cell, texts in the order of configs.
+    Five agreeing votes end the vote, so this reaches the exit with the
+    fewest tesseract calls. Ties keep the given order.
+    """
+    agreements = [0] * len(configs)
+    for texts, digit in samples:
+        for idx, text in enumerate(texts):
+            if text == digit:
+                agreements[idx] += 1
+    ranked = sorted(range(len(configs)), key=lambda idx: -agreements[idx])
+    return [configs[idx] for idx in ranked]
+
+def fallback_result(gray, templates):
     tmpl_digit, tmpl_ok = template_match_cell(gray, templates) if templates else (None, False)
     if tmpl_ok:
         debug_print(f"[DEBUG] Template match fallback: {tmpl_digit}")
         return tmpl_digit, 'template', 0
-    else:
-        debug_print("[DEBUG] No digit recognized, returning '-' (none)")
-        return '-', 'none', 0 
\ No newline at end of file
+    debug_print("[DEBUG] No digit recognized, returning '-' (none)")
+    return '-', 'none', 0
+
+def distinct_reads(ocr_configs, read_key):
+    """The configs with the first of every read_key(psm, oem, thresh), in order."""
+    seen = set()
+    distinct = []
+    for cfg in ocr_configs:
+        key = read_key(cfg['psm'], cfg['oem'], cfg.get('thresh', None))
+        if key not in seen:
+            seen.add(key)
+            distinct.append(cfg)
+    return distinct
+
+def recognize_grays_batched(grays, read_texts, templates=None, ocr_configs=None, cache=None, namespace='batch',
+                            read_key=None):
+    """Recognizes many preprocessed cells with one read_texts call per config.
+
+    read_texts(images, psm, oem, thresh) returns one OCR text per image.
+    Cells decided by an early exit are left out of later configs, and cells
+    found in `cache` (an ocr_cache.CellCache) under `namespace` are not read at all. Returns
+    one (value, reliability, ocr_count) per cell, like recognize_gray.
+
+    When read_texts makes the same tesseract call for different configs,
+    read_key(psm, oem, thresh) names the call, and only the first config of
+    each call is read and voted: a repeated read is not a second opinion.
+    """
+    ocr_configs = ocr_configs or load_ocr_configs()
+    if read_key is not None:
+        ocr_configs = distinct_reads(ocr_configs, read_key)
+    results = [None] * len(grays)
+    votes = {}
+    for idx, gray in enumerate(grays):
+        if is_empty_cell(gray):
+            results[idx] = ('-', 'none', 0)
+        elif cache is not None and (cached := cache.get(gray, namespace)) is not None:
+            results[idx] = cached
+        else:
+            votes[idx] = OcrVote()
+    for cfg_idx, cfg in enumerate(ocr_configs):
+        remaining = len(ocr_configs) - cfg_idx
+        for idx in votes:
+            if results[idx] is None and votes[idx].settled(remaining):
+                results[idx] = votes[idx].decide() or fallback_result(grays[idx], templates)
+        pending = [idx for idx in votes if results[idx] is None]
+        if not pending:
+            break
+        psm, oem, thresh = cfg['psm'], cfg['oem'], cfg.get('thresh', None)
+        images = [threshold_cell(grays[idx], thresh) for idx in pending]
+        texts = read_texts(images, psm, oem, thresh)
+        debug_print(f"[DEBUG] Batch OCR (psm={psm}, oem={oem}, thresh={thresh}) for {len(pending)} cells: {texts}")
+        for idx, text in zip(pending, texts):
+            decided = votes[idx].add(text)
+            if decided:
+                results[idx] = decided
+    for idx, vote in votes.items():
+        if results[idx] is None:
+            results[idx] = vote.decide() or fallback_result(grays[idx], templates)
+        if cache is not None:
+            cache.put(grays[idx], results[idx], namespace)
+    return results
+
+def texts_from_pages(data, n_images):
+    """Joins the words of each page of image_to_data output; page n is image n-1."""
+    words = [[] for _ in range(n_images)]
+    for page, text in zip(data['page_num'], data['text']):
+        text = str(text).strip()
+        if text and 1 <= page <= n_images:
+            words[page - 1].append(text)
+    return [' '.join(page_words) for page_words in words]
+
+def ocr_list_file(images, psm, oem, thresh=None):
+    """Runs tesseract once over a list file naming every image.
+
+    The cells are written as they are, so tesseract sees the same glyphs
+    as with image_to_string, only the process start and model loading is
+    shared by all of them.
+    """
+    if not images:
+        return []
+    with tempfile.TemporaryDirectory(prefix='cells_') as tmp_dir:
+        paths = []
+        for idx, img in enumerate(images):
+            path = os.path.join(tmp_dir, f'cell_{idx:04d}.png')
+            cv2.imwrite(path, img)
+            paths.append(path)
+        list_path = os.path.join(tmp_dir, 'cells.txt')
+        with open(list_path, 'w') as f:
+            f.write('\n'.join(paths) + '\n')
+        data = pytesseract.image_to_data(list_path, config=tesseract_config(psm, oem),
+                                         output_type=pytesseract.Output.DICT)
+    return texts_from_pages(data, len(images))
+
+def recognize_cells_listfile(grays, templates=None, ocr_configs=None, cache=None):
+    return recognize_grays_batched(grays, ocr_list_file, templates, ocr_configs, cache, 'listfile')
+
+def ocr_cell_text(gray, cfg):
+    psm = cfg['psm']
+    oem = cfg['oem']
+    thresh = cfg.get('thresh', None)
+    proc = threshold_cell(gray, thresh)
+    text = pytesseract.image_to_string(proc, config=tesseract_config(psm, oem)).strip()
+    debug_print(f"[DEBUG] OCR result for config (psm={psm}, oem={oem}, thresh={thresh}): '{text}'")
+    return text
+
+def recognize_gray(gray, templates=None):
+    if is_empty_cell(gray):
+        debug_print("[DEBUG] No black pixels found in cell, returning '-' (empty)")
+        return '-', 'none', 0
+    ocr_configs = load_ocr_configs()
+    debug_print(f"[DEBUG] Using {len(ocr_configs)} OCR configs from YAML")
+    vote = OcrVote()
+    for cfg_idx, cfg in enumerate(ocr_configs):
+        if vote.settled(len(ocr_configs) - cfg_idx):
+            debug_print(f"[DEBUG] Vote settled after {cfg_idx} configs: {vote.results}")
+            break
+        decided = vote.add(ocr_cell_text(gray, cfg))
+        if decided:
+            debug_print(f"[DEBUG] Early exit: Decided value: {decided[0]}, reliability: high, count: {decided[2]}")
+            return decided
+    debug_print(f"[DEBUG] OCR results collected: {vote.results}")
+    decided = vote.decide()
+    if decided:
+        debug_print(f"[DEBUG] Decided value: {decided[0]}, reliability: {decided[1]}, count: {decided[2]}")
+        return decided
+    return fallback_result(gray, templates)
+
+def recognize_gray_cached(gray, templates=None, cache=None, recognize=None, namespace='vote'):
+    """recognize (recognize_gray by default) through `cache`, whose entries
+    under `namespace` must come from the same recognizer."""
+    recognize = recognize or recognize_gray
+    if cache is None or is_empty_cell(gray):
+        return recognize(gray, templates)
+    cached = cache.get(gray, namespace)
+    if cached is not None:
+        debug_print(f"[DEBUG] Cache hit: {cached}")
+        return cached
+    result = recognize(gray, templates)
+    cache.put(gray, result, namespace)
+    return result
+
+def extract_and_recognize_cell(image, x, y, w, h, templates=None, cache=None):
+    cell_img = image[y:y+h, x:x+w]
+    gray = preprocess_cell(cell_img)
+    debug_print(f"[DEBUG] Processing cell at ({x},{y},{w},{h}), gray shape: {gray.shape}, min: {gray.min()}, max: {gray.max()}, mean: {gray.mean():.2f}")
+    return recognize_gray_cached(gray, templates, cache)
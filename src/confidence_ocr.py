@@ -0,0 +1,174 @@
+import os
+import argparse
+from functools import partial
+import numpy as np
+import pytesseract
+import yaml
+from cell_extract import (load_ocr_configs, is_empty_cell, threshold_cell, tesseract_config, fallback_result,
+                          recognize_gray, recognize_gray_cached, debug_print)
+
+# Reliability from tesseract's own confidence instead of repeated OCR.
+#
+# The vote in recognize_gray calls tesseract up to 21 times per cell and
+# counts agreeing reads. Here a cell is read with image_to_data, which also
+# gives a confidence of 0-100 for the word. A read confident enough for
+# 'high' is the result after one call; otherwise a second config is read,
+# and if it agrees the higher confidence counts, if not the cell is 'low'.
+#
+# The confidence limits of 'high' and 'medium' are calibrated against the
+# vote on the labeled test grids, on the same combined confidence of both
+# reads that recognition compares with them, and saved in CALIBRATION_PATH:
+#
+#   python3 src/confidence_ocr.py --grids logs/grids.txt
+#   python3 src/png_grid_extractor.py logs/png --ocr-mode confidence
+
+CALIBRATION_PATH = 'src/confidence_calibration.yaml'
+# used until a calibration is saved
+DEFAULT_CALIBRATION = {'high': 90.0, 'medium': 60.0}
+CONFIDENCE_CALLS = 2
+
+def load_calibration(path=CALIBRATION_PATH):
+    if not os.path.exists(path):
+        return dict(DEFAULT_CALIBRATION)
+    with open(path, 'r') as f:
+        data = yaml.safe_load(f)
+    return {'high': float(data['high']), 'medium': float(data['medium'])}
+
+def save_calibration(calibration, path=CALIBRATION_PATH, comment=None):
+    with open(path, 'w') as f:
+        if comment:
+            f.write(f'# {comment}\n')
+        yaml.safe_dump({'high': float(calibration['high']), 'medium': float(calibration['medium'])}, f)
+
+def reliability_for_confidence(confidence, calibration):
+    if confidence >= calibration['high']:
+        return 'high'
+    elif confidence >= calibration['medium']:
+        return 'medium'
+    return 'low'
+
+def reliability_for_reading(confidence, agreeing, calibration):
+    """Reliability of a combined reading. Reads that disagree are 'low',
+    unless the first one was confident enough to stop at it."""
+    if not agreeing:
+        return 'high' if confidence >= calibration['high'] else 'low'
+    return reliability_for_confidence(confidence, calibration)
+
+def combined_reading(reads):
+    """(digit, confidence, agreeing) of the (text, confidence) reads of all
+    CONFIDENCE_CALLS configs, None without a digit read.
+
+    The confidence is that of the most confident agreeing read, or of the
+    first digit read when they disagree; compared with a calibration by
+    reliability_for_reading, it gives the reliability recognize_gray_confidence
+    gives after reading only as many configs as it needs.
+    """
+    digits = [(text, conf) for text, conf in reads if text.isdigit() and len(text) == 1]
+    if not digits:
+        return None
+    if any(text != digits[0][0] for text, _ in digits):
+        return digits[0][0], digits[0][1], False
+    return digits[0][0], max(conf for _, conf in digits), True
+
+def read_with_confidence(gray, cfg):
+    """Returns (text, confidence) of the most confident word, ('', -1.0) if none."""
+    proc = threshold_cell(gray, cfg.get('thresh', None))
+    data = pytesseract.image_to_data(proc, config=tesseract_config(cfg['psm'], cfg['oem']),
+                                     output_type=pytesseract.Output.DICT)
+    best_text, best_conf = '', -1.0
+    for text, conf in zip(data['text'], data['conf']):
+        text = str(text).strip()
+        if text and float(conf) > best_conf:
+            best_text, best_conf = text, float(conf)
+    debug_print(f"[DEBUG] OCR data for config {cfg}: '{best_text}' confidence {best_conf}")
+    return best_text, best_conf
+
+def recognize_gray_confidence(gray, templates=None, ocr_configs=None, calibration=None):
+    """Like recognize_gray, but with one or two image_to_data calls.
+
+    Returns (value, reliability, ocr_count), ocr_count being the number of
+    reads that gave the value.
+    """
+    if is_empty_cell(gray):
+        return '-', 'none', 0
+    configs = (ocr_configs or load_ocr_configs())[:CONFIDENCE_CALLS]
+    calibration = calibration or load_calibration()
+    reads = []
+    for cfg in configs:
+        text, conf = read_with_confidence(gray, cfg)
+        if text.isdigit() and len(text) == 1:
+            reads.append((text, conf))
+            if reliability_for_confidence(conf, calibration) == 'high':
+                break
+    if not reads:
+        return fallback_result(gray, templates)
+    digit, conf = max(reads, key=lambda read: read[1])
+    agreeing = sum(text == digit for text, _ in reads)
+    if agreeing < len(reads):
+        # the first read was not confident enough to stop at
+        return digit, 'low', agreeing
+    return digit, reliability_for_confidence(conf, calibration), agreeing
+
+def recognize_cells_confidence(grays, templates=None, cache=None):
+    """Recognizes preprocessed cells with recognize_gray_confidence, one by one."""
+    # the configs and the calibration are loaded once for all cells
+    recognize = partial(recognize_gray_confidence, ocr_configs=load_ocr_configs(), calibration=load_calibration())
+    return [recognize_gray_cached(gray, templates, cache, recognize, 'confidence') for gray in grays]
+
+def best_threshold(confidences, positives):
+    """The confidence limit that best agrees with the positive labels."""
+    confidences = np.asarray(confidences, dtype=np.float64)
+    positives = np.asarray(positives, dtype=bool)
+    candidates = np.unique(np.append(confidences, 101.0))
+    agreement = np.array([np.sum((confidences >= limit) == positives) for limit in candidates])
+    # ties go to the stricter limit
+    return float(candidates[len(candidates) - 1 - int(np.argmax(agreement[::-1]))])
+
+def calibrate(samples):
+    """Confidence limits from (combined confidence, agreeing, vote reliability) samples.
+
+    Only agreeing reads can be 'medium', so the medium limit is fitted on them.
+    """
+    high = best_threshold([conf for conf, _, _ in samples],
+                          [reliability == 'high' for _, _, reliability in samples])
+    agreeing = [(conf, reliability) for conf, agree, reliability in samples if agree]
+    medium = best_threshold([conf for conf, _ in agreeing],
+                            [reliability in ('high', 'medium') for _, reliability in agreeing])
+    return {'high': high, 'medium': min(medium, high)}
+
+def calibration_samples(labeled):
+    """(combined confidence, agreeing, vote reliability, confidence correct, vote correct) for labeled cells."""
+    configs = load_ocr_configs()[:CONFIDENCE_CALLS]
+    samples = []
+    for digit, gray in labeled:
+        reading = combined_reading([read_with_confidence(gray, cfg) for cfg in configs])
+        text, conf, agree = reading if reading is not None else ('', -1.0, True)
+        val, reliability, _ = recognize_gray(gray)
+        samples.append((conf, agree, reliability, text == digit, val == digit))
+    return samples
+
+def main():
+    # the harvesting of labeled cells is shared with the template bank builder
+    from build_template_bank import harvest, EXPECTED_GRIDS, PNG_DIR
+    parser = argparse.ArgumentParser(description='Calibrate OCR confidence against the vote on labeled grids')
+    parser.add_argument('--expected', default=EXPECTED_GRIDS, help='Expected grids of the test PNGs')
+    parser.add_argument('--png-dir', default=PNG_DIR, help='Folder of gridN.png for the expected grids')
+    parser.add_argument('--grids', action='append', default=[],
+                        help='grids.txt of a run; grids equal to an expected grid are used (repeatable)')
+    parser.add_argument('--out', default=CALIBRATION_PATH, help='Output YAML file')
+    args = parser.parse_args()
+
+    samples = calibration_samples(harvest(args.expected, args.png_dir, args.grids))
+    calibration = calibrate([(conf, agree, reliability) for conf, agree, reliability, _, _ in samples])
+    same = sum(reliability_for_reading(conf, agree, calibration) == reliability
+               for conf, agree, reliability, _, _ in samples)
+    print(f"Calibrated on {len(samples)} cells: high >= {calibration['high']:.1f}, "
+          f"medium >= {calibration['medium']:.1f}, same class as the vote for {same}")
+    for label in ('high', 'medium', 'low'):
+        chosen = [ok for conf, agree, _, ok, _ in samples if reliability_for_reading(conf, agree, calibration) == label]
+        voted = [ok for _, _, reliability, _, ok in samples if reliability == label]
+        print(f"  {label:6}  confidence: {sum(chosen)}/{len(chosen)} correct   vote: {sum(voted)}/{len(voted)} correct")
+    save_calibration(calibration, args.out, f'Calibrated on {len(samples)} labeled cells by src/confidence_ocr.py')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+from cell_extract import (load_ocr_configs, is_empty_cell, OcrVote, ocr_cell_text, fallback_result,
+                          reliability_for_count, debug_print)
+from ratkaisija import TYHJA
+from ratkaisutila import Ratkaisutila, KOKO
+
+# Constraint aware OCR for a whole grid, in two passes.
+#
+# The first pass reads every non-empty cell with the first CHEAP_CONFIGS
+# configs only. Cells where they all agree are givens, and the givens are
+# put into a ratkaisutila.Ratkaisutila, whose bitmasks tell the digits each
+# remaining cell can still have. In the second pass the uncertain cells are
+# resolved, fewest candidates first: votes for impossible digits are
+# dropped, a cell with one candidate left that some cheap read voted for
+# needs no more OCR, and the other configs run only until the vote among the
+# candidates is settled. The givens are OCR output too, so a candidate no
+# read voted for is never forced on a cell. Every cell resolved with
+# evidence narrows the candidates of its neighbours.
+
+CHEAP_CONFIGS = 5
+GIVEN_RELIABILITY = ('high', 'template')
+ALL_DIGITS = [str(numero) for numero in range(1, KOKO + 1)]
+
+class CandidateVote(OcrVote):
+    """OcrVote that ignores digits ruled out by the constraints."""
+    def __init__(self, candidates, results=()):
+        super().__init__()
+        self.candidates = set(candidates)
+        self.results = [text for text in results if text in self.candidates]
+
+    def add(self, text):
+        if text in self.candidates:
+            return super().add(text)
+        return None
+
+def cheap_pass(gray, configs):
+    vote = OcrVote()
+    for cfg in configs:
+        decided = vote.add(ocr_cell_text(gray, cfg))
+        if decided:
+            return vote, decided
+    return vote, None
+
+def givens_state(results):
+    ruudukko = [[TYHJA] * KOKO for _ in range(KOKO)]
+    for idx, result in enumerate(results):
+        if result is not None and result[0].isdigit() and result[1] in GIVEN_RELIABILITY:
+            ruudukko[idx // KOKO][idx % KOKO] = int(result[0])
+    try:
+        return Ratkaisutila(ruudukko)
+    except ValueError:
+        # two givens conflict, one of them is misread: no constraints then
+        debug_print("[DEBUG] Givens conflict, constraint pass disabled")
+        return None
+
+def candidates(tila, idx):
+    if tila is None:
+        return ALL_DIGITS
+    found = [str(numero) for numero in tila.ehdokkaat_ruudussa(idx)]
+    return found or ALL_DIGITS
+
+def place(tila, idx, digit):
+    merkki = tila.tallenna()
+    if not tila.aseta(idx, int(digit)):
+        tila.palauta(merkki)
+
+def resolve_cell(gray, vote, allowed, configs, templates=None):
+    vote = CandidateVote(allowed, vote.results)
+    if len(allowed) == 1 and vote.results:
+        count = len(vote.results)
+        return allowed[0], reliability_for_count(count), count
+    for cfg_idx, cfg in enumerate(configs):
+        if vote.settled(len(configs) - cfg_idx):
+            break
+        decided = vote.add(ocr_cell_text(gray, cfg))
+        if decided:
+            return decided
+    return vote.decide() or fallback_result(gray, templates)
+
+def recognize_grid(cells, templates=None, ocr_configs=None):
+    """Recognizes the 81 cells of a grid, given in row order.
+
+    Each cell is a preprocessed 64x64 gray image, or an already known
+    (value, reliability, ocr_count), e.g. from template matching. Returns
+    one (value, reliability, ocr_count) per cell.
+    """
+    ocr_configs = ocr_configs or load_ocr_configs()
+    cheap, extra = ocr_configs[:CHEAP_CONFIGS], ocr_configs[CHEAP_CONFIGS:]
+    results = [None] * len(cells)
+    votes = {}
+    for idx, cell in enumerate(cells):
+        if isinstance(cell, tuple):
+            results[idx] = cell
+        elif is_empty_cell(cell):
+            results[idx] = ('-', 'none', 0)
+        else:
+            vote, decided = cheap_pass(cell, cheap)
+            if decided:
+                results[idx] = decided
+            else:
+                votes[idx] = vote
+    tila = givens_state(results)
+    debug_print(f"[DEBUG] Constraint pass: {len(votes)} uncertain cells")
+    while votes:
+        idx = min(votes, key=lambda i: (len(candidates(tila, i)), i))
+        allowed = candidates(tila, idx)
+        results[idx] = resolve_cell(cells[idx], votes.pop(idx), allowed, extra, templates)
+        digit, reliability, ocr_count = results[idx]
+        forced = len(allowed) == 1 and digit == allowed[0] and ocr_count > 0
+        if tila is not None and digit.isdigit() and (forced or reliability in ('high', 'medium')):
+            place(tila, idx, digit)
+    return results
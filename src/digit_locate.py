@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+# Digit localization for a whole grid in one pass.
+#
+# The grid image is binarized once (ink is white), the grid lines are
+# removed with long morphological openings, and the remaining ink blobs
+# come from one connectedComponentsWithStats call. Every blob is assigned to
+# the cell under its centroid: a ninth of the image, or with the grid lines
+# of grid_lines.find_grid_lines the cell between the lines around it. A cell without a blob tall enough to be a
+# digit is empty and never goes to OCR; for the other cells the union of
+# their blobs gives a tight digit box, padded back to a square with margin.
+
+MIN_BLOB_AREA_FRAC = 0.002    # of the cell area, smaller blobs are specks
+MIN_DIGIT_HEIGHT_FRAC = 0.25  # of the cell height
+LINE_LENGTH_FRAC = 0.5        # of the cell size, opening kernel for grid lines
+BOX_MARGIN_FRAC = 0.25        # of the digit height, added around the tight box
+
+def binarize_grid(gray):
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return binary
+
+def remove_grid_lines(binary, cell_w, cell_h):
+    horizontal = cv2.getStructuringElement(cv2.MORPH_RECT, (max(int(cell_w * LINE_LENGTH_FRAC), 1), 1))
+    vertical = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(int(cell_h * LINE_LENGTH_FRAC), 1)))
+    lines = cv2.morphologyEx(binary, cv2.MORPH_OPEN, horizontal) | cv2.morphologyEx(binary, cv2.MORPH_OPEN, vertical)
+    return cv2.subtract(binary, lines)
+
+def padded_digit_box(x1, y1, x2, y2, img_w, img_h):
+    # square box around the digit, so preprocess_cell does not stretch it
+    side = int(max(x2 - x1, y2 - y1) * (1 + 2 * BOX_MARGIN_FRAC))
+    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+    bx1 = min(max(cx - side // 2, 0), img_w)
+    by1 = min(max(cy - side // 2, 0), img_h)
+    bx2 = min(max(cx - side // 2 + side, 0), img_w)
+    by2 = min(max(cy - side // 2 + side, 0), img_h)
+    return bx1, by1, bx2 - bx1, by2 - by1
+
+def cell_index(position, centers, cell):
+    """Row (or column) of a centroid position, or None outside the grid."""
+    if centers is None:
+        return int(position // cell)
+    index = int(np.searchsorted(centers, position)) - 1
+    return index if 0 <= index < len(centers) - 1 else None
+
+def locate_digits(img, grid_size=9, lines=None):
+    """Finds the digit in every cell of a grid image.
+
+    `lines` is the (rows, cols) of grid_lines.find_grid_lines; without it
+    the cells are the even ninths of the image. Returns a list of
+    grid_size*grid_size entries in row order: None for an empty cell, else
+    the (x, y, w, h) box around the digit.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    h, w = gray.shape
+    row_centers = col_centers = None
+    if lines is None:
+        cell_h = h // grid_size
+        cell_w = w // grid_size
+    else:
+        row_centers = [(start + end) / 2 for start, end in lines[0]]
+        col_centers = [(start + end) / 2 for start, end in lines[1]]
+        cell_h = max(int((row_centers[-1] - row_centers[0]) / grid_size), 1)
+        cell_w = max(int((col_centers[-1] - col_centers[0]) / grid_size), 1)
+    ink = remove_grid_lines(binarize_grid(gray), cell_w, cell_h)
+    n_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(ink, connectivity=8)
+
+    min_area = MIN_BLOB_AREA_FRAC * cell_w * cell_h
+    boxes = [None] * (grid_size * grid_size)
+    tall = [False] * (grid_size * grid_size)
+    for label in range(1, n_labels):
+        x, y, bw, bh, area = stats[label]
+        if area < min_area or bw > cell_w or bh > cell_h:
+            continue
+        col = cell_index(centroids[label][0], col_centers, cell_w)
+        row = cell_index(centroids[label][1], row_centers, cell_h)
+        if row is None or col is None or row >= grid_size or col >= grid_size:
+            continue
+        idx = row * grid_size + col
+        if boxes[idx] is None:
+            boxes[idx] = [x, y, x + bw, y + bh]
+        else:
+            box = boxes[idx]
+            boxes[idx] = [min(box[0], x), min(box[1], y), max(box[2], x + bw), max(box[3], y + bh)]
+        if bh >= MIN_DIGIT_HEIGHT_FRAC * cell_h:
+            tall[idx] = True
+
+    located = []
+    for idx, box in enumerate(boxes):
+        if box is None or not tall[idx]:
+            located.append(None)
+        else:
+            located.append(padded_digit_box(*box, w, h))
+    return located
@@ -0,0 +1,72 @@
+import numpy as np
+from cell_extract import is_empty_cell, recognize_gray_cached, debug_print
+
+# Glyph clustering: a booklet is printed with one font, so its non-empty
+# cells are a few distinct glyphs repeated many times. The cells are
+# clustered by normalized correlation of their 64x64 preprocessed images,
+# only the medoid of each cluster goes through the full OCR vote, and the
+# result is copied to the other members. Members that correlate poorly with
+# their medoid are outliers and are recognized on their own.
+
+CLUSTER_THRESHOLD = 0.9
+
+def normalized_vectors(grays):
+    """Rows of zero mean and unit length, so a dot product is the correlation."""
+    vectors = np.asarray(grays, dtype=np.float32).reshape(len(grays), -1)
+    vectors = vectors - vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+def cluster_vectors(vectors, threshold=CLUSTER_THRESHOLD):
+    """Greedy clustering: a vector joins the best correlating leader, or starts a cluster.
+
+    Returns a list of clusters, each a list of row indices.
+    """
+    leaders = np.empty((0, vectors.shape[1]), dtype=vectors.dtype)
+    clusters = []
+    for idx, vector in enumerate(vectors):
+        if len(clusters):
+            scores = leaders @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                clusters[best].append(idx)
+                continue
+        leaders = np.vstack([leaders, vector])
+        clusters.append([idx])
+    return clusters
+
+def medoid(vectors, members):
+    # the member with the highest summed correlation to all members
+    group = vectors[members]
+    return members[int(np.argmax(group @ group.sum(axis=0)))]
+
+def recognize_cells_clustered(grays, templates=None, cache=None, threshold=CLUSTER_THRESHOLD):
+    """Recognizes preprocessed cells, one OCR vote per cluster of similar glyphs.
+
+    Returns one (value, reliability, ocr_count) per cell, like
+    extract_and_recognize_cell.
+    """
+    results = [None] * len(grays)
+    ink = []
+    for idx, gray in enumerate(grays):
+        if is_empty_cell(gray):
+            results[idx] = ('-', 'none', 0)
+        else:
+            ink.append(idx)
+    if not ink:
+        return results
+    vectors = normalized_vectors([grays[idx] for idx in ink])
+    clusters = cluster_vectors(vectors, threshold)
+    outliers = 0
+    for members in clusters:
+        center = medoid(vectors, members)
+        result = recognize_gray_cached(grays[ink[center]], templates, cache)
+        scores = vectors[members] @ vectors[center]
+        for member, score in zip(members, scores):
+            if member == center or score >= threshold:
+                results[ink[member]] = result
+            else:
+                outliers += 1
+                results[ink[member]] = recognize_gray_cached(grays[ink[member]], templates, cache)
+    debug_print(f"[DEBUG] {len(ink)} cells in {len(clusters)} clusters, {outliers} outliers")
+    return results
@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+from digit_locate import binarize_grid
+
+# Grid line detection for exact cell boundaries.
+#
+# The grid image is binarized once (ink is white) and eroded with one long
+# horizontal and one long vertical kernel, which keeps only the grid lines
+# (an opening would also give them back their ends, the profiles do not need
+# them). Summing the horizontal lines over every row, and the vertical lines
+# over every column, gives two profiles where a grid line is a run of rows (or
+# columns) mostly covered with ink. The outermost runs are the border of
+# the grid, and of the runs between them the one nearest to each of the
+# grid_size+1 evenly spaced positions is taken as that line; a line not
+# found stays at the even position. Every cell is then cropped between its
+# own lines instead of a ninth of the image.
+
+LINE_LENGTH_FRAC = 0.5      # of the cell size, erosion kernel for grid lines
+LINE_FILL_FRAC = 0.5        # of the image width (height), ink needed in a line row (column)
+LINE_TOLERANCE_FRAC = 0.3   # of the cell size, how far a line may be from its even position
+MIN_GRID_FRAC = 0.5         # of the image size, spanned by the outer lines of a grid
+PADDING_FRAC = 0.2          # of the line spacing, trimmed from the line centers like grid_cell_boxes
+
+def line_mask(binary, cell_w, cell_h):
+    """The horizontal and the vertical grid lines of a binarized grid, shortened by the kernel."""
+    horizontal = cv2.getStructuringElement(cv2.MORPH_RECT, (max(int(cell_w * LINE_LENGTH_FRAC), 1), 1))
+    vertical = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(int(cell_h * LINE_LENGTH_FRAC), 1)))
+    return cv2.erode(binary, horizontal), cv2.erode(binary, vertical)
+
+def profile_runs(profile, limit):
+    """[start, end) of every run of profile values at or above limit."""
+    above = np.concatenate([[False], profile >= limit, [False]])
+    edges = np.flatnonzero(above[1:] != above[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+def run_center(run):
+    return (run[0] + run[1]) / 2
+
+def line_positions(profile, line_length, grid_size=9):
+    """[start, end) of the grid_size+1 lines along the profile, for lines
+    of line_length pixels. A line without a run near its even position gets
+    the empty run at that position.
+    """
+    length = len(profile)
+    runs = profile_runs(profile, LINE_FILL_FRAC * line_length)
+    first, last = 0, length
+    # the outer lines fix the even positions, unless they are too close to be the border
+    if len(runs) >= 2 and run_center(runs[-1]) - run_center(runs[0]) >= MIN_GRID_FRAC * length:
+        first, last = run_center(runs[0]), run_center(runs[-1])
+    cell = (last - first) / grid_size
+    lines = []
+    for k in range(grid_size + 1):
+        expected = min(int(round(first + k * cell)), length)
+        near = [run for run in runs if abs(run_center(run) - expected) <= LINE_TOLERANCE_FRAC * cell]
+        if near:
+            start, end = min(near, key=lambda run: abs(run_center(run) - expected))
+            lines.append((int(start), int(end)))
+        else:
+            lines.append((expected, expected))
+    return lines
+
+def find_grid_lines(img, grid_size=9):
+    """(rows, cols): [start, end) of the grid_size+1 horizontal and vertical lines."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    h, w = gray.shape
+    horizontal, vertical = line_mask(binarize_grid(gray), w // grid_size, h // grid_size)
+    rows = line_positions(horizontal.sum(axis=1, dtype=np.int64) // 255, w, grid_size)
+    cols = line_positions(vertical.sum(axis=0, dtype=np.int64) // 255, h, grid_size)
+    return rows, cols
+
+def span_between(line1, line2):
+    """[start, end) of the crop between two lines: PADDING_FRAC of their
+    spacing in from the line centers, but never on the lines themselves."""
+    center1 = run_center(line1)
+    center2 = run_center(line2)
+    pad = (center2 - center1) * PADDING_FRAC
+    start = max(int(center1 + pad), line1[1])
+    end = min(int(center2 - pad), line2[0])
+    if end <= start:
+        return line1[1], max(line2[0], line1[1] + 1)
+    return start, end
+
+def grid_line_boxes(img, grid_size=9, lines=None):
+    """Returns (row, col, x, y, w, h) for the crop of every cell between its grid lines, row by row.
+
+    `lines` is the (rows, cols) of find_grid_lines when already found.
+    """
+    rows, cols = lines or find_grid_lines(img, grid_size)
+    boxes = []
+    for row in range(grid_size):
+        y1, y2 = span_between(rows[row], rows[row + 1])
+        for col in range(grid_size):
+            x1, x2 = span_between(cols[col], cols[col + 1])
+            boxes.append((row, col, x1, y1, x2 - x1, y2 - y1))
+    return boxes
@@ -0,0 +1,220 @@
+# peruuttava haku ratkaisutilan päällä
+#
+# kun ratkaisija.py:n päättely ei enää löydä uusia numeroita, haku valitsee
+# ruudun, jossa on vähiten ehdokkaita, ja kokeilee ehdokkaita vuorotellen.
+# Jokainen kokeilu on haara, joka perutaan tilan polun avulla.
+#
+# umpikujaksi todetut tilat tallennetaan transpositiotauluun tilan
+# Zobrist-tiivisteellä. Yhden haun sisällä sama tila ei toistu, sillä
+# kaksi solmua eroavat aina yhteisen esi-isänsä haarautumisruudussa.
+# Taulu hyödyttää vasta, kun sama taulu annetaan usealle haulle samasta
+# ruudukosta: ratkeavat_numerot kokeilee jokaisen ruudun jokaista
+# ehdokasta omalla haullaan, ja haku, joka alkoi asettamalla a ja päätyi
+# asettamaan b:n, on samassa tilassa kuin b:stä alkanut haku, joka päätyi
+# a:han. Esim. AI Escargotissa tämä säästää noin viidenneksen solmuista.
+#
+# tiiviste riippuu vain asetetuista numeroista ja ruudukon koosta, ei
+# yksiköistä. Samaa taulua ei siis saa käyttää kahdelle rakenteelle,
+# joilla on sama koko mutta eri yksiköt (esim. tavallinen ja X-sudoku):
+# toisen umpikuja voi olla toisessa ratkeava tila.
+
+from collections import OrderedDict
+
+from ratkaisutila import Ratkaisutila, VAKIO, numerot_maskista
+
+
+class Transpositiotaulu:
+    """Rajattu joukko umpikujatilojen tiivisteitä.
+
+    Kun taulu täyttyy, siitä poistetaan pisimpään käyttämättä ollut tila.
+    Taulu kuuluu yhdelle rakenteelle, ks. tiedoston alku.
+    """
+
+    def __init__(self, koko=100000):
+        self.koko = koko
+        self.tilat = OrderedDict()
+        self.osumat = 0
+
+    def __len__(self):
+        return len(self.tilat)
+
+    def umpikuja(self, tiiviste):
+        if tiiviste in self.tilat:
+            self.tilat.move_to_end(tiiviste)
+            self.osumat += 1
+            return True
+        return False
+
+    def lisaa(self, tiiviste):
+        self.tilat[tiiviste] = True
+        self.tilat.move_to_end(tiiviste)
+        if len(self.tilat) > self.koko:
+            self.tilat.popitem(last=False)
+
+
+def tayta_yksinaiset(tila):
+    # asetetaan ruudut, joilla on vain yksi ehdokas, ja numerot, joilla on
+    # yksikössä vain yksi paikka, kunnes uusia ei löydy
+    rakenne = tila.rakenne
+    ruudut = tila.ruudut
+    ehdokkaat = tila.ehdokkaat
+    muuttui = True
+    while muuttui:
+        muuttui = False
+        for ruutu in range(rakenne.ruutuja):
+            if ruudut[ruutu] != 0:
+                continue
+            maski = ehdokkaat[ruutu]
+            if maski == 0:
+                return False
+            if maski & (maski - 1) == 0:
+                if not tila.aseta(ruutu, maski.bit_length()):
+                    return False
+                muuttui = True
+        for yksikko in rakenne.yksikot:
+            kerran = 0
+            useasti = 0
+            asetetut = 0
+            for ruutu in yksikko:
+                maski = ehdokkaat[ruutu]
+                if ruudut[ruutu] != 0:
+                    asetetut |= maski
+                    continue
+                useasti |= kerran & maski
+                kerran |= maski
+            if kerran | asetetut != rakenne.kaikki:
+                # jollekin numerolle ei ole paikkaa
+                return False
+            yksin = kerran & ~useasti & ~asetetut
+            while yksin:
+                b = yksin & -yksin
+                yksin ^= b
+                for ruutu in yksikko:
+                    if ruudut[ruutu] == 0 and ehdokkaat[ruutu] & b:
+                        if not tila.aseta(ruutu, b.bit_length()):
+                            return False
+                        muuttui = True
+                        break
+    return True
+
+
+def valitse_ruutu(tila):
+    # vähiten ehdokkaita, jolloin haara on mahdollisimman kapea
+    paras = None
+    paras_maara = None
+    for ruutu in range(tila.rakenne.ruutuja):
+        if tila.ruudut[ruutu] != 0:
+            continue
+        maara = bin(tila.ehdokkaat[ruutu]).count("1")
+        if paras_maara is None or maara < paras_maara:
+            paras = ruutu
+            paras_maara = maara
+            if maara == 2:
+                break
+    return paras
+
+
+# kuinka monen solmun välein keskeytyspyyntö tarkistetaan
+KESKEYTYS_VALI = 256
+
+
+class Haku:
+    """Etsii enintään `enintaan` ratkaisua. Kaksi riittää yksikäsitteisyyteen.
+
+    `keskeytys` on esim. multiprocessing.Event, jonka asettaminen lopettaa haun.
+    """
+
+    def __init__(self, enintaan=1, taulu=None, keskeytys=None):
+        self.enintaan = enintaan
+        self.taulu = taulu
+        self.keskeytys = keskeytys
+        self.ratkaisut = []
+        self.solmut = 0
+        self.keskeytetty = False
+
+    def hae(self, tila):
+        self._hae(tila)
+        return self.ratkaisut
+
+    def _hae(self, tila):
+        if len(self.ratkaisut) >= self.enintaan:
+            self.keskeytetty = True
+            return 0
+        self.solmut += 1
+        if self.keskeytys is not None and self.solmut % KESKEYTYS_VALI == 0 and self.keskeytys.is_set():
+            self.keskeytetty = True
+            return 0
+        tiiviste = tila.tiiviste
+        if self.taulu is not None and self.taulu.umpikuja(tiiviste):
+            return 0
+
+        merkki = tila.tallenna()
+        loydetty = 0
+        if tayta_yksinaiset(tila):
+            ruutu = valitse_ruutu(tila)
+            if ruutu is None:
+                self.ratkaisut.append(tila.ruudukoksi())
+                loydetty = 1
+            else:
+                for numero in numerot_maskista(tila.ehdokkaat[ruutu]):
+                    haaran_merkki = tila.tallenna()
+                    if tila.aseta(ruutu, numero):
+                        loydetty += self._hae(tila)
+                    tila.palauta(haaran_merkki)
+                    if self.keskeytetty:
+                        break
+        tila.palauta(merkki)
+
+        # keskeytetty haara ei todista mitään, joten sitä ei tallenneta
+        if loydetty == 0 and not self.keskeytetty and self.taulu is not None:
+            self.taulu.lisaa(tiiviste)
+        return loydetty
+
+
+def ratkaise(ruudukko, enintaan=1, taulu=None, rakenne=VAKIO):
+    """Palauttaa listan ratkaisuja ruudukko[x][y]-muodossa.
+
+    Ristiriitaisille annetuille numeroille palautetaan tyhjä lista.
+    """
+    try:
+        tila = Ratkaisutila(ruudukko, rakenne)
+    except ValueError:
+        return []
+    return Haku(enintaan, taulu).hae(tila)
+
+
+def onko_yksikasitteinen(ruudukko, taulu=None, rakenne=VAKIO):
+    return len(ratkaise(ruudukko, enintaan=2, taulu=taulu, rakenne=rakenne)) == 1
+
+
+def ratkeavat_numerot(ruudukko, taulu=None, rakenne=VAKIO):
+    """Palauttaa {(x, y): [numerot]} jokaiselle tyhjälle ruudulle: numerot,
+    joilla ruudukko vielä ratkeaa. Ruutu, jolla on yksi numero, on vihje.
+
+    Jokainen ehdokas kokeillaan omalla haullaan, ja kaikki haut jakavat
+    saman transpositiotaulun. Löydetyn ratkaisun numerot tiedetään
+    ratkeaviksi ilman omaa hakua. Ristiriitaiselle ruudukolle palautetaan
+    tyhjä sanakirja.
+    """
+    try:
+        tila = Ratkaisutila(ruudukko, rakenne)
+    except ValueError:
+        return {}
+    if taulu is None:
+        taulu = Transpositiotaulu()
+    koko = rakenne.koko
+    ratkeavat = set()
+    tulos = {}
+    for ruutu in tila.vapaat():
+        numerot = []
+        for numero in tila.ehdokkaat_ruudussa(ruutu):
+            if (ruutu, numero) not in ratkeavat:
+                merkki = tila.tallenna()
+                if tila.aseta(ruutu, numero):
+                    for ratkaisu in Haku(1, taulu).hae(tila):
+                        ratkeavat.update((x * koko + y, ratkaisu[x][y]) for x in range(koko) for y in range(koko))
+                tila.palauta(merkki)
+            if (ruutu, numero) in ratkeavat:
+                numerot.append(numero)
+        tulos[divmod(ruutu, koko)] = numerot
+    return tulos
@@ -0,0 +1,175 @@
+import os
+import argparse
+import threading
+import cv2
+import numpy as np
+from cell_extract import is_empty_cell, debug_print
+
+# Digit classifier on HOG features with cv2.ml, no tesseract.
+#
+# The HOG descriptor of a preprocessed 64x64 cell is classified either by
+# linear one-vs-rest SVMs, one per digit, or by k nearest neighbours. The
+# confidence is a margin: for the SVMs the decision value of the best digit
+# minus that of the runner-up, for KNN the share of the k neighbours voting
+# for the best digit minus the share of the runner-up. The model is trained
+# from the labeled cells of the test grids (like build_template_bank.py)
+# and the data/ templates, and saved as one OpenCV YAML file. With all
+# support vectors it is megabytes, so it is not shipped but trained first:
+#
+#   python3 src/hog_digits.py --model svm --grids logs/grids.txt
+#   python3 src/png_grid_extractor.py logs/png --ocr-mode hog
+
+MODEL_PATH = 'logs/hog_digits.yml.gz'
+KNN_K = 5
+# margin limits of the reliability classes; an SVM margin of 2 means the
+# best digit is beyond its margin and the runner-up beyond the other side
+MARGINS = {'svm': {'high': 2.0, 'medium': 1.0}, 'knn': {'high': 1.0, 'medium': 0.6}}
+
+HOG = cv2.HOGDescriptor((64, 64), (16, 16), (8, 8), (8, 8), 9)
+
+def hog_features(grays):
+    """One row of HOG features per preprocessed 64x64 cell."""
+    if not len(grays):
+        return np.empty((0, HOG.getDescriptorSize()), dtype=np.float32)
+    return np.array([HOG.compute(gray).ravel() for gray in grays], dtype=np.float32)
+
+class HogDigits:
+    """HOG classifier of kind 'svm' (one cv2.ml.SVM per label) or 'knn' (one cv2.ml.KNearest)."""
+    def __init__(self, kind, labels, models):
+        self.kind = kind
+        self.labels = [str(label) for label in labels]
+        self.models = models
+
+    @classmethod
+    def train(cls, samples, kind='svm', k=KNN_K):
+        labels = sorted({digit for digit, _ in samples})
+        x = hog_features([gray for _, gray in samples])
+        targets = np.array([labels.index(digit) for digit, _ in samples], dtype=np.int32)
+        if kind == 'knn':
+            knn = cv2.ml.KNearest_create()
+            knn.setDefaultK(k)
+            knn.train(x, cv2.ml.ROW_SAMPLE, targets.astype(np.float32))
+            return cls(kind, labels, [knn])
+        models = []
+        for idx in range(len(labels)):
+            svm = cv2.ml.SVM_create()
+            svm.setType(cv2.ml.SVM_C_SVC)
+            svm.setKernel(cv2.ml.SVM_LINEAR)
+            svm.setC(1.0)
+            svm.train(x, cv2.ml.ROW_SAMPLE, (targets == idx).astype(np.int32))
+            models.append(svm)
+        return cls(kind, labels, models)
+
+    @classmethod
+    def load(cls, path):
+        fs = cv2.FileStorage(path, cv2.FILE_STORAGE_READ)
+        if not fs.isOpened():
+            raise FileNotFoundError(f'HOG model not found: {path}, train it with src/hog_digits.py')
+        kind = fs.getNode('kind').string()
+        labels = fs.getNode('labels').string().split(',')
+        models = []
+        for idx in range(int(fs.getNode('model_count').real())):
+            model = cv2.ml.KNearest_create() if kind == 'knn' else cv2.ml.SVM_create()
+            model.read(fs.getNode(f'model_{idx}'))
+            models.append(model)
+        fs.release()
+        return cls(kind, labels, models)
+
+    def save(self, path):
+        fs = cv2.FileStorage(path, cv2.FILE_STORAGE_WRITE)
+        fs.write('kind', self.kind)
+        fs.write('labels', ','.join(self.labels))
+        fs.write('model_count', len(self.models))
+        for idx, model in enumerate(self.models):
+            model.write(fs, f'model_{idx}')
+        fs.release()
+
+    def scores(self, x):
+        """Score of every label for every row: SVM decision values or KNN vote shares."""
+        if self.kind == 'knn':
+            knn = self.models[0]
+            _, _, neighbours, _ = knn.findNearest(x, knn.getDefaultK())
+            scores = np.zeros((len(x), len(self.labels)), dtype=np.float32)
+            for row, votes in enumerate(neighbours.astype(int)):
+                np.add.at(scores[row], votes, 1.0 / len(votes))
+            return scores
+        # OpenCV gives negative raw values on the side of the larger class label, here the digit
+        return np.column_stack([-svm.predict(x, flags=cv2.ml.STAT_MODEL_RAW_OUTPUT)[1].ravel()
+                                for svm in self.models])
+
+    def predict(self, grays):
+        """(digit, margin) for every preprocessed cell, in one batch."""
+        if not len(grays):
+            return []
+        scores = self.scores(hog_features(grays))
+        ranked = np.sort(scores, axis=1)
+        best = np.argmax(scores, axis=1)
+        margins = ranked[:, -1] - ranked[:, -2] if scores.shape[1] > 1 else ranked[:, -1]
+        return [(self.labels[idx], float(margin)) for idx, margin in zip(best, margins)]
+
+    def reliability(self, margin):
+        limits = MARGINS[self.kind]
+        if margin >= limits['high']:
+            return 'high'
+        elif margin >= limits['medium']:
+            return 'medium'
+        return 'low'
+
+def load_model(path=MODEL_PATH):
+    """The model of `path`, loaded once per process."""
+    if not hasattr(load_model, "_cache"):
+        load_model._cache = {}
+        load_model._lock = threading.Lock()
+    with load_model._lock:
+        if path not in load_model._cache:
+            load_model._cache[path] = HogDigits.load(path)
+        return load_model._cache[path]
+
+def recognize_cells_hog(grays, templates=None, cache=None, model=None):
+    """Recognizes preprocessed cells with the HOG classifier, all in one batch.
+
+    Returns one (value, reliability, ocr_count) per cell, like
+    extract_and_recognize_cell; ocr_count is 0 as tesseract is not run.
+    """
+    model = model or load_model()
+    results = [('-', 'none', 0)] * len(grays)
+    ink = [idx for idx, gray in enumerate(grays) if not is_empty_cell(gray)]
+    for idx, (digit, margin) in zip(ink, model.predict([grays[idx] for idx in ink])):
+        debug_print(f"[DEBUG] HOG {model.kind}: {digit} with margin {margin:.3f}")
+        results[idx] = (digit, model.reliability(margin), 0)
+    return results
+
+def main():
+    # the labeled cells and their augmentation are shared with the other trained recognizers
+    from build_template_bank import harvest, EXPECTED_GRIDS, PNG_DIR, CELLS_DIR
+    from mlp_digits import template_samples, augmented
+    parser = argparse.ArgumentParser(description='Train the HOG digit classifier from labeled cells')
+    parser.add_argument('--model', choices=['svm', 'knn'], default='svm', help='Classifier on the HOG features')
+    parser.add_argument('--expected', default=EXPECTED_GRIDS, help='Expected grids of the test PNGs')
+    parser.add_argument('--png-dir', default=PNG_DIR, help='Folder of gridN.png for the expected grids')
+    parser.add_argument('--grids', action='append', default=[],
+                        help='grids.txt of a run; grids equal to an expected grid are harvested (repeatable)')
+    parser.add_argument('--cells', default=CELLS_DIR, help='Folder of labeled cell images')
+    parser.add_argument('--locate-digits', action='store_true',
+                        help='Crop cells like png_grid_extractor --locate-digits')
+    parser.add_argument('--grid-lines', action='store_true',
+                        help='Crop cells like png_grid_extractor --grid-lines')
+    parser.add_argument('--rectify', action='store_true',
+                        help='Crop cells like png_grid_extractor --rectify')
+    parser.add_argument('--copies', type=int, default=10, help='Augmented copies per labeled cell')
+    parser.add_argument('--out', default=MODEL_PATH, help='Output OpenCV YAML file (.yml or .yml.gz)')
+    args = parser.parse_args()
+
+    samples = harvest(args.expected, args.png_dir, args.grids, args.cells, args.locate_digits, args.grid_lines,
+                      args.rectify) + template_samples()
+    rng = np.random.default_rng(0)
+    training = [(digit, img) for digit, gray in samples for img in [gray] + augmented(gray, args.copies, rng)]
+    model = HogDigits.train(training, args.model)
+    predicted = model.predict([gray for _, gray in samples])
+    right = sum(digit == found for (digit, _), (found, _) in zip(samples, predicted))
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    model.save(args.out)
+    print(f'Trained {args.model} on {len(samples)} labeled cells, {right} read right, saved to {args.out}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# päättely ja haku kilpailevat samasta ruudukosta
+#
+# osa ruudukoista ratkeaa heti ratkaisija.py:n päättelyllä, osa jää jumiin
+# ja ratkeaa vain haulla. Vaikeutta ei tiedetä etukäteen, joten molemmat
+# ajetaan omissa prosesseissaan yhteisellä aikarajalla. Ensimmäinen
+# valmis ratkaisu voittaa, ja häviäjä lopetetaan.
+#
+# päättelyn jälki (log-viestit) otetaan talteen aina, kun päättely ehti
+# päättyä, vaikka haku olisi voittanut tai päättely jäänyt jumiin. Kun haku
+# voittaa, päättelyä odotetaan vielä JALJEN_ODOTUS sekuntia, jotta yhtä aikaa
+# valmistuneen päättelyn jälki ei jää jonoon.
+#
+# muunnelmissa haku käyttää annettua rakennetta. Päättely tuntee vain
+# tavallisen sudokun, joten sen ratkaisu kelpaa vain, jos se täyttää
+# myös muunnelman yksiköt; muuten voittaja on haku.
+
+import io
+import multiprocessing
+import queue
+import sys
+import time
+from contextlib import redirect_stdout
+
+import ratkaisija
+from ratkaisija import lue_ruudukko, ratkaise_sudoku, sudoku_valmis, tulosta_ruudukko
+from ratkaisutila import Ratkaisutila, Rakenne, VAKIO
+from yksikot import MUUNNELMAT
+from haku import ratkaise
+
+LOGIIKKA = "logiikka"
+HAKU = "haku"
+JALJEN_ODOTUS = 0.05
+
+
+class Tulos:
+    def __init__(self):
+        self.ratkaisu = None
+        self.voittaja = None
+        self.jalki = None
+        self.aika = 0.0
+
+    def __str__(self):
+        return f"voittaja {self.voittaja} aika {self.aika:.3f}s jälkeä {len(self.jalki or [])} riviä"
+
+
+def _kelvollinen(ruudukko, rakenne=VAKIO):
+    if not sudoku_valmis(ruudukko):
+        return False
+    try:
+        Ratkaisutila(ruudukko, rakenne)
+    except ValueError:
+        return False
+    return True
+
+
+def _logiikka(ruudukko, rakenne, jono):
+    ratkaisija.LOKI_TIEDOSTO = None
+    ratkaisija.jalki = []
+    # ratkaise_sudoku muuttaa ruudukkoa paikallaan
+    ruudukko = [list(rivi) for rivi in ruudukko]
+    ratkaisu = None
+    try:
+        with redirect_stdout(io.StringIO()):
+            ratkaise_sudoku(ruudukko)
+        if _kelvollinen(ruudukko, rakenne):
+            ratkaisu = ruudukko
+    except Exception as e:
+        # kaatunut päättely ei saa jättää hakua odottamaan aikarajaan asti
+        ratkaisija.jalki.append(f"Virhe päättelyssä: {e}")
+    jono.put((LOGIIKKA, ratkaisu, ratkaisija.jalki))
+
+
+def _haku(ruudukko, rakenne, jono):
+    ratkaisut = ratkaise(ruudukko, rakenne=rakenne)
+    jono.put((HAKU, ratkaisut[0] if ratkaisut else None, None))
+
+
+def kilpailuta(ruudukko, aikaraja=10.0, rakenne=VAKIO):
+    """Ajaa päättelyn ja haun rinnakkain ja palauttaa ensimmäisen ratkaisun.
+
+    Ratkaisun on täytettävä rakenteen yksiköt. Jos kumpikaan ei ratkaise
+    ruudukkoa aikarajassa, Tulos.ratkaisu on None.
+    """
+    alku = time.monotonic()
+    loppu = alku + aikaraja
+    jono = multiprocessing.Queue()
+    prosessit = [
+        multiprocessing.Process(target=_logiikka, args=(ruudukko, rakenne, jono), daemon=True),
+        multiprocessing.Process(target=_haku, args=(ruudukko, rakenne, jono), daemon=True),
+    ]
+    for prosessi in prosessit:
+        prosessi.start()
+
+    tulos = Tulos()
+    saapuneet = 0
+    while saapuneet < len(prosessit) and tulos.ratkaisu is None:
+        try:
+            nimi, ratkaisu, jalki = jono.get(timeout=max(loppu - time.monotonic(), 0))
+        except queue.Empty:
+            break
+        saapuneet += 1
+        if nimi == LOGIIKKA:
+            tulos.jalki = jalki
+        if ratkaisu is not None:
+            tulos.ratkaisu = ratkaisu
+            tulos.voittaja = nimi
+    tulos.aika = time.monotonic() - alku
+
+    # päättely voi valmistua samaan aikaan kuin haku, jolloin jälki otetaan talteen
+    odotus_loppu = time.monotonic() + JALJEN_ODOTUS
+    while tulos.jalki is None and saapuneet < len(prosessit):
+        # päättynyt päättely on jo laittanut tuloksensa jonoon
+        odotus = max(odotus_loppu - time.monotonic(), 0) if prosessit[0].is_alive() else 1.0
+        try:
+            nimi, _, jalki = jono.get(timeout=odotus)
+        except queue.Empty:
+            break
+        saapuneet += 1
+        if nimi == LOGIIKKA:
+            tulos.jalki = jalki
+
+    for prosessi in prosessit:
+        if prosessi.is_alive():
+            prosessi.terminate()
+        prosessi.join()
+    return tulos
+
+
+# python3 src/kilpailu.py ruudukko.txt [aikaraja] [tavallinen|x|windoku]
+if __name__ == "__main__":
+    with open(sys.argv[1], encoding="utf-8") as f:
+        ruudukko = lue_ruudukko(f.read())
+    aikaraja = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    muunnelma = sys.argv[3] if len(sys.argv) > 3 else "tavallinen"
+    rakenne = VAKIO if muunnelma == "tavallinen" else Rakenne(MUUNNELMAT[muunnelma]())
+    ratkaisija.LOKI_TIEDOSTO = None
+    tulos = kilpailuta(ruudukko, aikaraja, rakenne)
+    print(tulos)
+    for rivi in tulos.jalki or []:
+        print(rivi)
+    if tulos.ratkaisu is not None:
+        tulosta_ruudukko(tulos.ratkaisu)
+    else:
+        print("Ei ratkaisua aikarajassa")
@@ -0,0 +1,198 @@
+import os
+import argparse
+import threading
+from glob import glob
+import cv2
+import numpy as np
+from cell_extract import is_empty_cell, debug_print
+
+# Digit classifier as a small NumPy MLP, no tesseract.
+#
+# A preprocessed 64x64 cell is shrunk to 28x28 with ink as 1.0, and one
+# hidden layer of ReLUs feeds a softmax over the digits 1-9. Inference over
+# all cells of a grid, or of many grids, is two matrix products. The
+# weights are trained offline from the labeled cells of the test grids
+# (the same ones build_template_bank.py uses) and the digit templates in
+# data/, with shifted and noisy copies, and shipped as data/mlp_digits.npz:
+#
+#   python3 src/mlp_digits.py --grids logs/grids.txt --out data/mlp_digits.npz
+#   python3 src/png_grid_extractor.py logs/png --ocr-mode mlp
+
+MODEL_PATH = 'data/mlp_digits.npz'
+TEMPLATE_DIR = 'data'
+INPUT_SIZE = 28
+HIDDEN = 64
+# softmax probability limits of the reliability classes
+HIGH_PROBABILITY = 0.98
+MEDIUM_PROBABILITY = 0.9
+
+def features(grays):
+    """Rows of INPUT_SIZE*INPUT_SIZE floats, ink 1.0 and paper 0.0."""
+    rows = [cv2.resize(gray, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_AREA) for gray in grays]
+    rows = np.asarray(rows, dtype=np.float32).reshape(len(grays), -1)
+    return 1.0 - rows / 255.0
+
+def softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class MlpDigits:
+    """One hidden layer MLP over cell features, saved as one .npz file."""
+    def __init__(self, w1, b1, w2, b2, labels):
+        self.w1 = np.asarray(w1, dtype=np.float32)
+        self.b1 = np.asarray(b1, dtype=np.float32)
+        self.w2 = np.asarray(w2, dtype=np.float32)
+        self.b2 = np.asarray(b2, dtype=np.float32)
+        self.labels = [str(label) for label in labels]
+
+    @classmethod
+    def random(cls, labels, inputs=INPUT_SIZE * INPUT_SIZE, hidden=HIDDEN, seed=0):
+        rng = np.random.default_rng(seed)
+        w1 = rng.normal(0, np.sqrt(2.0 / inputs), (inputs, hidden))
+        w2 = rng.normal(0, np.sqrt(2.0 / hidden), (hidden, len(labels)))
+        return cls(w1, np.zeros(hidden), w2, np.zeros(len(labels)), labels)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['w1'], data['b1'], data['w2'], data['b2'], data['labels'])
+
+    def save(self, path):
+        np.savez_compressed(path, w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2, labels=np.array(self.labels))
+
+    def probabilities(self, x):
+        hidden = np.maximum(x @ self.w1 + self.b1, 0.0)
+        return softmax(hidden @ self.w2 + self.b2)
+
+    def predict(self, grays):
+        """(digit, probability) for every preprocessed cell, in one batch."""
+        if not len(grays):
+            return []
+        probs = self.probabilities(features(grays))
+        best = np.argmax(probs, axis=1)
+        return [(self.labels[idx], float(probs[row, idx])) for row, idx in enumerate(best)]
+
+    def train(self, x, y, epochs=60, batch_size=64, learning_rate=0.05, weight_decay=1e-4, seed=0):
+        """Mini-batch SGD with momentum on cross-entropy; y holds label indices."""
+        rng = np.random.default_rng(seed)
+        params = [self.w1, self.b1, self.w2, self.b2]
+        velocity = [np.zeros_like(param) for param in params]
+        for epoch in range(epochs):
+            order = rng.permutation(len(x))
+            for start in range(0, len(x), batch_size):
+                batch = order[start:start + batch_size]
+                xb, yb = x[batch], y[batch]
+                pre = xb @ self.w1 + self.b1
+                hidden = np.maximum(pre, 0.0)
+                probs = softmax(hidden @ self.w2 + self.b2)
+                d_logits = probs
+                d_logits[np.arange(len(batch)), yb] -= 1.0
+                d_logits /= len(batch)
+                d_hidden = (d_logits @ self.w2.T) * (pre > 0)
+                grads = [xb.T @ d_hidden + weight_decay * self.w1, d_hidden.sum(axis=0),
+                         hidden.T @ d_logits + weight_decay * self.w2, d_logits.sum(axis=0)]
+                for param, grad, vel in zip(params, grads, velocity):
+                    vel *= 0.9
+                    vel -= learning_rate * grad
+                    param += vel
+        return self
+
+def load_model(path=MODEL_PATH):
+    """The model of `path`, loaded once per process."""
+    if not hasattr(load_model, "_cache"):
+        load_model._cache = {}
+        load_model._lock = threading.Lock()
+    with load_model._lock:
+        if path not in load_model._cache:
+            load_model._cache[path] = MlpDigits.load(path)
+        return load_model._cache[path]
+
+def reliability_for_probability(probability):
+    if probability >= HIGH_PROBABILITY:
+        return 'high'
+    elif probability >= MEDIUM_PROBABILITY:
+        return 'medium'
+    return 'low'
+
+def recognize_cells_mlp(grays, templates=None, cache=None, model=None):
+    """Recognizes preprocessed cells with the MLP, all in one batch.
+
+    Returns one (value, reliability, ocr_count) per cell, like
+    extract_and_recognize_cell; ocr_count is 0 as tesseract is not run.
+    """
+    model = model or load_model()
+    results = [('-', 'none', 0)] * len(grays)
+    ink = [idx for idx, gray in enumerate(grays) if not is_empty_cell(gray)]
+    for idx, (digit, probability) in zip(ink, model.predict([grays[idx] for idx in ink])):
+        debug_print(f"[DEBUG] MLP: {digit} with probability {probability:.3f}")
+        results[idx] = (digit, reliability_for_probability(probability), 0)
+    return results
+
+def template_samples(template_dir=TEMPLATE_DIR):
+    samples = []
+    for path in sorted(glob(os.path.join(template_dir, '*.png'))):
+        digit = os.path.splitext(os.path.basename(path))[0]
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if digit.isdigit() and img is not None:
+            samples.append((digit, cv2.resize(img, (64, 64), interpolation=cv2.INTER_LINEAR)))
+    return samples
+
+def augmented(gray, copies, rng):
+    """Shifted, scaled and noisy copies of a 64x64 cell."""
+    result = []
+    for _ in range(copies):
+        scale = rng.uniform(0.9, 1.1)
+        dx, dy = rng.uniform(-4, 4, 2)
+        matrix = cv2.getRotationMatrix2D((32, 32), rng.uniform(-3, 3), scale)
+        matrix[:, 2] += (dx, dy)
+        img = cv2.warpAffine(gray, matrix, (64, 64), borderMode=cv2.BORDER_REPLICATE)
+        noise = rng.normal(0, 8, img.shape)
+        result.append(np.clip(img + noise, 0, 255).astype(np.uint8))
+    return result
+
+def training_set(samples, labels, copies=20, seed=0):
+    rng = np.random.default_rng(seed)
+    grays, targets = [], []
+    for digit, gray in samples:
+        for img in [gray] + augmented(gray, copies, rng):
+            grays.append(img)
+            targets.append(labels.index(digit))
+    return features(grays), np.array(targets)
+
+def train_model(samples, copies=20, epochs=60, seed=0):
+    labels = sorted({digit for digit, _ in samples})
+    x, y = training_set(samples, labels, copies, seed)
+    return MlpDigits.random(labels, seed=seed).train(x, y, epochs=epochs, seed=seed)
+
+def main():
+    # the harvesting of labeled cells is shared with the template bank builder
+    from build_template_bank import harvest, EXPECTED_GRIDS, PNG_DIR, CELLS_DIR
+    parser = argparse.ArgumentParser(description='Train the NumPy MLP digit classifier from labeled cells')
+    parser.add_argument('--expected', default=EXPECTED_GRIDS, help='Expected grids of the test PNGs')
+    parser.add_argument('--png-dir', default=PNG_DIR, help='Folder of gridN.png for the expected grids')
+    parser.add_argument('--grids', action='append', default=[],
+                        help='grids.txt of a run; grids equal to an expected grid are harvested (repeatable)')
+    parser.add_argument('--cells', default=CELLS_DIR, help='Folder of labeled cell images')
+    parser.add_argument('--locate-digits', action='store_true',
+                        help='Crop cells like png_grid_extractor --locate-digits')
+    parser.add_argument('--grid-lines', action='store_true',
+                        help='Crop cells like png_grid_extractor --grid-lines')
+    parser.add_argument('--rectify', action='store_true',
+                        help='Crop cells like png_grid_extractor --rectify')
+    parser.add_argument('--copies', type=int, default=20, help='Augmented copies per labeled cell')
+    parser.add_argument('--epochs', type=int, default=60, help='Training epochs')
+    parser.add_argument('--out', default=MODEL_PATH, help='Output .npz file')
+    args = parser.parse_args()
+
+    samples = harvest(args.expected, args.png_dir, args.grids, args.cells, args.locate_digits, args.grid_lines,
+                      args.rectify) + template_samples()
+    model = train_model(samples, args.copies, args.epochs)
+    predicted = model.predict([gray for _, gray in samples])
+    right = sum(digit == found for (digit, _), (found, _) in zip(samples, predicted))
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    model.save(args.out)
+    print(f'Trained on {len(samples)} labeled cells, {right} read right, saved to {args.out}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import numpy as np
+import pytesseract
+from cell_extract import tesseract_config, recognize_grays_batched
+
+# Montage OCR: instead of one tesseract process per cell and config, all
+# non-empty preprocessed cells are tiled into one image with known spacing.
+# Each config runs once over the montage with image_to_data, and the word
+# boxes are mapped back to cells by their centre point. The per-cell texts
+# then go through the same OcrVote as extract_and_recognize_cell, except
+# that configs which become the same montage call are read and voted once.
+
+TILE_SIZE = 64
+TILE_GAP = 32
+MONTAGE_COLUMNS = 9
+# Line and single character modes get one row of tiles. Tesseract cannot
+# read a montage as a single character or word, so psm 8, 10 and 13 are
+# run as a line, and are then the same call as psm 7 with that oem and
+# threshold.
+LINE_PSMS = (7, 8, 10, 13)
+MONTAGE_PSM = {8: 7, 10: 7, 13: 7}
+MAX_ROW_TILES = 100
+MAX_GRID_TILES = 405
+
+def montage_columns(n_tiles, psm):
+    if psm in LINE_PSMS:
+        return max(n_tiles, 1)
+    return MONTAGE_COLUMNS
+
+def build_montage(images, columns, background):
+    """Tiles equal sized images into rows of `columns` with TILE_GAP between them."""
+    pitch = TILE_SIZE + TILE_GAP
+    rows = (len(images) + columns - 1) // columns
+    montage = np.full((rows * pitch + TILE_GAP, columns * pitch + TILE_GAP), background, dtype=np.uint8)
+    for idx, img in enumerate(images):
+        row, col = divmod(idx, columns)
+        y = TILE_GAP + row * pitch
+        x = TILE_GAP + col * pitch
+        montage[y:y+TILE_SIZE, x:x+TILE_SIZE] = img
+    return montage
+
+def tile_index(left, top, width, height, columns, n_tiles):
+    pitch = TILE_SIZE + TILE_GAP
+    cx = left + width / 2 - TILE_GAP / 2
+    cy = top + height / 2 - TILE_GAP / 2
+    col = int(cx // pitch)
+    row = int(cy // pitch)
+    if col < 0 or row < 0 or col >= columns:
+        return None
+    idx = row * columns + col
+    return idx if idx < n_tiles else None
+
+def texts_from_data(data, columns, n_tiles):
+    """Joins the recognized words of each tile from image_to_data output, left to right."""
+    words = [[] for _ in range(n_tiles)]
+    for i, text in enumerate(data['text']):
+        text = str(text).strip()
+        if not text:
+            continue
+        idx = tile_index(data['left'][i], data['top'][i], data['width'][i], data['height'][i], columns, n_tiles)
+        if idx is not None:
+            words[idx].append((data['left'][i], text))
+    return [''.join(text for _, text in sorted(tile_words)) for tile_words in words]
+
+def montage_read(psm, oem, thresh):
+    """The tesseract call a config really makes over a montage."""
+    return MONTAGE_PSM.get(psm, psm), oem, thresh
+
+def ocr_montage(images, psm, oem, background):
+    columns = montage_columns(len(images), psm)
+    montage = build_montage(images, columns, background)
+    config_str = tesseract_config(MONTAGE_PSM.get(psm, psm), oem)
+    data = pytesseract.image_to_data(montage, config=config_str, output_type=pytesseract.Output.DICT)
+    return texts_from_data(data, columns, len(images))
+
+def chunk_size(psm):
+    return MAX_ROW_TILES if psm in LINE_PSMS else MAX_GRID_TILES
+
+def read_montage_texts(images, psm, oem, thresh):
+    background = 255 if thresh is None else 0
+    size = chunk_size(psm)
+    texts = []
+    for start in range(0, len(images), size):
+        texts.extend(ocr_montage(images[start:start+size], psm, oem, background))
+    return texts
+
+def recognize_cells_montage(grays, templates=None, ocr_configs=None, cache=None):
+    """Recognizes a list of preprocessed 64x64 cells, possibly from many grids.
+
+    Returns one (value, reliability, ocr_count) per cell, like
+    extract_and_recognize_cell.
+    """
+    return recognize_grays_batched(grays, read_montage_texts, templates, ocr_configs, cache, 'montage', montage_read)
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+# Cache of OCR results for preprocessed cells.
+#
+# A booklet is printed with one font, so the same glyph is read again and
+# again. The cache key is an average hash of the 64x64 cell from
+# preprocess_cell: the cell is shrunk to HASH_SIZE x HASH_SIZE and each bit
+# tells whether that block is darker than the mean, i.e. mostly ink. Scanning
+# noise flips only blocks on the glyph edges, so a lookup looks at the
+# stored hashes within `tolerance` bits.
+#
+# Hash bits alone do not tell digits apart safely: on the labeled cells of
+# the test grids the closest pair of different digits is 7 bits apart,
+# while a half of the pairs of the same digit differ in 13 bits or more.
+# So every entry keeps the shrunk cell it was hashed from, and a near
+# hash is a hit only when the two shrunk cells correlate at least
+# MIN_CORRELATION (different digits there reach 0.944). The nearest such
+# entry is returned. With the correlation check the tolerance can be
+# wider: 12 bits finds 29% of the same digit pairs, 6 bits found 21%.
+#
+# Near hashes are found with a band index: the hash is split into
+# tolerance+1 bands, and two hashes that differ in at most `tolerance` bits
+# must agree on at least one whole band.
+#
+# Every entry belongs to the namespace of the recognizer that read it, as
+# e.g. a confidence read is not the same as the full vote of the cell mode,
+# and a lookup only sees its own namespace. Results with reliability 'none'
+# or 'low' are not cached: a guess would never be read again.
+
+HASH_SIZE = 16
+HASH_BITS = HASH_SIZE * HASH_SIZE
+DEFAULT_TOLERANCE = 12
+MIN_CORRELATION = 0.96      # of the shrunk cells, for a hash hit
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_NAMESPACE = 'vote'
+UNCACHED_RELIABILITY = ('none', 'low')
+
+def cell_thumbnail(gray):
+    return cv2.resize(gray, (HASH_SIZE, HASH_SIZE), interpolation=cv2.INTER_AREA)
+
+def thumbnail_hash(small):
+    bits = (small < small.mean()).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def cell_hash(gray):
+    return thumbnail_hash(cell_thumbnail(gray))
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def correlation(small1, small2):
+    """TM_CCOEFF_NORMED of two shrunk cells, 0.0 when one is constant."""
+    a = small1.astype(np.float32).ravel()
+    b = small2.astype(np.float32).ravel()
+    a -= a.mean()
+    b -= b.mean()
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(a @ b / norm) if norm > 0 else 0.0
+
+class CellCache:
+    """Size bounded LRU of (value, reliability, ocr_count) by namespace and cell hash, saved as JSON.
+
+    Every entry is (result, shrunk cell), the shrunk cell checks a hit.
+
+    get() and put() are thread safe. Entries added since the last
+    take_new() can be sent from a worker process to the parent, which
+    merges them with update() and writes the file with save().
+    """
+    def __init__(self, path=None, tolerance=DEFAULT_TOLERANCE, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.tolerance = tolerance
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.bands = {}
+        self.new = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        band_count = tolerance + 1
+        self.band_slices = [(HASH_BITS * i // band_count, HASH_BITS * (i + 1) // band_count)
+                            for i in range(band_count)]
+        if path and os.path.exists(path):
+            self.load()
+
+    def band_keys(self, key):
+        namespace, value = key
+        keys = []
+        for idx, (start, end) in enumerate(self.band_slices):
+            band = (value >> (HASH_BITS - end)) & ((1 << (end - start)) - 1)
+            keys.append((namespace, idx, band))
+        return keys
+
+    def _find(self, key, small):
+        near = {key} if key in self.entries else set()
+        for band_key in self.band_keys(key):
+            near.update(other for other in self.bands.get(band_key, ())
+                        if hamming(key[1], other[1]) <= self.tolerance)
+        for other in sorted(near, key=lambda other: hamming(key[1], other[1])):
+            if correlation(small, self.entries[other][1]) >= MIN_CORRELATION:
+                return other
+        return None
+
+    def _store(self, key, result, small):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        else:
+            for band_key in self.band_keys(key):
+                self.bands.setdefault(band_key, set()).add(key)
+        self.entries[key] = (tuple(result), small)
+        while len(self.entries) > self.max_entries:
+            old, _ = self.entries.popitem(last=False)
+            for band_key in self.band_keys(old):
+                self.bands[band_key].discard(old)
+
+    def get(self, gray, namespace=DEFAULT_NAMESPACE):
+        small = cell_thumbnail(gray)
+        key = (namespace, thumbnail_hash(small))
+        with self.lock:
+            found = self._find(key, small)
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(found)
+            return self.entries[found][0]
+
+    def put(self, gray, result, namespace=DEFAULT_NAMESPACE):
+        if result[1] in UNCACHED_RELIABILITY:
+            return
+        small = cell_thumbnail(gray)
+        key = (namespace, thumbnail_hash(small))
+        with self.lock:
+            self._store(key, result, small)
+            self.new[key] = (tuple(result), small)
+
+    def take_new(self):
+        with self.lock:
+            new, self.new = self.new, {}
+            return new
+
+    def update(self, entries):
+        with self.lock:
+            for key, (result, small) in entries.items():
+                self._store(key, result, small)
+
+    def load(self):
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        # stored oldest first, so the LRU order survives a reload
+        for namespace, thumbnail, result in data['entries']:
+            small = np.frombuffer(bytes.fromhex(thumbnail), dtype=np.uint8).reshape(HASH_SIZE, HASH_SIZE)
+            self._store((namespace, thumbnail_hash(small)), result, small)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            data = {'hash_size': HASH_SIZE,
+                    'entries': [[namespace, small.tobytes().hex(), list(result)]
+                                for (namespace, _), (result, small) in self.entries.items()]}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
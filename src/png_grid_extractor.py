@@ -4,9 +4,23 @@ import sys
 import cv2
 import logging
 from glob import glob
-from cell_extract import extract_and_recognize_cell
+from cell_extract import (recognize_gray_cached, preprocess_cells, CellStack, recognize_cells_listfile,
+                          load_ocr_configs, TemplateBank, template_bank)
+from montage_ocr import recognize_cells_montage
+from ocr_cache import CellCache, DEFAULT_TOLERANCE
+from glyph_cluster import recognize_cells_clustered
+from digit_locate import locate_digits
+from grid_lines import grid_line_boxes, find_grid_lines
+from rectify import rectify_grid
+from constraint_ocr import recognize_grid
+from confidence_ocr import recognize_cells_confidence
+from mlp_digits import recognize_cells_mlp
+from hog_digits import recognize_cells_hog
+from recognizers import recognize_cells_cascade, load_cascade
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
 import re
 
 TEMPLATE_DIR = 'data'
@@ -17,16 +31,19 @@ LOG_FILE = os.path.join(LOGS_DIR, 'png_grid_extractor.log')
 GRID_SIZE = 9
 PADDING_FRAC = 0.2
 
-# Setup logging
-os.makedirs(LOGS_DIR, exist_ok=True)
-# Empty the log file at start
-with open(LOG_FILE, 'w') as f:
-    pass
-logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(levelname)s %(message)s')
+LOG_FORMAT = '%(levelname)s %(message)s'
 
-# Empty the grids.txt at start
-with open(GRIDS_TXT, 'w') as f:
-    pass
+def setup_output():
+    # Done in main, not at import, so that worker processes do not empty the files
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    # Empty the log file at start
+    with open(LOG_FILE, 'w') as f:
+        pass
+    logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format=LOG_FORMAT)
+
+    # Empty the grids.txt at start
+    with open(GRIDS_TXT, 'w') as f:
+        pass
 
 # Load templates
 import numpy as np
@@ -39,9 +56,30 @@ for path in glob(os.path.join(TEMPLATE_DIR, '*.png')):
             tmpl_img = cv2.resize(tmpl_img, (64, 64), interpolation=cv2.INTER_LINEAR)
             _, tmpl_bin = cv2.threshold(tmpl_img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
             TEMPLATES[digit] = tmpl_bin
+# stacked once, so template matching is one matrix product per batch of cells
+TEMPLATES = TemplateBank(TEMPLATES)
+
+# OCR result cache, set up in main (or init_worker) when --cache is given
+CACHE = None
 
 timing_info = {'start_time': None, 'file_times': [], 'total_files': 0}
 
+class ReadOptions:
+    """How the grids are read: the OCR mode and the cropping options of the command line."""
+    def __init__(self, ocr_mode='cell', threads=1, locate=False, template_first=False, find_lines=False,
+                 rectify=False):
+        self.ocr_mode = ocr_mode
+        self.threads = threads
+        self.locate = locate
+        self.template_first = template_first
+        self.find_lines = find_lines
+        self.rectify = rectify
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(args.ocr_mode, args.threads, args.locate_digits, args.template_first, args.grid_lines,
+                   args.rectify)
+
 def format_hms(seconds):
     seconds = int(round(seconds))
     h = seconds // 3600
@@ -77,15 +115,27 @@ def log_timing(timing):
     logging.info(log_line)
     print(log_line)
 
-def process_grid_image(img_path, templates):
-    grid_start_time = time.time()
+def read_grid_image(img_path):
     img = cv2.imread(img_path)
     if img is None:
         raise FileNotFoundError(f'Image not found: {img_path}')
+    return img
+
+def rectified_grid_image(img, img_path):
+    """The grid of a photo or skewed scan warped to a square, the transform logged."""
+    rectified, matrix = rectify_grid(img, GRID_SIZE)
+    if matrix is None:
+        logging.warning(f'No grid border found in {img_path}, not rectified')
+        return img
+    logging.info(f'Rectified {img_path} to {rectified.shape[1]}x{rectified.shape[0]} with perspective transform {matrix.round(6).tolist()}')
+    return rectified
+
+def grid_cell_boxes(img):
+    """Returns (row, col, x, y, w, h) for the padded crop of every cell, row by row."""
     h, w = img.shape[:2]
     cell_h = h // GRID_SIZE
     cell_w = w // GRID_SIZE
-    grid = [['-' for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+    boxes = []
     for row in range(GRID_SIZE):
         for col in range(GRID_SIZE):
             x1 = col * cell_w
@@ -98,25 +148,258 @@ def process_grid_image(img_path, templates):
             py1 = min(max(y1 + pad_y, 0), h)
             px2 = min(max(x2 - pad_x, 0), w)
             py2 = min(max(y2 - pad_y, 0), h)
-            try:
-                cell_start_time = time.time()
-                val, reliability, ocr_count = extract_and_recognize_cell(
-                    img, px1, py1, px2-px1, py2-py1, templates=templates)
-                cell_time = time.time() - cell_start_time
-                logging.info(f'Cell ({row},{col}) extraction time: {cell_time:.3f}s (time in seconds to extract and recognize this cell)')
-                ocr_timing_str = f"ocr_timing={cell_time:.1f}s"
-                if val == '-':
-                    logging.info(f'Cell ({row},{col}) at (x={px1}, y={py1}, w={px2-px1}, h={py2-py1}): empty {ocr_timing_str}')
-                else:
-                    logging.info(f'Cell ({row},{col}) at (x={px1}, y={py1}, w={px2-px1}, h={py2-py1}): {val} (reliability={reliability}, ocr_count={ocr_count}) {ocr_timing_str}')
-            except Exception as e:
-                logging.error(f'Cell ({row},{col}) in {img_path} failed: {e}')
-                val = '-'
-            grid[row][col] = val
+            boxes.append((row, col, px1, py1, px2-px1, py2-py1))
+    return boxes
+
+def located_cell_boxes(img, find_lines=False):
+    """Like grid_cell_boxes, but digit cells get the tight box from one
+    connected component pass over the grid. Also returns which cells are empty.
+    With find_lines, the digits are put in the cells between the grid lines."""
+    if find_lines:
+        lines = find_grid_lines(img, GRID_SIZE)
+        boxes = grid_line_boxes(img, GRID_SIZE, lines)
+    else:
+        lines = None
+        boxes = grid_cell_boxes(img)
+    located = locate_digits(img, GRID_SIZE, lines)
+    empty = [loc is None for loc in located]
+    boxes = [box if loc is None else box[:2] + loc for box, loc in zip(boxes, located)]
+    return boxes, empty
+
+def cell_boxes(img, locate=False, find_lines=False):
+    if locate:
+        return located_cell_boxes(img, find_lines)
+    boxes = grid_line_boxes(img, GRID_SIZE) if find_lines else grid_cell_boxes(img)
+    return boxes, [False] * len(boxes)
+
+def grid_cells(img, boxes):
+    """All cells of a grid preprocessed at once, with the binarized stacks the OCR configs use."""
+    return CellStack(preprocess_cells(img, [box[2:] for box in boxes]))
+
+def known_results(cells, empty, templates, template_first=False):
+    """Results decided before OCR, None for the cells that still need it.
+
+    Cells found empty by localization are known. With template_first, all
+    other cells of the grid are matched against the template bank at once,
+    and the cells with a clear match are known too.
+    """
+    known = [('-', 'none', 0, 0.0, None) if is_empty else None for is_empty in empty]
+    if template_first:
+        todo = [idx for idx, result in enumerate(known) if result is None]
+        for idx, digit in zip(todo, template_bank(templates).match_first(cells.take(todo))):
+            if digit is not None:
+                known[idx] = (digit, 'template', 0, 0.0, None)
+    return known
+
+def unknown_cells(cells, known):
+    return cells.take([idx for idx, result in enumerate(known) if result is None])
+
+def with_known_cells(known, results):
+    results = iter(results)
+    return [next(results) if result is None else result for result in known]
+
+def recognize_box(gray, templates, cache=None):
+    cell_start_time = time.perf_counter()
+    try:
+        val, reliability, ocr_count = recognize_gray_cached(gray, templates, cache)
+        error = None
+    except Exception as e:
+        val, reliability, ocr_count, error = '-', 'none', 0, e
+    return val, reliability, ocr_count, time.perf_counter() - cell_start_time, error
+
+def recognize_cells_one_by_one(cells, templates, threads=1, cache=None):
+    """Recognizes preprocessed cells separately, in `threads` threads when more than one.
+
+    Tesseract runs as a subprocess, so the threads mostly wait with the GIL
+    released. Results keep the order of `cells` and nothing is logged here,
+    so build_grid writes the same log in any thread count.
+    """
+    if threads <= 1:
+        return [recognize_box(gray, templates, cache) for gray in cells]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda gray: recognize_box(gray, templates, cache), cells))
+
+BATCH_RECOGNIZERS = {
+    'montage': recognize_cells_montage,
+    'listfile': recognize_cells_listfile,
+    'cluster': recognize_cells_clustered,
+    'confidence': recognize_cells_confidence,
+    'mlp': recognize_cells_mlp,
+    'hog': recognize_cells_hog,
+    'cascade': recognize_cells_cascade,
+}
+
+def recognize_cells_batched(stacks, templates, ocr_mode, cache=None):
+    """Batch OCR over the cell stacks of one or more grids, results split back per grid."""
+    start_time = time.perf_counter()
+    grays = stacks[0] if len(stacks) == 1 else CellStack.concatenate(stacks)
+    recognized = BATCH_RECOGNIZERS[ocr_mode](grays, templates=templates, cache=cache)
+    # per-cell time is not measurable in a batch, log the mean instead
+    cell_time = (time.perf_counter() - start_time) / max(len(grays), 1)
+    results = []
+    offset = 0
+    for cells in stacks:
+        results.append([(val, reliability, ocr_count, cell_time, None)
+                        for val, reliability, ocr_count in recognized[offset:offset+len(cells)]])
+        offset += len(cells)
+    return results
+
+def recognize_cells_constraint(cells, known, templates, cache=None):
+    """Recognizes all cells of one grid at once, letting the sudoku
+    constraints resolve the uncertain cells. Known cells and cache hits are
+    givens for the constraints. Returns a result for every box."""
+    start_time = time.perf_counter()
+    given = []
+    for gray, result in zip(cells, known):
+        if result is not None:
+            given.append(tuple(result[:3]))
+            continue
+        cached = cache.get(gray, 'constraint') if cache is not None else None
+        given.append(tuple(cached) if cached is not None else gray)
+    recognized = recognize_grid(given, templates)
+    # per-cell time is not measurable over a grid, log the mean instead
+    cell_time = (time.perf_counter() - start_time) / max(sum(result is None for result in known), 1)
+    results = []
+    for cell, result, (val, reliability, ocr_count) in zip(given, known, recognized):
+        if result is not None:
+            results.append(result)
+            continue
+        # a digit forced by the constraints says nothing about the glyph
+        if cache is not None and not isinstance(cell, tuple) and ocr_count > 0:
+            cache.put(cell, (val, reliability, ocr_count), 'constraint')
+        results.append((val, reliability, ocr_count, cell_time, None))
+    return results
+
+def build_grid(img_path, boxes, results):
+    grid = [['-' for _ in range(GRID_SIZE)] for _ in range(GRID_SIZE)]
+    for (row, col, x, y, bw, bh), (val, reliability, ocr_count, cell_time, error) in zip(boxes, results):
+        if error is not None:
+            logging.error(f'Cell ({row},{col}) in {img_path} failed: {error}')
+            continue
+        logging.info(f'Cell ({row},{col}) extraction time: {cell_time:.3f}s (time in seconds to extract and recognize this cell)')
+        ocr_timing_str = f"ocr_timing={cell_time:.1f}s"
+        if val == '-':
+            logging.info(f'Cell ({row},{col}) at (x={x}, y={y}, w={bw}, h={bh}): empty {ocr_timing_str}')
+        else:
+            logging.info(f'Cell ({row},{col}) at (x={x}, y={y}, w={bw}, h={bh}): {val} (reliability={reliability}, ocr_count={ocr_count}) {ocr_timing_str}')
+        grid[row][col] = val
+    return grid
+
+def load_grid_cells(img_path, templates, options):
+    """(boxes, cells, known results) of one grid image, cropped as the options tell."""
+    img = read_grid_image(img_path)
+    if options.rectify:
+        img = rectified_grid_image(img, img_path)
+    boxes, empty = cell_boxes(img, options.locate, options.find_lines)
+    cells = grid_cells(img, boxes)
+    return boxes, cells, known_results(cells, empty, templates, options.template_first)
+
+def process_grid_image(img_path, templates, options=None, cache=None, cell_times=None):
+    """Reads one grid image. `cell_times`, when a list, gets (seconds, batch_mean)
+    for every cell recognized, not known before OCR; batch_mean is True when
+    the mode only measures the mean over the batch or the grid."""
+    options = options or ReadOptions()
+    grid_start_time = time.time()
+    boxes, cells, known = load_grid_cells(img_path, templates, options)
+    if options.ocr_mode == 'constraint':
+        results = recognize_cells_constraint(cells, known, templates, cache)
+    elif options.ocr_mode in BATCH_RECOGNIZERS:
+        results = recognize_cells_batched([unknown_cells(cells, known)], templates, options.ocr_mode, cache)[0]
+        results = with_known_cells(known, results)
+    else:
+        results = recognize_cells_one_by_one(unknown_cells(cells, known), templates, options.threads, cache)
+        results = with_known_cells(known, results)
+    if cell_times is not None:
+        batch_mean = options.ocr_mode == 'constraint' or options.ocr_mode in BATCH_RECOGNIZERS
+        cell_times.extend((result[3], batch_mean) for result, was_known in zip(results, known) if was_known is None)
+    grid = build_grid(img_path, boxes, results)
     grid_time = time.time() - grid_start_time
     logging.info(f'Grid extraction time for {img_path}: {grid_time:.3f}s (time in seconds to extract and recognize all cells in this grid)')
     return grid
 
+def process_grid_batch(img_paths, templates, options, cache=None):
+    """Batch OCR over several grids at once, in a batch OCR mode. Yields (img_path, grid, error) in order."""
+    batch_start_time = time.time()
+    loaded = []
+    for img_path in img_paths:
+        try:
+            loaded.append((img_path, *load_grid_cells(img_path, templates, options), None))
+        except Exception as e:
+            loaded.append((img_path, None, None, None, e))
+    ok = [unknown_cells(cells, known) for _, boxes, cells, known, error in loaded if error is None]
+    results = iter(recognize_cells_batched(ok, templates, options.ocr_mode, cache))
+    batch_time = time.time() - batch_start_time
+    for img_path, boxes, cells, known, error in loaded:
+        logging.info(f'Processing {img_path}...')
+        if error is not None:
+            yield img_path, None, error
+            continue
+        grid = build_grid(img_path, boxes, with_known_cells(known, next(results)))
+        logging.info(f'Grid extraction time for {img_path}: {batch_time / len(img_paths):.3f}s (mean time in seconds per grid in this batch)')
+        yield img_path, grid, None
+
+def process_files(batch, options):
+    """Processes one file, or a batch of files in the batch OCR modes.
+
+    Returns (png_file, grid, error, file_time) for every file in the batch.
+    """
+    start = time.time()
+    if len(batch) > 1:
+        try:
+            processed = list(process_grid_batch(batch, TEMPLATES, options, CACHE))
+        except Exception as e:
+            logging.error(f'Failed to process batch starting at {batch[0]}: {e}')
+            processed = [(png_file, None, e) for png_file in batch]
+        file_time = (time.time() - start) / len(batch)
+        return [(png_file, grid, error, file_time) for png_file, grid, error in processed]
+    png_file = batch[0]
+    logging.info(f'Processing {png_file}...')
+    try:
+        grid, error = process_grid_image(png_file, TEMPLATES, options, CACHE), None
+    except Exception as e:
+        grid, error = None, e
+    return [(png_file, grid, error, time.time() - start)]
+
+class RecordCollector(logging.Handler):
+    """Keeps the log records of a worker process so the parent can write them in file order."""
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+_worker_log = RecordCollector()
+
+def init_worker(cache_path=None, cache_tolerance=DEFAULT_TOLERANCE, template_bank_path=None):
+    global CACHE, TEMPLATES
+    # A forked worker inherits the parent's file handler, writes must go through the parent
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_worker_log)
+    root.setLevel(logging.INFO)
+    load_ocr_configs()
+    if cache_path:
+        # every worker starts from the saved cache, new entries go back to the parent
+        CACHE = CellCache(cache_path, cache_tolerance)
+    if template_bank_path:
+        TEMPLATES = TemplateBank.load(template_bank_path)
+
+def process_files_in_worker(batch, options):
+    _worker_log.records = []
+    processed = process_files(batch, options)
+    # exceptions may not pickle, send their text
+    processed = [(png_file, grid, None if error is None else str(error), file_time)
+                 for png_file, grid, error, file_time in processed]
+    cache_delta = None
+    if CACHE is not None:
+        cache_delta = (CACHE.take_new(), CACHE.hits, CACHE.misses)
+        CACHE.hits = CACHE.misses = 0
+    # the stage totals of a cascade are summed in the parent
+    cascade_counts = load_cascade().take_counts() if options.ocr_mode == 'cascade' else None
+    return processed, _worker_log.records, cache_delta, cascade_counts
+
 # example png valuelogs/png/easy_sudoku_booklet_1_fi_4_p10_g4.png
 # g4 is grid 4
 # p10 is page 10
@@ -186,7 +469,49 @@ def extract_page_and_grid(filename):
 def main():
     parser = argparse.ArgumentParser(description='Extract Sudoku grids from PNG files or folders')
     parser.add_argument('input', help='PNG file or folder to process (required)')
+    parser.add_argument('--ocr-mode', choices=['cell', 'montage', 'listfile', 'cluster', 'constraint', 'confidence', 'mlp', 'hog', 'cascade'], default='cell',
+                        help='cell: tesseract per cell and config, montage: one tesseract call per config over tiled cells, '
+                             'listfile: one tesseract call per config over a list file of cell images, '
+                             'cluster: one OCR vote per cluster of similar cell images, '
+                             'constraint: a cheap OCR pass, then sudoku constraints resolve the uncertain cells, '
+                             'confidence: one or two OCR calls per cell, reliability from tesseract confidence, '
+                             'mlp: NumPy digit classifier, no tesseract, '
+                             'hog: HOG features with an OpenCV SVM or KNN, no tesseract, '
+                             'cascade: the recognizer stages of recognizer_cascade in ocr_config.yaml, cheap first')
+    parser.add_argument('--batch-grids', type=int, default=1,
+                        help='In montage, listfile and cluster modes, number of grids recognized in the same batch, 0 for all')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='In cell mode, number of cells recognized concurrently')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of worker processes, each processing whole files (or batches)')
+    parser.add_argument('--cache', help='JSON file of cached OCR results by cell image hash, read and updated')
+    parser.add_argument('--cache-tolerance', type=int, default=DEFAULT_TOLERANCE,
+                        help='Number of differing hash bits still counted as the same cell image')
+    parser.add_argument('--locate-digits', action='store_true',
+                        help='Find digits with one connected component pass over the grid, OCR only non-empty cells with tight boxes')
+    parser.add_argument('--template-first', action='store_true',
+                        help='Match all cells of a grid against the digit templates first, OCR only cells without a clear match; '
+                             'needs a learned --template-bank, the data/ templates match almost no cells')
+    parser.add_argument('--grid-lines', action='store_true',
+                        help='Find the grid lines and crop every cell between its own lines, not a ninth of the image')
+    parser.add_argument('--rectify', action='store_true',
+                        help='Warp the grid of a photo or skewed scan to a square before slicing it into cells; '
+                             'the grid must be turned less than 45 degrees from upright')
+    parser.add_argument('--template-bank', help='.npz template bank from build_template_bank.py, used instead of data/')
     args = parser.parse_args()
+    options = ReadOptions.from_args(args)
+    setup_output()
+
+    global CACHE, TEMPLATES
+    if args.cache:
+        CACHE = CellCache(args.cache, args.cache_tolerance)
+    if args.template_bank:
+        TEMPLATES = TemplateBank.load(args.template_bank)
+    elif args.template_first:
+        warning = ('--template-first without --template-bank: the data/ templates match almost no cells, '
+                   'build a bank with src/build_template_bank.py')
+        logging.warning(warning)
+        print(f"Warning: {warning}")
 
     if os.path.isdir(args.input):
         png_files = glob(os.path.join(args.input, '*.png'))
@@ -205,22 +530,87 @@ def main():
     timing_info['file_times'] = []
     timing_info['total_files'] = len(png_files)
 
+    if args.batch_grids == 0:
+        args.batch_grids = max(len(png_files), 1)
+
     total_start_time = time.time()
     all_grids = []
-    for idx, png_file in enumerate(png_files):
-        print(f"[{idx+1}/{len(png_files)}] Processing {png_file}...")
-        logging.info(f'Processing {png_file}...')
-        file_start = time.time()
-        try:
-            grid = process_grid_image(png_file, TEMPLATES)
-            all_grids.append(grid)
-            write_grid_txt(grid, idx, png_file)
-        except Exception as e:
-            logging.error(f'Failed to process {png_file}: {e}')
-            print(f"Error processing {png_file}: {e}")
-        file_time = time.time() - file_start
-        timing = calculate_timing(idx, len(png_files), file_time)
-        log_timing(timing)
+    if args.jobs > 1:
+        batch_size = args.batch_grids if args.ocr_mode in BATCH_RECOGNIZERS else 1
+        tasks = [png_files[start:start+batch_size] for start in range(0, len(png_files), batch_size)]
+        print(f"Processing {len(png_files)} files in {args.jobs} worker processes...")
+        idx = 0
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker,
+                                 initargs=(args.cache, args.cache_tolerance, args.template_bank)) as executor:
+            # map keeps the sorted file order, so grids.txt and the log match a sequential run
+            for processed, records, cache_delta, cascade_counts in executor.map(process_files_in_worker, tasks,
+                                                                                repeat(options)):
+                for levelno, message in records:
+                    logging.log(levelno, message)
+                if cache_delta is not None:
+                    entries, hits, misses = cache_delta
+                    CACHE.update(entries)
+                    CACHE.hits += hits
+                    CACHE.misses += misses
+                if cascade_counts is not None:
+                    load_cascade().add_counts(cascade_counts)
+                for png_file, grid, error, file_time in processed:
+                    print(f"[{idx+1}/{len(png_files)}] Processed {png_file}")
+                    if error is not None:
+                        logging.error(f'Failed to process {png_file}: {error}')
+                        print(f"Error processing {png_file}: {error}")
+                    else:
+                        all_grids.append(grid)
+                        write_grid_txt(grid, idx, png_file)
+                    timing = calculate_timing(idx, len(png_files), file_time)
+                    log_timing(timing)
+                    idx += 1
+    elif args.ocr_mode in BATCH_RECOGNIZERS and args.batch_grids > 1:
+        idx = 0
+        for start in range(0, len(png_files), args.batch_grids):
+            batch = png_files[start:start+args.batch_grids]
+            print(f"[{start+1}-{start+len(batch)}/{len(png_files)}] Processing {args.ocr_mode} batch of {len(batch)} grids...")
+            batch_start = time.time()
+            try:
+                processed = list(process_grid_batch(batch, TEMPLATES, options, CACHE))
+            except Exception as e:
+                logging.error(f'Failed to process batch starting at {batch[0]}: {e}')
+                print(f"Error processing batch starting at {batch[0]}: {e}")
+                processed = [(png_file, None, e) for png_file in batch]
+            file_time = (time.time() - batch_start) / len(batch)
+            for png_file, grid, error in processed:
+                if error is not None:
+                    logging.error(f'Failed to process {png_file}: {error}')
+                    print(f"Error processing {png_file}: {error}")
+                else:
+                    all_grids.append(grid)
+                    write_grid_txt(grid, idx, png_file)
+                timing = calculate_timing(idx, len(png_files), file_time)
+                log_timing(timing)
+                idx += 1
+    else:
+        for idx, png_file in enumerate(png_files):
+            print(f"[{idx+1}/{len(png_files)}] Processing {png_file}...")
+            logging.info(f'Processing {png_file}...')
+            file_start = time.time()
+            try:
+                grid = process_grid_image(png_file, TEMPLATES, options, CACHE)
+                all_grids.append(grid)
+                write_grid_txt(grid, idx, png_file)
+            except Exception as e:
+                logging.error(f'Failed to process {png_file}: {e}')
+                print(f"Error processing {png_file}: {e}")
+            file_time = time.time() - file_start
+            timing = calculate_timing(idx, len(png_files), file_time)
+            log_timing(timing)
+    if CACHE is not None:
+        CACHE.save()
+        logging.info(f'OCR cache: {CACHE.hits} hits, {CACHE.misses} misses, {len(CACHE.entries)} entries saved to {CACHE.path}')
+        print(f"OCR cache: {CACHE.hits} hits, {CACHE.misses} misses")
+    if args.ocr_mode == 'cascade':
+        for line in load_cascade().summary():
+            logging.info(f'Cascade total {line}')
+            print(f"Cascade {line}")
     total_time = time.time() - total_start_time
     print(f"\nAll done! Total elapsed time: {format_hms(total_time)}")
     logging.info(f'Total script time: {total_time:.3f}s (time in seconds to process all grids in this run)')
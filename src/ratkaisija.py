@@ -10,14 +10,20 @@
 # jokaisessa rivissä, sarakkeessa ja osassa on oltava kaikki numerot 1-9
 
 
+LOKI_TIEDOSTO = "log.txt"
+# jos jalki on lista, lokiviestit kerätään myös siihen
+jalki = None
 
 def log(message):
-    with open("log.txt", "a", encoding="utf-8") as f:
-        f.write(str(message) + "\n")
+    if jalki is not None:
+        jalki.append(str(message))
+    if LOKI_TIEDOSTO:
+        with open(LOKI_TIEDOSTO, "a", encoding="utf-8") as f:
+            f.write(str(message) + "\n")
     print(message)  # Keep console output for debugging
 
 def clear_log():
-    with open("log.txt", "w", encoding="utf-8") as f:
+    with open(LOKI_TIEDOSTO, "w", encoding="utf-8") as f:
         f.write("")
 
 data1 = """
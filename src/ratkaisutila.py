@@ -0,0 +1,208 @@
+# ratkaisijan tila bittimaskeina
+#
+# ruudukko tallennetaan litteänä listana, jossa ruutu = x * koko + y
+# eli sama järjestys kuin ruudukko[x][y] tiedostossa ratkaisija.py
+# koko on 9 tavallisessa sudokussa, mutta Rakenne sallii myös 16x16 ja 25x25
+# sekä muunnelmat, joiden yksiköt on kuvattu tiedostossa yksikot.py
+# jokaisella ruudulla on ehdokasmaski: bitti (numero - 1) on päällä,
+# jos numero voi vielä olla ruudussa
+#
+# kaikki muutokset kirjataan polkuun. Haarautuminen on silloin pelkkä
+# merkki polun pituudesta, ja peruutus purkaa vain tehdyt muutokset,
+# joten ruudukkoa ei tarvitse kopioida niin kuin syottaja.py tekee
+#
+# tilalla on myös 64-bittinen Zobrist-tiiviste, jota päivitetään jokaisen
+# asetuksen ja ehdokkaan poiston yhteydessä. Haku käyttää sitä
+# transpositiotaulun avaimena.
+
+import random
+from contextlib import contextmanager
+
+from ratkaisija import TYHJA
+from yksikot import tavallinen
+
+
+def _laske_naapurit(yksikot, ruutuja):
+    joukot = [set() for _ in range(ruutuja)]
+    for yksikko in yksikot:
+        for ruutu in yksikko:
+            joukot[ruutu].update(yksikko)
+    for ruutu, joukko in enumerate(joukot):
+        joukko.discard(ruutu)
+    return tuple(tuple(sorted(joukko)) for joukko in joukot)
+
+
+def _zobrist_taulu(satunnainen, koko):
+    # indeksi [ruutu][numero], numero 0 jää käyttämättä
+    return tuple(tuple(satunnainen.getrandbits(64) for _ in range(koko + 1)) for _ in range(koko * koko))
+
+
+class Rakenne:
+    """Yksiköistä kerran käännetyt naapuritaulut.
+
+    `yksikot` on lista ruutulistoja [(x, y), ...] kuten tiedostossa yksikot.py,
+    esim. Rakenne(tavallinen(4)) on 16x16 ja Rakenne(x_sudoku()) X-sudoku.
+    Jokaisessa yksikössä on oltava koko ruutua, jolloin jokainen numero
+    esiintyy yksikössä tasan kerran.
+    """
+
+    def __init__(self, yksikot):
+        self.koko = len(yksikot[0])
+        self.ruutuja = self.koko * self.koko
+        self.kaikki = (1 << self.koko) - 1
+        self.lahde = tuple(tuple(tuple(ruutu) for ruutu in yksikko) for yksikko in yksikot)
+        kaannetyt = []
+        for yksikko in self.lahde:
+            ruudut = tuple(x * self.koko + y for x, y in yksikko)
+            if len(set(ruudut)) != self.koko or not all(0 <= ruutu < self.ruutuja for ruutu in ruudut):
+                raise ValueError(f"yksikössä pitää olla {self.koko} eri ruutua: {yksikko}")
+            kaannetyt.append(ruudut)
+        self.yksikot = tuple(kaannetyt)
+        # naapurit: kaikki ruudut, joiden kanssa ruudulla on yhteinen yksikkö
+        self.naapurit = _laske_naapurit(self.yksikot, self.ruutuja)
+        # kiinteä siemen, jotta tiivisteet ovat samat joka ajossa ja prosessissa
+        satunnainen = random.Random(20240901 + self.koko)
+        self.zobrist_asetus = _zobrist_taulu(satunnainen, self.koko)
+        self.zobrist_poisto = _zobrist_taulu(satunnainen, self.koko)
+
+    def __reduce__(self):
+        # prosessien välillä riittää lähettää yksiköt, taulut lasketaan uudestaan
+        return (Rakenne, (self.lahde,))
+
+
+VAKIO = Rakenne(tavallinen(3))
+KOKO = VAKIO.koko
+RUUTUJA = VAKIO.ruutuja
+KAIKKI = VAKIO.kaikki
+NAAPURIT = VAKIO.naapurit
+
+
+def bitti(numero):
+    return 1 << (numero - 1)
+
+
+def numerot_maskista(maski):
+    numerot = []
+    numero = 1
+    while maski:
+        if maski & 1:
+            numerot.append(numero)
+        maski >>= 1
+        numero += 1
+    return numerot
+
+
+class Ratkaisutila:
+    """Ruudukko ja ehdokasmaskit, joiden muutokset voi perua polun avulla."""
+
+    def __init__(self, ruudukko=None, rakenne=VAKIO):
+        self.rakenne = rakenne
+        self.ruudut = [0] * rakenne.ruutuja
+        self.ehdokkaat = [rakenne.kaikki] * rakenne.ruutuja
+        # tiivisteeseen kuuluvat asetetut numerot ja suoraan poistetut ehdokkaat,
+        # naapureista seuraavat poistot määräytyvät asetuksista
+        self.tiiviste = 0
+        # polun alkio on (ruutu, vanha numero, vanha maski, vanha tiiviste)
+        self.polku = []
+        if ruudukko is not None:
+            koko = rakenne.koko
+            for x in range(koko):
+                for y in range(koko):
+                    numero = ruudukko[x][y]
+                    if numero == TYHJA:
+                        continue
+                    if not self.aseta(x * koko + y, numero):
+                        raise ValueError(f"numero {numero} ei sovi paikkaan ({x}, {y})")
+            # annetut numerot ovat lähtötila, eikä niitä peruta
+            self.polku = []
+
+    def _kirjaa(self, ruutu):
+        self.polku.append((ruutu, self.ruudut[ruutu], self.ehdokkaat[ruutu], self.tiiviste))
+
+    def tallenna(self):
+        """Palauttaa merkin, johon tilan voi myöhemmin palauttaa."""
+        return len(self.polku)
+
+    def palauta(self, merkki):
+        polku = self.polku
+        while len(polku) > merkki:
+            ruutu, numero, maski, tiiviste = polku.pop()
+            self.ruudut[ruutu] = numero
+            self.ehdokkaat[ruutu] = maski
+            self.tiiviste = tiiviste
+
+    @contextmanager
+    def haara(self):
+        """Kokeilu, jonka muutokset perutaan lohkon lopussa."""
+        merkki = self.tallenna()
+        try:
+            yield self
+        finally:
+            self.palauta(merkki)
+
+    def laillinen(self, ruutu, numero):
+        return self.ruudut[ruutu] == 0 and bool(self.ehdokkaat[ruutu] & bitti(numero))
+
+    def aseta(self, ruutu, numero):
+        """Asettaa numeron ja poistaa sen naapureiden ehdokkaista.
+
+        Palauttaa False, jos numero ei sovi tai jonkin naapurin ehdokkaat
+        loppuvat. Silloin tila voi olla puolivalmis, ja kutsujan pitää
+        palauttaa se aiempaan merkkiin.
+        """
+        b = bitti(numero)
+        if self.ruudut[ruutu] != 0 or not self.ehdokkaat[ruutu] & b:
+            return False
+        self._kirjaa(ruutu)
+        self.ruudut[ruutu] = numero
+        self.ehdokkaat[ruutu] = b
+        self.tiiviste ^= self.rakenne.zobrist_asetus[ruutu][numero]
+        ehdokkaat = self.ehdokkaat
+        for naapuri in self.rakenne.naapurit[ruutu]:
+            maski = ehdokkaat[naapuri]
+            if maski & b:
+                self._kirjaa(naapuri)
+                maski &= ~b
+                ehdokkaat[naapuri] = maski
+                if maski == 0:
+                    return False
+        return True
+
+    def poista_ehdokas(self, ruutu, numero):
+        """Poistaa ehdokkaan. Palauttaa False, jos ruudulle ei jää ehdokkaita."""
+        b = bitti(numero)
+        maski = self.ehdokkaat[ruutu]
+        if maski & b:
+            self._kirjaa(ruutu)
+            maski &= ~b
+            self.ehdokkaat[ruutu] = maski
+            self.tiiviste ^= self.rakenne.zobrist_poisto[ruutu][numero]
+        return maski != 0
+
+    def ehdokkaat_ruudussa(self, ruutu):
+        return numerot_maskista(self.ehdokkaat[ruutu])
+
+    def vapaat(self):
+        return [ruutu for ruutu, numero in enumerate(self.ruudut) if numero == 0]
+
+    def valmis(self):
+        return all(self.ruudut)
+
+    def kopioi(self):
+        """Itsenäinen kopio ilman polkua, esim. toiselle prosessille."""
+        kopio = Ratkaisutila(rakenne=self.rakenne)
+        kopio.ruudut = self.ruudut.copy()
+        kopio.ehdokkaat = self.ehdokkaat.copy()
+        kopio.tiiviste = self.tiiviste
+        return kopio
+
+    def ruudukoksi(self):
+        koko = self.rakenne.koko
+        ruudukko = []
+        for x in range(koko):
+            rivi = []
+            for y in range(koko):
+                numero = self.ruudut[x * koko + y]
+                rivi.append(numero if numero else TYHJA)
+            ruudukko.append(rivi)
+        return ruudukko
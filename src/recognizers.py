@@ -0,0 +1,130 @@
+import time
+import logging
+import threading
+import yaml
+from cell_extract import is_empty_cell, template_bank, recognize_gray_cached, recognize_cells_listfile, debug_print
+from montage_ocr import recognize_cells_montage
+from confidence_ocr import recognize_cells_confidence
+from mlp_digits import recognize_cells_mlp
+from hog_digits import recognize_cells_hog
+
+# Recognizer cascade, cheap recognizers first and the tesseract vote last.
+#
+# A recognizer takes a list of preprocessed 64x64 cells and returns one
+# (value, reliability, ocr_count) per cell, like extract_and_recognize_cell:
+#
+#   recognize(grays, templates=None, cache=None)
+#
+# The cascade is the list recognizer_cascade in ocr_config.yaml. Each stage
+# gets the non-empty cells that the earlier stages did not accept, and
+# accepts the results whose reliability is at least its min_reliability;
+# the last stage accepts everything it returns. Every stage counts the
+# cells it got and resolved and the time it took.
+
+RELIABILITY_RANK = {'none': 0, 'low': 1, 'medium': 2, 'high': 3, 'template': 3}
+DEFAULT_MIN_RELIABILITY = 'high'
+
+def recognize_cells_template(grays, templates=None, cache=None):
+    """Cells with a clear template bank match, the others as unread."""
+    return [('-', 'none', 0) if digit is None else (digit, 'template', 0)
+            for digit in template_bank(templates).match_first(grays)]
+
+def recognize_cells_tesseract(grays, templates=None, cache=None):
+    """The full tesseract vote of extract_and_recognize_cell, cell by cell."""
+    return [recognize_gray_cached(gray, templates, cache) for gray in grays]
+
+RECOGNIZERS = {
+    'template': recognize_cells_template,
+    'mlp': recognize_cells_mlp,
+    'hog': recognize_cells_hog,
+    'confidence': recognize_cells_confidence,
+    'montage': recognize_cells_montage,
+    'listfile': recognize_cells_listfile,
+    'tesseract': recognize_cells_tesseract,
+}
+
+class Stage:
+    def __init__(self, name, min_reliability=DEFAULT_MIN_RELIABILITY):
+        if name not in RECOGNIZERS:
+            raise ValueError(f'Unknown recognizer in cascade: {name}')
+        if min_reliability not in RELIABILITY_RANK:
+            raise ValueError(f'Unknown min_reliability for {name}: {min_reliability}')
+        self.name = name
+        self.min_reliability = min_reliability
+        self.cells = 0
+        self.resolved = 0
+        self.seconds = 0.0
+
+    def accepts(self, result):
+        return RELIABILITY_RANK.get(result[1], 0) >= RELIABILITY_RANK[self.min_reliability]
+
+class Cascade:
+    def __init__(self, stages):
+        if not stages:
+            raise ValueError('Empty recognizer cascade')
+        self.stages = stages
+        self.lock = threading.Lock()
+
+    def recognize(self, grays, templates=None, cache=None):
+        """One (value, reliability, ocr_count) per cell, each from the first stage accepting it."""
+        results = [('-', 'none', 0)] * len(grays)
+        todo = [idx for idx, gray in enumerate(grays) if not is_empty_cell(gray)]
+        for pos, stage in enumerate(self.stages):
+            if not todo:
+                break
+            last = pos == len(self.stages) - 1
+            start_time = time.time()
+            recognized = RECOGNIZERS[stage.name]([grays[idx] for idx in todo], templates=templates, cache=cache)
+            seconds = time.time() - start_time
+            left = []
+            for idx, result in zip(todo, recognized):
+                if last or stage.accepts(result):
+                    results[idx] = result
+                else:
+                    left.append(idx)
+            resolved = len(todo) - len(left)
+            logging.info(f'Cascade stage {stage.name}: {resolved} of {len(todo)} cells resolved in {seconds:.3f}s')
+            debug_print(f"[DEBUG] Cascade stage {stage.name}: {resolved}/{len(todo)} in {seconds:.3f}s")
+            with self.lock:
+                stage.cells += len(todo)
+                stage.resolved += resolved
+                stage.seconds += seconds
+            todo = left
+        return results
+
+    def take_counts(self):
+        """(cells, resolved, seconds) of every stage since the last call, e.g. to send from a worker."""
+        with self.lock:
+            counts = [(stage.cells, stage.resolved, stage.seconds) for stage in self.stages]
+            for stage in self.stages:
+                stage.cells, stage.resolved, stage.seconds = 0, 0, 0.0
+        return counts
+
+    def add_counts(self, counts):
+        with self.lock:
+            for stage, (cells, resolved, seconds) in zip(self.stages, counts):
+                stage.cells += cells
+                stage.resolved += resolved
+                stage.seconds += seconds
+
+    def summary(self):
+        return [f'{stage.name}: {stage.resolved} of {stage.cells} cells resolved in {stage.seconds:.3f}s'
+                for stage in self.stages]
+
+def load_cascade(yaml_path='src/ocr_config.yaml'):
+    """The cascade of recognizer_cascade in ocr_config.yaml, loaded once per process."""
+    if not hasattr(load_cascade, "_cache"):
+        load_cascade._cache = {}
+        load_cascade._lock = threading.Lock()
+    with load_cascade._lock:
+        if yaml_path in load_cascade._cache:
+            return load_cascade._cache[yaml_path]
+        with open(yaml_path, 'r') as f:
+            cfg = yaml.safe_load(f)
+        stages = [Stage(c['recognizer'], c.get('min_reliability', DEFAULT_MIN_RELIABILITY))
+                  for c in cfg['recognizer_cascade']]
+        load_cascade._cache[yaml_path] = Cascade(stages)
+        return load_cascade._cache[yaml_path]
+
+def recognize_cells_cascade(grays, templates=None, cache=None):
+    return load_cascade().recognize(grays, templates, cache)
@@ -0,0 +1,120 @@
+import cv2
+import numpy as np
+from whiten_pngs import THRESH
+
+# Perspective rectification of photographed or scanned grids.
+#
+# The outer border of the grid is the largest ink contour of the image. It
+# is looked for on a copy scaled down to WORK_SIZE and binarized with an
+# adaptive threshold, so uneven lighting of a photo does not matter. Its
+# rough corners come from approximating the outline with four points; each
+# corner is then the crossing of lines fitted to the outline along the two
+# sides, as printed grids often have rounded or cut corners. The four
+# corners are mapped with one warpPerspective to a square whose side is
+# the longest border edge, rounded down to a multiple of the grid size, so
+# the rest of the pipeline can slice the cells as from a clean PDF render.
+# For the same reason the lighting of the square is flattened by dividing
+# it with its paper brightness, and almost white pixels are whitened like
+# whiten_pngs.py does: an empty cell must be one gray level to be empty.
+# The 3x3 transform from the original image to the square is returned with
+# it, None when no grid border was found and the image is kept as it is.
+
+WORK_SIZE = 800             # longest side of the image the border is looked for in
+MIN_GRID_AREA_FRAC = 0.2    # of the image area, smaller outlines are not the grid
+QUAD_EPSILON_FRAC = 0.02    # of the outline perimeter, for approximating it with four corners
+SIDE_TOLERANCE_FRAC = 0.02  # of the side length, outline points this near to a side fit its line
+PAPER_KERNEL_FRAC = 1 / 60  # of the image size, wider than any stroke, for the paper brightness
+PAPER_SCALE = 0.25
+
+def binarize_photo(gray):
+    block = max(gray.shape) // 40 | 1
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, max(block, 3), 10)
+
+def ordered_corners(points):
+    """Top-left, top-right, bottom-right and bottom-left of an outline turned
+    less than 45 degrees from upright; a grid turned more comes out turned
+    by a multiple of 90 degrees."""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    sums = points.sum(axis=1)
+    diffs = points[:, 1] - points[:, 0]
+    return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                     points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+def side_line(points, start, end):
+    """(point, direction) of the line fitted to the outline points along the side start-end, or None."""
+    direction = end - start
+    length = np.linalg.norm(direction)
+    along = (points - start) @ direction / length ** 2
+    across = np.abs((points - start) @ np.array([-direction[1], direction[0]])) / length
+    # the ends of the side are left out, they bend into the corners
+    near = points[(along > 0.1) & (along < 0.9) & (across <= SIDE_TOLERANCE_FRAC * length)]
+    if len(near) < 2:
+        return None
+    vx, vy, x0, y0 = cv2.fitLine(near, cv2.DIST_HUBER, 0, 0.01, 0.01).ravel()
+    return np.array([x0, y0]), np.array([vx, vy])
+
+def crossing(line1, line2):
+    (p1, d1), (p2, d2) = line1, line2
+    matrix = np.column_stack([d1, -d2])
+    if abs(np.linalg.det(matrix)) < 1e-6:
+        return None
+    t = np.linalg.solve(matrix, p2 - p1)[0]
+    return p1 + t * d1
+
+def refined_corners(outline, corners):
+    """Crossings of the fitted side lines, or the rough corners when a side has no line."""
+    points = outline.reshape(-1, 2).astype(np.float32)
+    lines = [side_line(points, corners[k], corners[(k + 1) % 4]) for k in range(4)]
+    if any(line is None for line in lines):
+        return corners
+    # corner k is between the side ending at it and the side starting from it
+    refined = [crossing(lines[k - 1], lines[k]) for k in range(4)]
+    if any(point is None for point in refined):
+        return corners
+    return np.array(refined, dtype=np.float32)
+
+def find_grid_quad(img):
+    """The four corners of the outer grid border, ordered as in ordered_corners, or None."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    scale = min(WORK_SIZE / max(gray.shape), 1.0)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    contours, _ = cv2.findContours(binarize_photo(small), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    if not contours:
+        return None
+    outline = max(contours, key=cv2.contourArea)
+    hull = cv2.convexHull(outline)
+    if cv2.contourArea(hull) < MIN_GRID_AREA_FRAC * small.shape[0] * small.shape[1]:
+        return None
+    quad = cv2.approxPolyDP(hull, QUAD_EPSILON_FRAC * cv2.arcLength(hull, True), True)
+    # an outline with rounded or cut corners still has its extreme points
+    corners = ordered_corners(quad if len(quad) == 4 else hull)
+    return refined_corners(outline, corners) / scale
+
+def flatten_lighting(gray):
+    """Gray image divided by its paper brightness, almost white pixels white, as BGR."""
+    # the paper brightness is smooth, it is estimated at PAPER_SCALE of the size
+    small = cv2.resize(gray, None, fx=PAPER_SCALE, fy=PAPER_SCALE, interpolation=cv2.INTER_AREA)
+    size = max(int(max(small.shape) * PAPER_KERNEL_FRAC) | 1, 3)
+    # the max over a window wider than the strokes is the paper under them
+    paper = cv2.blur(cv2.dilate(small, cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))), (size, size))
+    paper = cv2.resize(paper, gray.shape[::-1], interpolation=cv2.INTER_LINEAR)
+    flat = cv2.divide(gray, paper, scale=255)
+    flat[flat >= THRESH] = 255
+    return cv2.cvtColor(flat, cv2.COLOR_GRAY2BGR)
+
+def rectified_side(corners, grid_size=9):
+    edges = np.linalg.norm(corners - np.roll(corners, -1, axis=0), axis=1)
+    return max(int(edges.max()) // grid_size * grid_size, grid_size)
+
+def rectify_grid(img, grid_size=9):
+    """(square image of the grid, 3x3 perspective transform), or (img, None) without a grid border."""
+    corners = find_grid_quad(img)
+    if corners is None:
+        return img, None
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    side = rectified_side(corners, grid_size)
+    square = np.array([[0, 0], [side - 1, 0], [side - 1, side - 1], [0, side - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(corners, square)
+    warped = cv2.warpPerspective(gray, matrix, (side, side), flags=cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+    return flatten_lighting(warped), matrix
@@ -0,0 +1,139 @@
+# hakupuun jakaminen prosesseille
+#
+# isoissa ruudukoissa (16x16, 25x25) ja OCR:n jäljiltä lähes tyhjissä
+# ruudukoissa yksi haku on liian hidas. Hakupuu avataan ensin annettuun
+# syvyyteen, ja jokainen haara lähetetään omaksi osaongelmakseen
+# prosessialtaaseen. Osaongelma on lista haarautumispäätöksiä
+# (ruutu, numero), jotka työprosessi toistaa omassa tilassaan.
+#
+# kun ratkaisuja on löytynyt tarpeeksi (yksi, tai yksikäsitteisyyttä
+# tarkistettaessa kaksi), yhteinen keskeytys asetetaan ja muut
+# työprosessit lopettavat hakunsa.
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ratkaisija import lue_ruudukko
+from ratkaisutila import Ratkaisutila, Rakenne, VAKIO, numerot_maskista
+from haku import Haku, tayta_yksinaiset, valitse_ruutu
+from yksikot import MUUNNELMAT
+
+# kuinka monta osaongelmaa tavoitellaan prosessia kohden, jotta
+# epätasaisen kokoiset haarat jakautuvat tasaisesti
+OSIA_PROSESSIA_KOHDEN = 4
+SUURIN_SYVYYS = 8
+
+
+def jaa_osaongelmiin(tila, syvyys):
+    """Avaa hakupuun ja palauttaa haarojen päätöslistat syvyydellä `syvyys`."""
+    osat = []
+    paatokset = []
+
+    def avaa(taso):
+        merkki = tila.tallenna()
+        if tayta_yksinaiset(tila):
+            ruutu = valitse_ruutu(tila)
+            if ruutu is None or taso == syvyys:
+                osat.append(list(paatokset))
+            else:
+                for numero in numerot_maskista(tila.ehdokkaat[ruutu]):
+                    haaran_merkki = tila.tallenna()
+                    if tila.aseta(ruutu, numero):
+                        paatokset.append((ruutu, numero))
+                        avaa(taso + 1)
+                        paatokset.pop()
+                    tila.palauta(haaran_merkki)
+        tila.palauta(merkki)
+
+    avaa(0)
+    return osat
+
+
+def valitse_syvyys(tila, prosessit):
+    # matalin syvyys, jolla osaongelmia riittää kaikille prosesseille
+    tavoite = prosessit * OSIA_PROSESSIA_KOHDEN
+    for syvyys in range(1, SUURIN_SYVYYS + 1):
+        osat = jaa_osaongelmiin(tila, syvyys)
+        if len(osat) >= tavoite:
+            return syvyys, osat
+    return SUURIN_SYVYYS, osat
+
+
+# työprosessin tila, asetetaan kerran alustajassa
+_tyo = {}
+
+
+def _alusta_tyo(ruudukko, rakenne, enintaan, keskeytys):
+    _tyo['ruudukko'] = ruudukko
+    _tyo['rakenne'] = rakenne
+    _tyo['enintaan'] = enintaan
+    _tyo['keskeytys'] = keskeytys
+
+
+def _ratkaise_osa(paatokset):
+    if _tyo['keskeytys'].is_set():
+        return []
+    tila = Ratkaisutila(_tyo['ruudukko'], _tyo['rakenne'])
+    for ruutu, numero in paatokset:
+        if not tila.aseta(ruutu, numero):
+            return []
+    haku = Haku(enintaan=_tyo['enintaan'], keskeytys=_tyo['keskeytys'])
+    return haku.hae(tila)
+
+
+def ratkaise_rinnakkain(ruudukko, enintaan=1, prosessit=None, syvyys=None, rakenne=VAKIO):
+    """Kuten haku.ratkaise, mutta osaongelmat ratkaistaan prosessialtaassa.
+
+    Palauttaa enintään `enintaan` ratkaisua. Jos `syvyys` puuttuu, se
+    valitaan niin, että osaongelmia on useampi kuin prosesseja.
+    """
+    try:
+        tila = Ratkaisutila(ruudukko, rakenne)
+    except ValueError:
+        return []
+    prosessit = prosessit or os.cpu_count() or 1
+    if syvyys is None:
+        syvyys, osat = valitse_syvyys(tila, prosessit)
+    else:
+        osat = jaa_osaongelmiin(tila, syvyys)
+    if not osat:
+        return []
+
+    ratkaisut = []
+    keskeytys = multiprocessing.Event()
+    with ProcessPoolExecutor(max_workers=prosessit, initializer=_alusta_tyo,
+                             initargs=(ruudukko, rakenne, enintaan, keskeytys)) as allas:
+        tulevat = [allas.submit(_ratkaise_osa, paatokset) for paatokset in osat]
+        for tuleva in as_completed(tulevat):
+            ratkaisut.extend(tuleva.result())
+            if len(ratkaisut) >= enintaan:
+                keskeytys.set()
+                for muu in tulevat:
+                    muu.cancel()
+                break
+    return ratkaisut[:enintaan]
+
+
+# ratkaise tiedostossa oleva ruudukko, esim. 16x16 tai X-sudoku:
+# python3 src/rinnakkaishaku.py ruudukko.txt 4
+# python3 src/rinnakkaishaku.py ruudukko.txt 3 x
+if __name__ == "__main__":
+    with open(sys.argv[1], encoding="utf-8") as f:
+        ruudukko = lue_ruudukko(f.read())
+    osan_koko = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    muunnelma = sys.argv[3] if len(sys.argv) > 3 else "tavallinen"
+    if osan_koko == 3 and muunnelma == "tavallinen":
+        rakenne = VAKIO
+    else:
+        rakenne = Rakenne(MUUNNELMAT[muunnelma](osan_koko))
+    ratkaisut = ratkaise_rinnakkain(ruudukko, enintaan=2, rakenne=rakenne)
+    if not ratkaisut:
+        print("Ei ratkaisua")
+    elif len(ratkaisut) > 1:
+        print("Ratkaisu ei ole yksikäsitteinen")
+    for ratkaisu in ratkaisut[:1]:
+        # ruudukko[x][y]: tulostetaan takaisin samoina riveinä kuin syötteessä
+        for y in range(rakenne.koko):
+            print(" ".join(str(ratkaisu[x][y]) for x in range(rakenne.koko)))
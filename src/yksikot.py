@@ -0,0 +1,90 @@
+# sudokun yksiköt datana
+#
+# yksikkö on lista ruutuja (x, y), joissa jokaisen numeron on oltava eri.
+# Koordinaatit ovat samat kuin ruudukko[x][y] tiedostossa ratkaisija.py,
+# eli rivi on kiinteä x ja sarake kiinteä y.
+#
+# tavallisessa sudokussa yksiköitä ovat rivit, sarakkeet ja osat.
+# Muunnelmat lisäävät omia yksiköitään: X-sudokun lävistäjät, windokun
+# ikkunat tai palapelisudokun epäsäännölliset alueet osien tilalle.
+# ratkaisutila.Rakenne kääntää yksiköt kerran naapuritauluiksi, joten
+# lisäyksiköt eivät maksa mitään yksittäisessä tarkistuksessa.
+
+
+def rivit(koko):
+    return [[(x, y) for y in range(koko)] for x in range(koko)]
+
+
+def sarakkeet(koko):
+    return [[(x, y) for x in range(koko)] for y in range(koko)]
+
+
+def osat(osan_koko):
+    yksikot = []
+    for osa_x in range(osan_koko):
+        for osa_y in range(osan_koko):
+            yksikot.append([(osa_x * osan_koko + i, osa_y * osan_koko + j)
+                            for i in range(osan_koko) for j in range(osan_koko)])
+    return yksikot
+
+
+def lavistajat(koko):
+    return [[(i, i) for i in range(koko)], [(i, koko - 1 - i) for i in range(koko)]]
+
+
+def ikkunat(osan_koko):
+    # windokun ikkunat alkavat yhden ruudun päästä reunasta ja osien väleistä
+    alut = [1 + i * (osan_koko + 1) for i in range(osan_koko - 1)]
+    yksikot = []
+    for alku_x in alut:
+        for alku_y in alut:
+            yksikot.append([(alku_x + i, alku_y + j) for i in range(osan_koko) for j in range(osan_koko)])
+    return yksikot
+
+
+def alueet(kartta):
+    """Palapelin alueet kartasta, jossa kartta[x][y] on ruudun alueen tunnus."""
+    ryhmat = {}
+    for x, rivi in enumerate(kartta):
+        for y, tunnus in enumerate(rivi):
+            ryhmat.setdefault(tunnus, []).append((x, y))
+    return list(ryhmat.values())
+
+
+def lue_alueet(data):
+    """Lukee alueet samassa muodossa kuin lue_ruudukko lukee ruudukon.
+
+    Jokaisella rivillä on välilyönnein erotettuina ruutujen alueiden
+    tunnukset. Kuten lue_ruudukko, tämä transponoi x- ja y-akselit.
+    """
+    kartta = []
+    for rivi in data.splitlines():
+        if rivi.strip() == "":
+            continue
+        kartta.append(rivi.split())
+    return list(zip(*kartta))
+
+
+def tavallinen(osan_koko=3):
+    koko = osan_koko * osan_koko
+    return rivit(koko) + sarakkeet(koko) + osat(osan_koko)
+
+
+def x_sudoku(osan_koko=3):
+    return tavallinen(osan_koko) + lavistajat(osan_koko * osan_koko)
+
+
+def windoku(osan_koko=3):
+    return tavallinen(osan_koko) + ikkunat(osan_koko)
+
+
+def palapeli(kartta):
+    koko = len(kartta)
+    return rivit(koko) + sarakkeet(koko) + alueet(kartta)
+
+
+MUUNNELMAT = {
+    "tavallinen": tavallinen,
+    "x": x_sudoku,
+    "windoku": windoku,
+}
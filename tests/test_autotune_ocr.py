@@ -0,0 +1,58 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import pytest
+import yaml
+from autotune_ocr import sweep_configs, measure, replay, candidate_orders, pareto_frontier, choose, write_configs
+from cell_extract import load_ocr_configs
+
+
+def test_sweep_matches_compare_cells():
+    configs = sweep_configs()
+    assert len(configs) == 48
+    assert {'psm': 10, 'oem': 3, 'thresh': 200} in configs
+
+
+def test_measure_reads_every_cell_with_every_config():
+    labeled = [('1', 'a'), ('4', 'b')]
+    texts, latencies = measure([{'psm': 6}, {'psm': 7}], labeled, read=lambda gray, cfg: f"{gray}{cfg['psm']}")
+    assert texts == [['a6', 'a7'], ['b6', 'b7']]
+    assert len(latencies) == 2
+
+
+def test_replay_counts_correct_cells_and_time():
+    # the even configs read right, the odd ones wrong
+    texts = [['3', '8'] * 3, ['5', '8'] * 3]
+    digits = ['3', '5']
+    latencies = [0.1, 0.01] * 3
+    accuracy, seconds = replay(texts, digits, [0, 2, 4], latencies)
+    assert accuracy == 1.0
+    assert seconds == pytest.approx(0.3)
+    accuracy, _ = replay(texts, digits, [1, 3, 5], latencies)
+    assert accuracy == 0.0
+
+
+def test_frontier_and_choice():
+    points = [(0.9, 1.0, 'a'), (0.95, 2.0, 'b'), (0.94, 3.0, 'c'), (0.8, 1.5, 'd'), (0.99, 5.0, 'e')]
+    frontier = pareto_frontier(points)
+    assert [point[2] for point in frontier] == ['a', 'b', 'e']
+    assert choose(frontier)[2] == 'e'
+    assert choose(frontier, 0.05)[2] == 'b'
+
+
+def test_candidate_orders_are_prefixes():
+    texts = [['1', '2', '1'], ['4', '4', '7']]
+    orders = candidate_orders(texts, ['1', '4'], [0.1, 0.2, 0.01])
+    assert [0] in orders and [2] in orders
+    assert max(orders, key=len) in ([0, 1, 2], [0, 2, 1], [2, 0, 1])
+
+
+def test_written_yaml_loads_as_ocr_config(tmp_path):
+    path = str(tmp_path / 'ocr_config.yaml')
+    configs = [{'psm': 10, 'oem': 1, 'thresh': None}, {'psm': 7, 'oem': 3, 'thresh': 180}]
+    write_configs(configs, path, 'tuned\naccuracy 1.0')
+    assert load_ocr_configs(path) == configs
+    with open(path) as f:
+        assert f.readline() == '# tuned\n'
+    assert yaml.safe_load(open(path))['tesseract_configs'] == configs
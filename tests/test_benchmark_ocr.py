@@ -0,0 +1,64 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import pytesseract
+import cell_extract
+from benchmark_ocr import TesseractCounter, accuracy_by_digit, run_benchmark, regressions
+from png_grid_extractor import ReadOptions
+from build_template_bank import parse_expected_grids
+
+
+def test_counter_counts_and_restores(monkeypatch):
+    monkeypatch.setattr(pytesseract, 'image_to_string', lambda image, config='': '7')
+    fake = pytesseract.image_to_string
+    with TesseractCounter() as counter:
+        for _ in range(3):
+            assert cell_extract.pytesseract.image_to_string(None) == '7'
+    assert counter.calls == 3
+    assert pytesseract.image_to_string is fake
+
+
+def test_accuracy_by_digit():
+    expected = [[['1', '-'] + ['-'] * 7] + [['-'] * 9 for _ in range(8)]]
+    grid = [[['1', '4'] + ['-'] * 7] + [['-'] * 9 for _ in range(8)]]
+    by_digit, accuracy = accuracy_by_digit(expected, grid)
+    assert by_digit == {'-': 79 / 80, '1': 1.0}
+    assert accuracy == 80 / 81
+
+
+def test_run_benchmark_on_test_grid(monkeypatch):
+    # every config reads 5, so a non-empty cell takes five calls
+    monkeypatch.setattr(cell_extract.pytesseract, 'image_to_string', lambda image, config='': '5')
+    labeled = sorted(parse_expected_grids('tests/grids_expected.txt', 'tests/png').items())[:1]
+    metrics = run_benchmark(labeled)
+    assert metrics['grids'] == 1 and metrics['cells'] == 81
+    assert metrics['tesseract_calls'] % 5 == 0 and metrics['tesseract_calls'] > 0
+    assert metrics['accuracy_by_digit']['5'] == 1.0
+    assert metrics['cell_latency'] == 'measured'
+    assert 0 < metrics['p50_ms'] <= metrics['p95_ms'] <= metrics['p99_ms']
+
+
+def test_run_benchmark_batch_mode_reports_mean():
+    labeled = sorted(parse_expected_grids('tests/grids_expected.txt', 'tests/png').items())[:1]
+    metrics = run_benchmark(labeled, options=ReadOptions('mlp'))
+    assert metrics['cell_latency'] == 'batch mean' and metrics['tesseract_calls'] == 0
+    # well under a millisecond per cell, but not rounded away
+    assert 0 < metrics['p50_ms'] == metrics['p99_ms']
+
+
+def test_regressions_against_baseline():
+    baseline = {'cells_per_s': 100.0, 'p95_ms': 20.0, 'tesseract_calls_per_cell': 5.0, 'accuracy': 0.99}
+    same = dict(baseline, cells_per_s=95.0)
+    assert regressions(same, baseline, threshold=0.1) == []
+    worse = dict(baseline, cells_per_s=80.0, p95_ms=30.0, accuracy=0.98)
+    found = regressions(worse, baseline, threshold=0.1)
+    assert [line.split(':')[0] for line in found] == ['cells_per_s', 'p95_ms', 'accuracy']
+    assert regressions(dict(baseline, accuracy=0.98), baseline, accuracy_tolerance=0.02) == []
+
+
+def test_regressions_from_zero_baseline():
+    baseline = {'p95_ms': 0.0, 'tesseract_calls_per_cell': 0.0, 'accuracy': 1.0}
+    assert regressions(dict(baseline, p95_ms=0.2), baseline) == []
+    found = regressions(dict(baseline, p95_ms=3.0, tesseract_calls_per_cell=0.4), baseline)
+    assert [line.split(':')[0] for line in found] == ['p95_ms', 'tesseract_calls_per_cell']
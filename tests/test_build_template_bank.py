@@ -0,0 +1,79 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+import pytest
+from cell_extract import TemplateBank, normalized_rows
+from build_template_bank import (parse_expected_grids, parse_run_grids, harvest_grid, harvest_cells_dir,
+                                 harvest, kmedoids, build_bank)
+
+EXPECTED_GRIDS = 'tests/grids_expected.txt'
+PNG_DIR = 'tests/png'
+
+
+def test_parse_expected_grids():
+    grids = parse_expected_grids(EXPECTED_GRIDS, PNG_DIR)
+    assert sorted(grids) == [os.path.join(PNG_DIR, f'grid{n}.png') for n in range(1, 5)]
+    assert grids[os.path.join(PNG_DIR, 'grid1.png')][1] == ['5', '-', '-', '4', '-', '-', '-', '8', '9']
+
+
+def test_parse_run_grids(tmp_path):
+    expected = parse_expected_grids(EXPECTED_GRIDS, PNG_DIR)
+    good = expected[os.path.join(PNG_DIR, 'grid2.png')]
+    bad = [row[:] for row in good]
+    bad[0][0] = '9' if bad[0][0] != '9' else '8'
+    lines = []
+    for source, grid in [('copy_of_grid2.png', good), ('misread.png', bad)]:
+        lines += [f'Source file: {source}', 'Ruudukko: x', '+-------+-------+-------+']
+        lines += ['| ' + ' | '.join(' '.join(row[i:i+3]) for i in (0, 3, 6)) + ' |' for row in grid]
+        lines.append('')
+    run = tmp_path / 'grids.txt'
+    run.write_text('\n'.join(lines))
+    runs = parse_run_grids(str(run))
+    assert [source for source, _ in runs] == ['copy_of_grid2.png', 'misread.png']
+    assert runs[0][1] == good
+
+
+def test_kmedoids():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(3, 50))
+    rows = np.vstack([center + 0.1 * rng.normal(size=(10, 50)) for center in centers])
+    medoids = kmedoids(normalized_rows(rows), 3)
+    assert sorted(idx // 10 for idx in medoids) == [0, 1, 2]
+
+
+def test_learned_bank_held_out_grid(tmp_path):
+    expected = sorted(parse_expected_grids(EXPECTED_GRIDS, PNG_DIR).items())
+    train = [sample for path, grid in expected[:3] for sample in harvest_grid(path, grid)]
+    test = harvest_grid(*expected[3])
+    bank = build_bank(train)
+    assert len(bank) == 4 * 9
+    path = str(tmp_path / 'bank.npz')
+    bank.save(path)
+    loaded = TemplateBank.load(path)
+    assert loaded.digits == bank.digits and not loaded.ink_white
+    first = loaded.match_first([gray for _, gray in test])
+    assert all(found is None or found == digit for found, (digit, _) in zip(first, test))
+    # most cells are matched without OCR
+    assert sum(found is not None for found in first) > len(test) * 0.8
+    assert [found for found, _ in loaded.match([gray for _, gray in test])] == [digit for digit, _ in test]
+
+
+def test_harvest_cells_dir():
+    samples = harvest_cells_dir('tests/cells')
+    # the cell labeled '-' is skipped
+    assert sorted(digit for digit, _ in samples) == ['1', '1', '1', '5']
+    assert all(gray.shape == (64, 64) for _, gray in samples)
+
+
+def test_harvest_grid_crops_like_extractor_options(tmp_path):
+    img_path, grid = sorted(parse_expected_grids(EXPECTED_GRIDS, PNG_DIR).items())[0]
+    padded = str(tmp_path / 'padded.png')
+    cv2.imwrite(padded, cv2.copyMakeBorder(cv2.imread(img_path), 200, 100, 200, 50, cv2.BORDER_CONSTANT,
+                                           value=(255, 255, 255)))
+    digits = sorted(value for row in grid for value in row if value.isdigit())
+    # a ninth of the padded image misses digits, the cells between the grid lines have them all
+    assert sorted(digit for digit, _ in harvest_grid(padded, grid, find_lines=True)) == digits
+    assert sorted(digit for digit, _ in harvest_grid(padded, grid, locate=True, find_lines=True)) == digits
@@ -0,0 +1,54 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+from cell_extract import preprocess_cell, preprocess_cells, threshold_cell, CellStack, StackedCell
+from png_grid_extractor import grid_cell_boxes, located_cell_boxes
+
+
+def test_preprocess_cells_matches_preprocess_cell():
+    img = cv2.imread('tests/png/grid1.png')
+    for boxes in (grid_cell_boxes(img), located_cell_boxes(img)[0]):
+        stack = preprocess_cells(img, [box[2:] for box in boxes])
+        for (row, col, x, y, bw, bh), gray in zip(boxes, stack):
+            assert np.array_equal(gray, preprocess_cell(img[y:y+bh, x:x+bw]))
+    assert preprocess_cells(img, []).shape == (0, 64, 64)
+
+
+def test_stack_binaries_match_threshold_cell():
+    img = cv2.imread('tests/png/grid2.png')
+    stack = CellStack(preprocess_cells(img, [box[2:] for box in grid_cell_boxes(img)]), thresholds=[None, 127, 180])
+    assert stack.thresholds == {127, 180}
+    cell = stack[10]
+    assert isinstance(cell, StackedCell)
+    plain = np.array(cell)
+    for thresh in (None, 127, 180, 200):
+        assert np.array_equal(threshold_cell(cell, thresh), threshold_cell(plain, thresh))
+    # the binarized image comes from the stack, not from thresholding again
+    assert np.shares_memory(threshold_cell(cell, 180), stack.binaries[180])
+    assert getattr(255 - cell, 'stack', None) is None
+
+
+def test_stack_binaries_made_on_first_use():
+    rng = np.random.default_rng(1)
+    stack = CellStack(rng.integers(0, 256, (5, 64, 64), dtype=np.uint8), thresholds=[127, 180])
+    assert stack.binaries == {}
+    part = stack.take([0, 3])
+    threshold_cell(part[1], 127)
+    # only the taken cells and the used threshold are binarized
+    assert sorted(part.binaries) == [127] and part.binaries[127].shape == (2, 64, 64)
+    assert stack.binaries == {}
+
+
+def test_take_and_concatenate():
+    rng = np.random.default_rng(2)
+    stack = CellStack(rng.integers(0, 256, (6, 64, 64), dtype=np.uint8), thresholds=[127])
+    stack.binary(127)
+    part = stack.take([1, 4])
+    assert np.array_equal(part.grays, stack.grays[[1, 4]])
+    assert np.array_equal(part.binaries[127], stack.binaries[127][[1, 4]])
+    both = CellStack.concatenate([part, stack.take([0])])
+    assert len(both) == 3 and np.array_equal(np.asarray(both), stack.grays[[1, 4, 0]])
+    assert len(CellStack.concatenate([])) == 0
@@ -0,0 +1,98 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import numpy as np
+import confidence_ocr
+from confidence_ocr import (recognize_gray_confidence, recognize_cells_confidence, read_with_confidence,
+                            reliability_for_confidence, reliability_for_reading, combined_reading, calibrate,
+                            load_calibration, save_calibration, DEFAULT_CALIBRATION)
+
+CALIBRATION = {'high': 90.0, 'medium': 60.0}
+CONFIGS = [{'psm': 10, 'oem': 1, 'thresh': None}, {'psm': 7, 'oem': 1, 'thresh': 180}]
+
+
+def ink_cell():
+    img = np.full((64, 64), 255, dtype=np.uint8)
+    img[16:48, 28:36] = 0
+    return img
+
+
+def fake_data(monkeypatch, reads):
+    """Every image_to_data call returns the next (text, confidence) of reads."""
+    calls = []
+
+    def image_to_data(image, config, output_type):
+        text, conf = reads[len(calls)]
+        calls.append(config)
+        return {'text': ['', text], 'conf': [-1, conf]}
+    monkeypatch.setattr(confidence_ocr.pytesseract, 'image_to_data', image_to_data)
+    return calls
+
+
+def test_read_with_confidence_takes_most_confident_word(monkeypatch):
+    monkeypatch.setattr(confidence_ocr.pytesseract, 'image_to_data',
+                        lambda image, config, output_type: {'text': ['', '4', ' ', '1'], 'conf': ['-1', '71.5', -1, 40]})
+    assert read_with_confidence(ink_cell(), CONFIGS[0]) == ('4', 71.5)
+
+
+def test_confident_read_needs_one_call(monkeypatch):
+    calls = fake_data(monkeypatch, [('7', 96)])
+    assert recognize_gray_confidence(ink_cell(), ocr_configs=CONFIGS, calibration=CALIBRATION) == ('7', 'high', 1)
+    assert len(calls) == 1
+
+
+def test_second_read_confirms_or_lowers(monkeypatch):
+    fake_data(monkeypatch, [('7', 55), ('7', 70)])
+    assert recognize_gray_confidence(ink_cell(), ocr_configs=CONFIGS, calibration=CALIBRATION) == ('7', 'medium', 2)
+    fake_data(monkeypatch, [('7', 80), ('1', 85)])
+    assert recognize_gray_confidence(ink_cell(), ocr_configs=CONFIGS, calibration=CALIBRATION) == ('1', 'low', 1)
+
+
+def test_empty_and_unread_cells(monkeypatch):
+    calls = fake_data(monkeypatch, [('', -1), ('ab', 30)])
+    empty = np.full((64, 64), 255, dtype=np.uint8)
+    assert recognize_gray_confidence(empty, ocr_configs=CONFIGS, calibration=CALIBRATION) == ('-', 'none', 0)
+    assert calls == []
+    assert recognize_gray_confidence(ink_cell(), ocr_configs=CONFIGS, calibration=CALIBRATION) == ('-', 'none', 0)
+
+
+def test_calibrate_separates_vote_classes():
+    samples = [(97, True, 'high'), (93, True, 'high'), (91, True, 'high'), (88, True, 'medium'), (80, True, 'high'),
+               (75, True, 'medium'), (66, True, 'medium'), (50, True, 'low'), (30, True, 'low'), (-1, True, 'none'),
+               # reads that disagree are never medium, whatever their confidence
+               (70, False, 'low'), (68, False, 'low')]
+    calibration = calibrate(samples)
+    assert calibration == {'high': 91.0, 'medium': 66.0}
+    assert [reliability_for_confidence(conf, calibration) for conf, _, _ in samples[:3]] == ['high'] * 3
+    assert reliability_for_confidence(70, calibration) == 'medium'
+    assert reliability_for_confidence(50, calibration) == 'low'
+    assert reliability_for_reading(70, False, calibration) == 'low'
+
+
+def test_combined_reading_matches_recognition(monkeypatch):
+    # calibration thresholds combined_reading, recognition reads only what it needs
+    cases = [[('7', 96), ('1', 85)], [('7', 55), ('7', 70)], [('7', 80), ('1', 95)], [('ab', 20), ('4', 75)],
+             [('4', 75), ('', -1)], [('7', 91), ('7', 40)]]
+    for reads in cases:
+        fake_data(monkeypatch, reads)
+        _, reliability, _ = recognize_gray_confidence(ink_cell(), ocr_configs=CONFIGS, calibration=CALIBRATION)
+        _, conf, agreeing = combined_reading(reads)
+        assert reliability_for_reading(conf, agreeing, CALIBRATION) == reliability, reads
+    assert combined_reading([('', -1), ('x', 10)]) is None
+
+
+def test_calibration_loaded_once_per_batch(monkeypatch):
+    loads = []
+    monkeypatch.setattr(confidence_ocr, 'load_calibration', lambda: loads.append(1) or dict(CALIBRATION))
+    fake_data(monkeypatch, [('7', 96)] * 3)
+    results = recognize_cells_confidence([ink_cell(), ink_cell(), ink_cell()])
+    assert results == [('7', 'high', 1)] * 3
+    assert len(loads) == 1
+
+
+def test_calibration_file_round_trip(tmp_path):
+    path = str(tmp_path / 'calibration.yaml')
+    assert load_calibration(path) == DEFAULT_CALIBRATION
+    save_calibration({'high': 88.5, 'medium': 61}, path, 'test')
+    assert load_calibration(path) == {'high': 88.5, 'medium': 61.0}
@@ -0,0 +1,107 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import numpy as np
+import constraint_ocr
+from constraint_ocr import recognize_grid, CandidateVote
+
+CONFIGS = list(range(10))
+
+
+def solution(row, col):
+    return str((row * 3 + row // 3 + col) % 9 + 1)
+
+
+def ink_cell():
+    img = np.full((64, 64), 255, dtype=np.uint8)
+    img[16:48, 28:36] = 0
+    return img
+
+
+def empty_cell():
+    return np.full((64, 64), 255, dtype=np.uint8)
+
+
+def fake_reads(monkeypatch, scripts):
+    """Every cell image reads its own script, one text per config."""
+    calls = []
+
+    def ocr_cell_text(gray, cfg):
+        calls.append(cfg)
+        return scripts[id(gray)][cfg]
+    monkeypatch.setattr(constraint_ocr, 'ocr_cell_text', ocr_cell_text)
+    return calls
+
+
+def test_candidate_vote_ignores_ruled_out_digits():
+    vote = CandidateVote(['4', '7'], ['1', '7', '1', '7'])
+    assert vote.results == ['7', '7']
+    assert vote.add('1') is None
+    assert vote.results == ['7', '7']
+
+
+def test_forced_cell_needs_no_extra_ocr(monkeypatch):
+    cells = [(solution(row, col), 'template', 0) for row in range(9) for col in range(9)]
+    gray = ink_cell()
+    cells[40] = gray
+    calls = fake_reads(monkeypatch, {id(gray): ['8', '3', solution(4, 4), '3', '1'] + ['8'] * 5})
+    results = recognize_grid(cells, ocr_configs=CONFIGS)
+    assert results[40] == (solution(4, 4), 'low', 1)
+    assert calls == [0, 1, 2, 3, 4]
+    assert results[:40] == cells[:40]
+
+
+def test_candidate_without_votes_is_not_forced(monkeypatch):
+    cells = [(solution(row, col), 'template', 0) for row in range(9) for col in range(9)]
+    gray = ink_cell()
+    cells[40] = gray
+    # no read is the only candidate left: a misread given may have ruled out the real digit
+    calls = fake_reads(monkeypatch, {id(gray): ['8', '3', '8', '3', '1'] + ['8'] * 5})
+    results = recognize_grid(cells, ocr_configs=CONFIGS)
+    assert results[40] == ('-', 'none', 0)
+    assert calls == CONFIGS
+
+
+def test_cell_forced_without_votes_is_not_placed(monkeypatch):
+    cells = [empty_cell() for _ in range(81)]
+    for col in range(8):
+        cells[col] = (str(col + 1), 'template', 0)
+    unread, neighbour = ink_cell(), ink_cell()
+    cells[8], cells[17] = unread, neighbour
+    fake_reads(monkeypatch, {
+        id(unread): ['4', '2', '4', '2', '3'] + ['4'] * 5,
+        # the neighbour below reads 9, the digit the unread cell would be forced to
+        id(neighbour): ['9', '6', '9', '6', '2'] + ['9'] * 5,
+    })
+    results = recognize_grid(cells, ocr_configs=CONFIGS)
+    assert results[8] == ('-', 'none', 0)
+    assert results[17][0] == '9'
+
+
+def test_cheap_pass_agreement_is_a_given(monkeypatch):
+    cells = [empty_cell() for _ in range(81)]
+    given, uncertain = ink_cell(), ink_cell()
+    cells[0], cells[5] = given, uncertain
+    calls = fake_reads(monkeypatch, {
+        id(given): ['1'] * 10,
+        # the misread 1 is impossible in the row of the given 1
+        id(uncertain): ['1', '7', '1', '7', '1', '7', '1', '7', '7', '7'],
+    })
+    results = recognize_grid(cells, ocr_configs=CONFIGS)
+    assert results[0] == ('1', 'high', 5)
+    assert results[5] == ('7', 'high', 5)
+    assert results[1] == ('-', 'none', 0)
+    # the given stops at its 5th read, the uncertain cell at its 5th 7
+    assert len(calls) == 5 + 9
+
+
+def test_conflicting_givens_disable_constraints(monkeypatch):
+    cells = [empty_cell() for _ in range(81)]
+    cells[0] = ('5', 'template', 0)
+    cells[8] = ('5', 'template', 0)
+    gray = ink_cell()
+    cells[4] = gray
+    fake_reads(monkeypatch, {id(gray): ['5', '2', '5', '2', '3', '5', '2', '3', '4', '6']})
+    results = recognize_grid(cells, ocr_configs=CONFIGS)
+    assert results[4] == ('5', 'medium', 3)
@@ -0,0 +1,42 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+import pytest
+from digit_locate import locate_digits
+
+PNG_DIR = 'tests/png'
+EXPECTED_GRIDS = 'tests/grids_expected.txt'
+
+
+def expected_cells(path):
+    with open(path, 'r') as f:
+        blocks = f.read().split('Grid')[1:]
+    return [[c for line in block.splitlines() if line.startswith('|') for c in line.replace('|', ' ').split()]
+            for block in blocks]
+
+
+@pytest.mark.parametrize('grid_idx', [1, 2, 3, 4])
+def test_locate_digits_finds_empty_cells(grid_idx):
+    img = cv2.imread(os.path.join(PNG_DIR, f'grid{grid_idx}.png'))
+    expected = expected_cells(EXPECTED_GRIDS)[grid_idx - 1]
+    located = locate_digits(img)
+    assert len(located) == 81
+    for idx, (value, box) in enumerate(zip(expected, located)):
+        assert (value == '-') == (box is None), f'cell ({idx // 9},{idx % 9})'
+
+
+def test_locate_digits_box_inside_cell():
+    img = np.full((450, 450, 3), 255, dtype=np.uint8)
+    for i in range(10):
+        cv2.line(img, (i * 50, 0), (i * 50, 449), (0, 0, 0), 3 if i % 3 == 0 else 1)
+        cv2.line(img, (0, i * 50), (449, i * 50), (0, 0, 0), 3 if i % 3 == 0 else 1)
+    cv2.putText(img, '7', (112, 90), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3)
+    # a speck of dust is not a digit
+    cv2.circle(img, (325, 325), 1, (0, 0, 0), -1)
+    located = locate_digits(img)
+    assert [idx for idx, box in enumerate(located) if box is not None] == [1 * 9 + 2]
+    x, y, w, h = located[11]
+    assert 100 <= x and x + w <= 150 + 5 and 50 - 5 <= y and y + h <= 100 + 5
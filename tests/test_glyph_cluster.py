@@ -0,0 +1,54 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+import pytest
+import cell_extract
+from glyph_cluster import normalized_vectors, cluster_vectors, recognize_cells_clustered
+
+
+def digit_cell(text, seed):
+    img = np.full((64, 64), 255, dtype=np.uint8)
+    cv2.putText(img, text, (16, 52), cv2.FONT_HERSHEY_SIMPLEX, 1.8, 0, 4)
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(-10, 11, img.shape)
+    img = np.clip(img.astype(int) + noise, 0, 255).astype(np.uint8)
+    img[img < 10] = 0
+    return img
+
+
+def test_normalized_vectors_correlation():
+    cells = [digit_cell('3', 1), digit_cell('3', 2)]
+    vectors = normalized_vectors(cells)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    expected = np.corrcoef(np.asarray(cells, dtype=np.float64).reshape(2, -1))[0, 1]
+    assert vectors[0] @ vectors[1] == pytest.approx(expected, abs=1e-5)
+
+
+def test_cluster_by_digit():
+    digits = '5183' * 5
+    cells = [digit_cell(d, seed) for seed, d in enumerate(digits)]
+    clusters = cluster_vectors(normalized_vectors(cells))
+    assert len(clusters) == 4
+    for members in clusters:
+        assert len({digits[idx] for idx in members}) == 1
+
+
+def test_recognize_cells_clustered_one_vote_per_glyph(monkeypatch):
+    digits = '2974' * 6
+    cells = [digit_cell(d, seed) for seed, d in enumerate(digits)]
+    cells.insert(3, np.full((64, 64), 230, dtype=np.uint8))
+    read = []
+
+    def fake_recognize_gray(gray, templates=None):
+        # the reader knows which digit it was given by looking up the cell
+        idx = next(i for i, cell in enumerate(cells) if cell is gray)
+        read.append(idx)
+        return ('-', 'none', 0) if idx == 3 else (digits[idx if idx < 3 else idx - 1], 'high', 5)
+
+    monkeypatch.setattr(cell_extract, 'recognize_gray', fake_recognize_gray)
+    results = recognize_cells_clustered(cells)
+    assert [r[0] for r in results] == list(digits[:3]) + ['-'] + list(digits[3:])
+    assert len(read) == 4
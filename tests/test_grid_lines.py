@@ -0,0 +1,72 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+from grid_lines import find_grid_lines, grid_line_boxes, line_positions, span_between
+from png_grid_extractor import grid_cell_boxes, cell_boxes
+from build_template_bank import parse_expected_grids, EXPECTED_GRIDS, PNG_DIR
+
+
+def drawn_grid(left=0, top=0, cell=50):
+    """A white image with a 9x9 grid starting at (left, top), thick lines every third."""
+    size = 9 * cell
+    img = np.full((top + size + 10, left + size + 10, 3), 255, dtype=np.uint8)
+    for i in range(10):
+        thickness = 5 if i % 3 == 0 else 1
+        cv2.line(img, (left + i * cell, top), (left + i * cell, top + size), (0, 0, 0), thickness)
+        cv2.line(img, (left, top + i * cell), (left + size, top + i * cell), (0, 0, 0), thickness)
+    return img
+
+
+def test_lines_found_with_uneven_borders():
+    img = drawn_grid(left=37, top=12)
+    rows, cols = find_grid_lines(img)
+    assert [start <= 12 + i * 50 < end for i, (start, end) in enumerate(rows)] == [True] * 10
+    assert [start <= 37 + i * 50 < end for i, (start, end) in enumerate(cols)] == [True] * 10
+
+
+def test_boxes_stay_between_lines():
+    img = drawn_grid(left=37, top=12)
+    rows, cols = find_grid_lines(img)
+    for row, col, x, y, w, h in grid_line_boxes(img):
+        assert cols[col][1] <= x and x + w <= cols[col + 1][0]
+        assert rows[row][1] <= y and y + h <= rows[row + 1][0]
+        # the crop is still a cell, not a sliver
+        assert w >= 25 and h >= 25
+
+
+def test_missing_line_stays_at_even_position():
+    profile = np.zeros(900, dtype=int)
+    for i in range(10):
+        if i != 4:
+            profile[i * 100 - 2 if i else 0:i * 100 + 2] = 500
+    lines = line_positions(profile, 900)
+    assert lines[4] == (400, 400)
+    assert lines[5] == (498, 502)
+
+
+def test_span_between_never_on_lines():
+    assert span_between((0, 10), (100, 104)) == (24, 82)
+    assert span_between((0, 45), (55, 60)) == (45, 50)
+
+
+def test_clean_grid_matches_even_boxes():
+    img = cv2.imread('tests/png/grid1.png')
+    for found, even in zip(grid_line_boxes(img), grid_cell_boxes(img)):
+        assert found[:2] == even[:2]
+        assert abs(found[2] - even[2]) <= 10 and abs(found[3] - even[3]) <= 10
+
+
+def test_located_digits_between_lines_of_padded_grid():
+    img_path, expected = sorted(parse_expected_grids(EXPECTED_GRIDS, PNG_DIR).items())[0]
+    img = cv2.copyMakeBorder(cv2.imread(img_path), 200, 100, 200, 50, cv2.BORDER_CONSTANT, value=(255, 255, 255))
+    boxes, empty = cell_boxes(img, locate=True, find_lines=True)
+    assert empty == [value == '-' for row in expected for value in row]
+    rows, cols = find_grid_lines(img)
+    for (row, col, x, y, w, h), is_empty in zip(boxes, empty):
+        if not is_empty:
+            # the digit box is centered in the cell between its lines
+            assert cols[col][0] <= x + w / 2 <= cols[col + 1][1]
+            assert rows[row][0] <= y + h / 2 <= rows[row + 1][1]
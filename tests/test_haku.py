@@ -0,0 +1,125 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import pytest
+from ratkaisija import lue_ruudukko, data1, TYHJA
+from ratkaisutila import Ratkaisutila
+from haku import Haku, Transpositiotaulu, ratkaise, onko_yksikasitteinen, ratkeavat_numerot
+
+VAIKEA = """
+- - - - - - - 1 2
+- - - - 3 5 - - -
+- - - 6 - - - 7 -
+7 - - - - - 3 - -
+- - - 4 - - 8 - -
+1 - - - - - - - -
+- - - 1 2 - - - -
+- 8 - - - - - 4 -
+- 5 - - - - 6 - -
+"""
+
+# AI Escargot: vaatii paljon haarautumista myös yksinäisten täytön jälkeen
+ESCARGOT = """
+1 - - - - 7 - 9 -
+- 3 - - 2 - - - 8
+- - 9 6 - - 5 - -
+- - 5 3 - - 9 - -
+- 1 - - 8 - - - 2
+6 - - - - 4 - - -
+3 - - - - - - 1 -
+- 4 - - - - - - 7
+- - 7 - - - 3 - -
+"""
+
+
+def onko_oikea_ratkaisu(ruudukko):
+    for i in range(9):
+        if set(ruudukko[i]) != set(range(1, 10)):
+            return False
+        if set(ruudukko[j][i] for j in range(9)) != set(range(1, 10)):
+            return False
+    return True
+
+
+def test_ratkaise_sailyttaa_annetut():
+    ruudukko = lue_ruudukko(data1)
+    ratkaisut = ratkaise(ruudukko)
+    assert len(ratkaisut) == 1
+    assert onko_oikea_ratkaisu(ratkaisut[0])
+    for x in range(9):
+        for y in range(9):
+            if ruudukko[x][y] != TYHJA:
+                assert ratkaisut[0][x][y] == ruudukko[x][y]
+
+
+def test_yksikasitteisyys():
+    assert onko_yksikasitteinen(lue_ruudukko(VAIKEA))
+    tyhja = [[TYHJA] * 9 for _ in range(9)]
+    assert not onko_yksikasitteinen(tyhja)
+
+
+def test_ristiriitainen_ruudukko():
+    ruudukko = [[TYHJA] * 9 for _ in range(9)]
+    ruudukko[0][0] = 3
+    ruudukko[1][1] = 3
+    assert ratkaise(ruudukko) == []
+
+
+def test_haku_palauttaa_tilan():
+    tila = Ratkaisutila(lue_ruudukko(VAIKEA))
+    ruudut = tila.ruudut.copy()
+    tiiviste = tila.tiiviste
+    Haku(enintaan=2).hae(tila)
+    assert tila.ruudut == ruudut
+    assert tila.tiiviste == tiiviste
+
+
+def test_transpositiotaulu_karsii_toistuvan_haun():
+    ruudukko = lue_ruudukko(ESCARGOT)
+    taulu = Transpositiotaulu()
+    ensimmainen = Haku(enintaan=2, taulu=taulu)
+    ensimmainen.hae(Ratkaisutila(ruudukko))
+    toinen = Haku(enintaan=2, taulu=taulu)
+    ratkaisut = toinen.hae(Ratkaisutila(ruudukko))
+    assert len(ratkaisut) == 1
+    assert taulu.osumat > 0
+    assert toinen.solmut < ensimmainen.solmut
+
+
+def test_transpositiotaulu_on_rajattu():
+    taulu = Transpositiotaulu(koko=2)
+    taulu.lisaa(1)
+    taulu.lisaa(2)
+    assert taulu.umpikuja(1)
+    taulu.lisaa(3)
+    # 2 oli pisimpään käyttämättä
+    assert len(taulu) == 2
+    assert taulu.umpikuja(1) and taulu.umpikuja(3)
+    assert not taulu.umpikuja(2)
+
+
+def test_ratkeavat_numerot_jakavat_taulun():
+    ruudukko = lue_ruudukko(ESCARGOT)
+    ratkaisu = ratkaise(ruudukko)[0]
+    taulu = Transpositiotaulu()
+    numerot = ratkeavat_numerot(ruudukko, taulu)
+    tyhjat = [(x, y) for x in range(9) for y in range(9) if ruudukko[x][y] == TYHJA]
+    # yksikäsitteisessä ruudukossa jokaisessa ruudussa ratkeaa vain ratkaisun numero
+    assert numerot == {(x, y): [ratkaisu[x][y]] for x, y in tyhjat}
+    # eri ehdokkaista alkaneet haut päätyvät samoihin umpikujiin
+    assert taulu.osumat > 0
+
+
+def test_ratkeavat_numerot_vihjeet():
+    ruudukko = [list(rivi) for rivi in lue_ruudukko(VAIKEA)]
+    ratkaisu = ratkaise(ruudukko)[0]
+    # kahden annetun poistamisen jälkeen ratkaisuja on useita
+    ruudukko[0][3] = TYHJA
+    ruudukko[3][4] = TYHJA
+    numerot = ratkeavat_numerot(ruudukko)
+    assert all(ratkaisu[x][y] in vaihtoehdot for (x, y), vaihtoehdot in numerot.items())
+    assert any(len(vaihtoehdot) > 1 for vaihtoehdot in numerot.values())
+    # ruudut, joissa ratkeaa yksi numero, ovat varmoja vihjeitä
+    assert any(len(vaihtoehdot) == 1 for vaihtoehdot in numerot.values())
+    assert ratkeavat_numerot([[3, 3] + [TYHJA] * 7] + [[TYHJA] * 9 for _ in range(8)]) == {}
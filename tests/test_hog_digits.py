@@ -0,0 +1,57 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+import pytest
+from hog_digits import HogDigits, hog_features, recognize_cells_hog
+
+
+def digit_cell(text, seed):
+    img = np.full((64, 64), 255, dtype=np.uint8)
+    rng = np.random.default_rng(seed)
+    dx, dy = rng.integers(-3, 4, 2)
+    cv2.putText(img, text, (16 + dx, 52 + dy), cv2.FONT_HERSHEY_SIMPLEX, 1.8, 0, 4)
+    noise = rng.integers(-10, 11, img.shape)
+    img = np.clip(img.astype(int) + noise, 0, 255).astype(np.uint8)
+    img[img < 10] = 0
+    return img
+
+
+def training_samples():
+    return [(d, digit_cell(d, seed)) for seed, d in enumerate('1738' * 6)]
+
+
+def test_hog_features_shape():
+    x = hog_features([digit_cell('1', 0), digit_cell('7', 1)])
+    assert x.shape == (2, 1764)
+    assert hog_features([]).shape == (0, 1764)
+
+
+@pytest.mark.parametrize('kind', ['svm', 'knn'])
+def test_train_save_load_and_recognize(tmp_path, kind):
+    model = HogDigits.train(training_samples(), kind)
+    path = str(tmp_path / 'hog.yml.gz')
+    model.save(path)
+    loaded = HogDigits.load(path)
+    assert loaded.kind == kind and loaded.labels == ['1', '3', '7', '8']
+    cells = [digit_cell('3', 100), np.full((64, 64), 230, dtype=np.uint8), digit_cell('8', 101)]
+    results = recognize_cells_hog(cells, model=loaded)
+    assert [r[0] for r in results] == ['3', '-', '8']
+    assert results[1] == ('-', 'none', 0)
+    assert [r[1] for r in results] == [r[1] for r in recognize_cells_hog(cells, model=model)]
+
+
+def test_margin_reliability():
+    model = HogDigits.train(training_samples(), 'knn')
+    (digit, margin), = model.predict([digit_cell('7', 200)])
+    assert digit == '7' and margin == pytest.approx(1.0)
+    assert model.reliability(1.0) == 'high'
+    assert model.reliability(0.6) == 'medium'
+    assert model.reliability(0.2) == 'low'
+
+
+def test_missing_model_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        HogDigits.load(str(tmp_path / 'missing.yml.gz'))
@@ -0,0 +1,80 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import time
+import multiprocessing
+import pytest
+import kilpailu
+from ratkaisija import lue_ruudukko, data1, TYHJA
+from ratkaisutila import Ratkaisutila, Rakenne
+from yksikot import MUUNNELMAT
+from kilpailu import kilpailuta, LOGIIKKA, HAKU
+
+
+def test_kilpailuta_ratkaisee():
+    ruudukko = lue_ruudukko(data1)
+    tulos = kilpailuta(ruudukko, aikaraja=30.0)
+    assert tulos.voittaja in (LOGIIKKA, HAKU)
+    assert Ratkaisutila(tulos.ratkaisu).valmis()
+    if tulos.voittaja == LOGIIKKA:
+        assert tulos.jalki
+
+
+def test_kilpailuta_ristiriita():
+    ruudukko = [[TYHJA] * 9 for _ in range(9)]
+    ruudukko[0][0] = 4
+    ruudukko[0][1] = 4
+    tulos = kilpailuta(ruudukko, aikaraja=30.0)
+    assert tulos.ratkaisu is None
+    assert tulos.voittaja is None
+
+
+def test_kilpailuta_muunnelma():
+    # päättely ei tunne lävistäjiä, mutta voittajan ratkaisun on täytettävä nekin
+    rakenne = Rakenne(MUUNNELMAT["x"]())
+    tulos = kilpailuta([[TYHJA] * 9 for _ in range(9)], aikaraja=30.0, rakenne=rakenne)
+    assert tulos.ratkaisu is not None
+    assert Ratkaisutila(tulos.ratkaisu, rakenne).valmis()
+
+
+def hidas(funktio, viive):
+    def hidastettu(ruudukko, rakenne, jono):
+        time.sleep(viive)
+        funktio(ruudukko, rakenne, jono)
+    return hidastettu
+
+
+def test_kilpailuta_paattely_voittaa(monkeypatch):
+    monkeypatch.setattr(kilpailu, "_haku", hidas(kilpailu._haku, 5.0))
+    tulos = kilpailuta(lue_ruudukko(data1), aikaraja=30.0)
+    assert tulos.voittaja == LOGIIKKA
+    assert Ratkaisutila(tulos.ratkaisu).valmis()
+    assert tulos.jalki
+
+
+def test_kilpailuta_sailyttaa_jaljen_yhtaaikaa(monkeypatch):
+    # molemmat ratkaisevat ensin, sitten haku vastaa ja päättely heti perään
+    valmiit = multiprocessing.Barrier(2)
+    logiikka, haku = kilpailu._logiikka, kilpailu._haku
+
+    def logiikka_perassa(ruudukko, rakenne, jono):
+        class Perassa:
+            def put(self, viesti):
+                valmiit.wait()
+                time.sleep(0.01)
+                jono.put(viesti)
+        logiikka(ruudukko, rakenne, Perassa())
+
+    def haku_yhtaaikaa(ruudukko, rakenne, jono):
+        class Yhtaaikaa:
+            def put(self, viesti):
+                valmiit.wait()
+                jono.put(viesti)
+        haku(ruudukko, rakenne, Yhtaaikaa())
+
+    monkeypatch.setattr(kilpailu, "_logiikka", logiikka_perassa)
+    monkeypatch.setattr(kilpailu, "_haku", haku_yhtaaikaa)
+    tulos = kilpailuta(lue_ruudukko(data1), aikaraja=30.0)
+    assert tulos.voittaja == HAKU
+    assert tulos.jalki
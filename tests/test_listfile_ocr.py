@@ -0,0 +1,68 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+import pytest
+import cell_extract
+from cell_extract import texts_from_pages, ocr_list_file, recognize_cells_listfile
+
+
+def test_texts_from_pages():
+    data = {
+        'page_num': [1, 1, 2, 3, 3, 5],
+        'text': ['', '4', '', '1', '7', '9'],
+    }
+    # page 5 does not exist, page 2 and 4 have no words
+    assert texts_from_pages(data, 4) == ['4', '', '1 7', '']
+
+
+def fake_image_to_data(list_path, config, output_type):
+    # reads the digit from the top left pixel of every listed image
+    data = {'page_num': [], 'text': []}
+    with open(list_path) as f:
+        paths = [line.strip() for line in f if line.strip()]
+    for page, path in enumerate(paths, start=1):
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        data['page_num'].append(page)
+        data['text'].append('')
+        marker = int(img[0, 0])
+        if 1 <= marker <= 9:
+            data['page_num'].append(page)
+            data['text'].append(str(marker))
+    return data
+
+
+def test_ocr_list_file_keeps_order(monkeypatch):
+    monkeypatch.setattr(cell_extract.pytesseract, 'image_to_data', fake_image_to_data)
+    images = []
+    for marker in (5, 200, 2):
+        img = np.full((64, 64), 255, dtype=np.uint8)
+        img[0, 0] = marker
+        images.append(img)
+    assert ocr_list_file(images, 10, 1) == ['5', '', '2']
+    assert ocr_list_file([], 10, 1) == []
+
+
+def test_recognize_cells_listfile(monkeypatch):
+    calls = []
+
+    def counting(list_path, config, output_type):
+        calls.append(config)
+        return fake_image_to_data(list_path, config, output_type)
+
+    monkeypatch.setattr(cell_extract.pytesseract, 'image_to_data', counting)
+    grays = []
+    for marker in (6, 0):
+        gray = np.full((64, 64), 255, dtype=np.uint8)
+        gray[20:40, 20:40] = 0
+        gray[0, 0] = marker
+        grays.append(gray)
+    grays.append(np.full((64, 64), 200, dtype=np.uint8))
+    configs = [{'psm': 10, 'oem': 1, 'thresh': None}] * 6
+    results = recognize_cells_listfile(grays, ocr_configs=configs)
+    # the second cell is never read, and with no templates it is left empty
+    assert results == [('6', 'high', 5), ('-', 'none', 0), ('-', 'none', 0)]
+    # the undecided cell keeps the last config running
+    assert len(calls) == 6
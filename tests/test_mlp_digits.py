@@ -0,0 +1,53 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+from mlp_digits import MlpDigits, features, train_model, recognize_cells_mlp, load_model, MODEL_PATH
+from build_template_bank import parse_expected_grids, harvest_grid
+
+
+def digit_cell(text, seed):
+    img = np.full((64, 64), 255, dtype=np.uint8)
+    cv2.putText(img, text, (16, 52), cv2.FONT_HERSHEY_SIMPLEX, 1.8, 0, 4)
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(-10, 11, img.shape)
+    img = np.clip(img.astype(int) + noise, 0, 255).astype(np.uint8)
+    img[img < 10] = 0
+    return img
+
+
+def test_features_ink_is_one():
+    x = features([np.full((64, 64), 255, dtype=np.uint8), np.zeros((64, 64), dtype=np.uint8)])
+    assert x.shape == (2, 28 * 28)
+    assert np.allclose(x[0], 0.0) and np.allclose(x[1], 1.0)
+
+
+def test_train_save_load_and_recognize(tmp_path):
+    samples = [(d, digit_cell(d, seed)) for seed, d in enumerate('17' * 3)]
+    model = train_model(samples, copies=10, epochs=30)
+    path = str(tmp_path / 'mlp.npz')
+    model.save(path)
+    loaded = MlpDigits.load(path)
+    cells = [digit_cell('1', 100), np.full((64, 64), 230, dtype=np.uint8), digit_cell('7', 101)]
+    results = recognize_cells_mlp(cells, model=loaded)
+    assert [r[0] for r in results] == ['1', '-', '7']
+    assert results[1] == ('-', 'none', 0)
+    assert all(r[2] == 0 for r in results)
+
+
+def test_held_out_grid():
+    expected = sorted(parse_expected_grids('tests/grids_expected.txt', 'tests/png').items())
+    train = [sample for path, grid in expected[:3] for sample in harvest_grid(path, grid)]
+    test = harvest_grid(*expected[3])
+    model = train_model(train, copies=5, epochs=20)
+    predicted = model.predict([gray for _, gray in test])
+    assert [digit for digit, _ in predicted] == [digit for digit, _ in test]
+
+
+def test_shipped_model_loads_and_predicts():
+    model = load_model(MODEL_PATH)
+    assert model.labels == [str(digit) for digit in range(1, 10)]
+    predicted = model.predict([digit_cell('4', 0), digit_cell('8', 1)])
+    assert len(predicted) == 2 and all(label in model.labels and 0.0 <= p <= 1.0 for label, p in predicted)
@@ -0,0 +1,92 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import numpy as np
+import pytest
+import montage_ocr
+from montage_ocr import build_montage, tile_index, texts_from_data, recognize_cells_montage, TILE_SIZE, TILE_GAP
+from cell_extract import OcrVote
+
+PITCH = TILE_SIZE + TILE_GAP
+
+
+def test_build_montage_places_tiles():
+    tiles = [np.full((TILE_SIZE, TILE_SIZE), v, dtype=np.uint8) for v in (10, 20, 30)]
+    montage = build_montage(tiles, 2, 255)
+    assert montage.shape == (2 * PITCH + TILE_GAP, 2 * PITCH + TILE_GAP)
+    assert montage[TILE_GAP, TILE_GAP] == 10
+    assert montage[TILE_GAP, TILE_GAP + PITCH] == 20
+    assert montage[TILE_GAP + PITCH, TILE_GAP] == 30
+    assert montage[TILE_GAP + PITCH, TILE_GAP + PITCH] == 255
+
+
+def test_tile_index_and_texts():
+    data = {
+        'text': ['4', '', '1', '7', '2'],
+        'left': [TILE_GAP + 20, 0, TILE_GAP + PITCH + 30, TILE_GAP + PITCH + 10, TILE_GAP + 5],
+        'top': [TILE_GAP + 10, 0, TILE_GAP + 12, TILE_GAP + 12, TILE_GAP + PITCH + 8],
+        'width': [20, 0, 15, 15, 20],
+        'height': [40, 0, 40, 40, 40],
+    }
+    assert tile_index(TILE_GAP + 20, TILE_GAP + 10, 20, 40, 2, 3) == 0
+    # word boxes are joined left to right within a tile
+    assert texts_from_data(data, 2, 3) == ['4', '71', '2']
+
+
+def test_recognize_cells_montage_matches_vote(monkeypatch):
+    # each cell has a dark square; the fake tesseract reads its intensity as the digit
+    grays = []
+    for digit in (3, 8):
+        gray = np.full((TILE_SIZE, TILE_SIZE), 255, dtype=np.uint8)
+        gray[20:40, 20:40] = 0
+        gray[0, 0] = digit
+        grays.append(gray)
+    grays.append(np.full((TILE_SIZE, TILE_SIZE), 200, dtype=np.uint8))
+
+    calls = []
+
+    def fake_image_to_data(montage, config, output_type):
+        calls.append(config)
+        data = {'text': [], 'left': [], 'top': [], 'width': [], 'height': []}
+        columns = (montage.shape[1] - TILE_GAP) // PITCH
+        rows = (montage.shape[0] - TILE_GAP) // PITCH
+        for row in range(rows):
+            for col in range(columns):
+                y, x = TILE_GAP + row * PITCH, TILE_GAP + col * PITCH
+                marker = int(montage[y, x])
+                if 1 <= marker <= 9:
+                    data['text'].append(str(marker))
+                    data['left'].append(x + 20)
+                    data['top'].append(y + 20)
+                    data['width'].append(20)
+                    data['height'].append(20)
+        return data
+
+    monkeypatch.setattr(montage_ocr.pytesseract, 'image_to_data', fake_image_to_data)
+    configs = [{'psm': psm, 'oem': oem, 'thresh': None} for psm in (6, 11, 12) for oem in (1, 3)]
+    configs.append({'psm': 6, 'oem': 0, 'thresh': None})
+    results = recognize_cells_montage(grays, ocr_configs=configs)
+    assert results == [('3', 'high', 5), ('8', 'high', 5), ('-', 'none', 0)]
+    # both cells decided after five configs, so the last two are skipped
+    assert len(calls) == 5
+
+    # psm 10 over a montage is the psm 7 call, so each pair is read and voted once
+    calls.clear()
+    configs = [{'psm': psm, 'oem': oem, 'thresh': None} for oem in (1, 3) for psm in (7, 10)]
+    results = recognize_cells_montage(grays, ocr_configs=configs)
+    assert calls == ['--psm 7 --oem 1 -c tessedit_char_whitelist=123456789',
+                     '--psm 7 --oem 3 -c tessedit_char_whitelist=123456789']
+    # two reads, not four: the repeated calls do not raise the reliability
+    assert results[:2] == [('3', 'low', 2), ('8', 'low', 2)]
+
+
+def test_ocr_vote():
+    vote = OcrVote()
+    for text in ['1', 'x', '7', '1', '']:
+        assert vote.add(text) is None
+    assert vote.decide() == ('1', 'low', 2)
+    vote = OcrVote()
+    for text in ['1', '7']:
+        vote.add(text)
+    assert vote.decide() is None
@@ -0,0 +1,108 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+import pytest
+import cell_extract
+from cell_extract import extract_and_recognize_cell
+from ocr_cache import CellCache, cell_hash, hamming
+from build_template_bank import harvest
+
+
+def digit_cell(text, noise_seed=None):
+    img = np.full((64, 64), 255, dtype=np.uint8)
+    cv2.putText(img, text, (16, 52), cv2.FONT_HERSHEY_SIMPLEX, 1.8, 0, 4)
+    if noise_seed is not None:
+        rng = np.random.default_rng(noise_seed)
+        noise = rng.integers(-6, 7, img.shape)
+        img = np.clip(img.astype(int) + noise, 0, 255).astype(np.uint8)
+    return img
+
+
+def test_hash_near_for_noise_far_for_other_digit():
+    assert hamming(cell_hash(digit_cell('7')), cell_hash(digit_cell('7', noise_seed=1))) <= 6
+    assert hamming(cell_hash(digit_cell('7')), cell_hash(digit_cell('1'))) > 20
+
+
+def test_cache_hit_within_tolerance():
+    cache = CellCache(tolerance=6)
+    cache.put(digit_cell('7'), ('7', 'high', 5))
+    assert cache.get(digit_cell('7', noise_seed=2)) == ('7', 'high', 5)
+    assert cache.get(digit_cell('1')) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_lru_eviction():
+    cache = CellCache(tolerance=0, max_entries=2)
+    cells = {d: digit_cell(d) for d in '123'}
+    cache.put(cells['1'], ('1', 'high', 5))
+    cache.put(cells['2'], ('2', 'high', 5))
+    assert cache.get(cells['1']) is not None
+    cache.put(cells['3'], ('3', 'high', 5))
+    # 2 was the least recently used
+    assert cache.get(cells['2']) is None
+    assert cache.get(cells['1']) == ('1', 'high', 5)
+    assert cache.get(cells['3']) == ('3', 'high', 5)
+
+
+def test_cache_persists(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = CellCache(path)
+    cache.put(digit_cell('4'), ('4', 'medium', 3))
+    cache.save()
+    loaded = CellCache(path)
+    assert loaded.get(digit_cell('4')) == ('4', 'medium', 3)
+    # entries from another process are merged with update
+    other = CellCache()
+    other.put(digit_cell('9'), ('9', 'high', 5))
+    loaded.update(other.take_new())
+    assert loaded.get(digit_cell('9')) == ('9', 'high', 5)
+    assert other.take_new() == {}
+
+
+def test_cache_skips_tesseract(monkeypatch):
+    calls = []
+
+    def fake_image_to_string(image, config):
+        calls.append(config)
+        return '6'
+
+    monkeypatch.setattr(cell_extract.pytesseract, 'image_to_string', fake_image_to_string)
+    image = cv2.cvtColor(digit_cell('6'), cv2.COLOR_GRAY2BGR)
+    cache = CellCache()
+    first = extract_and_recognize_cell(image, 0, 0, 64, 64, cache=cache)
+    n_calls = len(calls)
+    assert first == ('6', 'high', 5) and n_calls == 5
+    assert extract_and_recognize_cell(image, 0, 0, 64, 64, cache=cache) == first
+    assert len(calls) == n_calls
+
+
+def test_namespaces_are_separate_and_guesses_not_cached():
+    cache = CellCache()
+    cache.put(digit_cell('3'), ('3', 'medium', 1), 'confidence')
+    assert cache.get(digit_cell('3')) is None
+    assert cache.get(digit_cell('3'), 'confidence') == ('3', 'medium', 1)
+    cache.put(digit_cell('5'), ('5', 'low', 1))
+    cache.put(digit_cell('8'), ('-', 'none', 0))
+    assert cache.get(digit_cell('5')) is None and cache.get(digit_cell('8')) is None
+    new = cache.take_new()
+    assert list(new) == [('confidence', cell_hash(digit_cell('3')))]
+    assert new[('confidence', cell_hash(digit_cell('3')))][0] == ('3', 'medium', 1)
+
+
+
+def test_labeled_cells_hit_only_their_own_digit():
+    samples = harvest(cells_dir=None)
+    hits = 0
+    for idx, (digit, gray) in enumerate(samples):
+        cache = CellCache()
+        for other, (other_digit, other_gray) in enumerate(samples):
+            if other != idx:
+                cache.put(other_gray, (other_digit, 'high', 5))
+        found = cache.get(gray)
+        assert found is None or found[0] == digit
+        hits += found is not None
+    # the same digit printed again is found for most cells
+    assert hits > len(samples) // 2
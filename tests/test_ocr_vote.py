@@ -0,0 +1,75 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import itertools
+import random
+import pytest
+from cell_extract import OcrVote, order_configs
+
+
+def run_vote(texts, early_stop):
+    # same loop as recognize_gray, fallback reported as None
+    vote = OcrVote()
+    calls = 0
+    for idx, text in enumerate(texts):
+        if early_stop and vote.settled(len(texts) - idx):
+            break
+        calls += 1
+        decided = vote.add(text)
+        if decided:
+            return decided, calls
+    return vote.decide(), calls
+
+
+def outcome(result):
+    return None if result is None else result[:2]
+
+
+def test_settled_keeps_digit_and_reliability():
+    satunnainen = random.Random(7)
+    alphabet = ['1', '1', '1', '7', '7', '4', '', 'x']
+    saved = 0
+    for _ in range(20000):
+        texts = [satunnainen.choice(alphabet) for _ in range(satunnainen.randint(1, 21))]
+        full, full_calls = run_vote(texts, early_stop=False)
+        early, early_calls = run_vote(texts, early_stop=True)
+        assert outcome(early) == outcome(full), texts
+        assert early_calls <= full_calls
+        saved += full_calls - early_calls
+    assert saved > 0
+
+
+def test_settled_exhaustive_short():
+    # every sequence of up to 6 texts from a small alphabet
+    for length in range(1, 7):
+        for texts in itertools.product(['1', '2', ''], repeat=length):
+            assert outcome(run_vote(texts, True)[0]) == outcome(run_vote(texts, False)[0]), texts
+
+
+def test_settled_examples():
+    vote = OcrVote()
+    for text in ['3', '3', '3', '3', '', '', '']:
+        vote.add(text)
+    # the leader could still reach five votes
+    assert not vote.settled(1)
+    vote = OcrVote()
+    for text in ['3', '3', '3']:
+        vote.add(text)
+    assert vote.settled(1)
+    assert vote.decide() == ('3', 'medium', 3)
+    vote = OcrVote()
+    for text in ['3', '8', '5', '2', '6', '1']:
+        vote.add(text)
+    # nobody can be accepted with one more vote
+    assert vote.settled(1)
+    assert not vote.settled(2)
+    assert vote.decide() is None
+
+
+def test_order_configs():
+    configs = [{'psm': 6}, {'psm': 7}, {'psm': 10}]
+    samples = [(['', '4', '4'], '4'), (['1', '', '1'], '1'), (['', '', '9'], '9')]
+    assert order_configs(configs, samples) == [{'psm': 10}, {'psm': 6}, {'psm': 7}]
+    # ties keep the given order
+    assert order_configs(configs, []) == configs
@@ -50,3 +50,22 @@ def test_png_grid_extractor():
     assert actual == expected, "Output grids.txt does not match expected output. See diff and cell-by-cell comparison above."
     # Always run diff.py to update logs/diff.txt
     subprocess.run(['python3', 'src/diff.py'])
+
+def run_extractor(extra_args):
+    # Returns grids.txt and the log lines without timings
+    result = subprocess.run(['python3', 'src/png_grid_extractor.py', 'tests/png'] + extra_args, capture_output=True, text=True)
+    assert result.returncode == 0, f"Extractor failed: {result.stderr}"
+    with open('logs/grids.txt', 'r') as f:
+        grids = f.read()
+    with open('logs/png_grid_extractor.log', 'r') as f:
+        lines = [line.split(' ocr_timing=')[0] for line in f
+                 if line.startswith(('INFO Processing', 'INFO Cell (', 'ERROR')) and 'time:' not in line]
+    return grids, lines
+
+def test_png_grid_extractor_threads():
+    # Threaded recognition must give the same grids and cell log lines as the sequential run
+    assert run_extractor(['--threads', '4']) == run_extractor([])
+
+def test_png_grid_extractor_jobs():
+    # Worker processes must give the same grids and log lines, in the same order
+    assert run_extractor(['--jobs', '2']) == run_extractor([])
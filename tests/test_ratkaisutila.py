@@ -0,0 +1,64 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import pytest
+from ratkaisija import lue_ruudukko, data1, TYHJA
+from ratkaisutila import Ratkaisutila, NAAPURIT, numerot_maskista
+
+
+def test_naapurit():
+    assert all(len(naapurit) == 20 for naapurit in NAAPURIT)
+    # ruutu (0, 0): oma rivi, sarake ja osa
+    assert 1 in NAAPURIT[0] and 9 in NAAPURIT[0] and 10 in NAAPURIT[0]
+    assert 0 not in NAAPURIT[0]
+    assert 40 not in NAAPURIT[0]
+
+
+def test_ehdokkaat_vastaavat_laillisia_paikkoja():
+    ruudukko = lue_ruudukko(data1)
+    tila = Ratkaisutila(ruudukko)
+    assert tila.ruudukoksi() == [list(rivi) for rivi in ruudukko]
+    # ruudukko[0] on ensimmäinen sarake: 7 9 2 - - - - 8 -
+    assert 7 not in tila.ehdokkaat_ruudussa(3)
+    assert 4 not in tila.ehdokkaat_ruudussa(3)
+
+
+def test_ristiriitaiset_annetut():
+    ruudukko = [[TYHJA] * 9 for _ in range(9)]
+    ruudukko[0][0] = 5
+    ruudukko[0][8] = 5
+    with pytest.raises(ValueError):
+        Ratkaisutila(ruudukko)
+
+
+def test_palauta_peruu_muutokset():
+    tila = Ratkaisutila(lue_ruudukko(data1))
+    ruudut = tila.ruudut.copy()
+    ehdokkaat = tila.ehdokkaat.copy()
+    merkki = tila.tallenna()
+    vapaa = tila.vapaat()[0]
+    numero = tila.ehdokkaat_ruudussa(vapaa)[0]
+    assert tila.aseta(vapaa, numero)
+    assert tila.ruudut[vapaa] == numero
+    assert len(tila.polku) > 0
+    tila.palauta(merkki)
+    assert tila.ruudut == ruudut
+    assert tila.ehdokkaat == ehdokkaat
+    assert tila.polku == []
+
+
+def test_haara_ja_ristiriita():
+    tila = Ratkaisutila()
+    with tila.haara():
+        assert tila.aseta(0, 1)
+        assert not tila.laillinen(1, 1)
+        # sama numero samalle riville ei käy
+        assert not tila.aseta(1, 1)
+    assert tila.ruudut[0] == 0
+    assert tila.laillinen(1, 1)
+
+
+def test_numerot_maskista():
+    assert numerot_maskista(0b101000001) == [1, 7, 9]
+    assert numerot_maskista(0) == []
@@ -0,0 +1,81 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import numpy as np
+import pytest
+from recognizers import Stage, Cascade, load_cascade, RECOGNIZERS
+
+
+def ink_cell(marker):
+    img = np.full((64, 64), 255, dtype=np.uint8)
+    img[16:48, 28:36] = 0
+    img[0, 0] = marker
+    return img
+
+
+def fake_recognizer(answers, seen):
+    """Answers by the marker pixel of each cell, and records how many cells it got."""
+    def recognize(grays, templates=None, cache=None):
+        seen.append(len(grays))
+        return [answers[int(gray[0, 0])] for gray in grays]
+    return recognize
+
+
+def test_cheap_stage_first_residue_to_last(monkeypatch):
+    cheap_seen, last_seen = [], []
+    monkeypatch.setitem(RECOGNIZERS, 'mlp', fake_recognizer(
+        {1: ('1', 'high', 0), 2: ('7', 'low', 0), 3: ('3', 'medium', 0)}, cheap_seen))
+    monkeypatch.setitem(RECOGNIZERS, 'tesseract', fake_recognizer(
+        {2: ('2', 'medium', 3), 3: ('3', 'high', 5)}, last_seen))
+    cascade = Cascade([Stage('mlp'), Stage('tesseract')])
+    cells = [ink_cell(1), np.full((64, 64), 230, dtype=np.uint8), ink_cell(2), ink_cell(3)]
+    results = cascade.recognize(cells)
+    assert results == [('1', 'high', 0), ('-', 'none', 0), ('2', 'medium', 3), ('3', 'high', 5)]
+    assert cheap_seen == [3] and last_seen == [2]
+    assert [(stage.cells, stage.resolved) for stage in cascade.stages] == [(3, 1), (2, 2)]
+    assert cascade.summary()[0].startswith('mlp: 1 of 3 cells resolved in')
+
+
+def test_stage_counts_move_from_worker_to_parent():
+    worker = Cascade([Stage('mlp'), Stage('tesseract')])
+    worker.stages[0].cells, worker.stages[0].resolved, worker.stages[0].seconds = 10, 7, 0.5
+    worker.stages[1].cells, worker.stages[1].resolved = 3, 3
+    counts = worker.take_counts()
+    assert counts == [(10, 7, 0.5), (3, 3, 0.0)]
+    assert worker.take_counts() == [(0, 0, 0.0), (0, 0, 0.0)]
+    parent = Cascade([Stage('mlp'), Stage('tesseract')])
+    parent.add_counts(counts)
+    parent.add_counts(counts)
+    assert [(stage.cells, stage.resolved) for stage in parent.stages] == [(20, 14), (6, 6)]
+
+
+def test_min_reliability_and_template_results():
+    assert Stage('mlp', 'medium').accepts(('3', 'medium', 0))
+    assert not Stage('mlp').accepts(('3', 'medium', 0))
+    assert Stage('template').accepts(('3', 'template', 0))
+    assert not Stage('template').accepts(('-', 'none', 0))
+
+
+def test_unknown_recognizer_or_reliability():
+    with pytest.raises(ValueError):
+        Stage('ocr')
+    with pytest.raises(ValueError):
+        Stage('mlp', 'very high')
+    with pytest.raises(ValueError):
+        Cascade([])
+
+
+def test_load_cascade_from_yaml(tmp_path):
+    path = tmp_path / 'ocr_config.yaml'
+    path.write_text('tesseract_configs: []\n'
+                    'recognizer_cascade:\n'
+                    '  - recognizer: template\n'
+                    '  - recognizer: hog\n'
+                    '    min_reliability: medium\n'
+                    '  - recognizer: confidence\n')
+    cascade = load_cascade(str(path))
+    assert [(stage.name, stage.min_reliability) for stage in cascade.stages] == \
+        [('template', 'high'), ('hog', 'medium'), ('confidence', 'high')]
+    assert load_cascade(str(path)) is cascade
+    assert [stage.name for stage in load_cascade().stages] == ['mlp', 'tesseract']
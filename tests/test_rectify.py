@@ -0,0 +1,67 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+from rectify import find_grid_quad, rectify_grid, flatten_lighting, ordered_corners
+
+
+def drawn_grid(cell=50):
+    size = 9 * cell
+    img = np.full((size + 1, size + 1, 3), 255, dtype=np.uint8)
+    for i in range(10):
+        thickness = 5 if i % 3 == 0 else 1
+        cv2.line(img, (i * cell, 0), (i * cell, size), (0, 0, 0), thickness)
+        cv2.line(img, (0, i * cell), (size, i * cell), (0, 0, 0), thickness)
+    cv2.putText(img, '7', (112, 90), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3)
+    return img
+
+
+def photographed(img, corners, shape=(700, 800)):
+    """img warped so that its corners land on `corners` of a white photo."""
+    h, w = img.shape[:2]
+    src = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(src, np.asarray(corners, dtype=np.float32))
+    return cv2.warpPerspective(img, matrix, shape[::-1], borderValue=(255, 255, 255))
+
+
+CORNERS = [[130, 90], [640, 120], [610, 620], [100, 590]]
+
+
+def test_corners_of_skewed_grid():
+    quad = find_grid_quad(photographed(drawn_grid(), CORNERS))
+    assert np.abs(quad - np.array(CORNERS)).max() <= 4
+
+
+def test_rectified_grid_is_square_and_upright():
+    warped, matrix = rectify_grid(photographed(drawn_grid(), CORNERS))
+    side = warped.shape[0]
+    assert warped.shape == (side, side, 3) and side % 9 == 0
+    mapped = cv2.perspectiveTransform(np.array([CORNERS], dtype=np.float32), matrix)[0]
+    assert np.abs(mapped - [[0, 0], [side, 0], [side, side], [0, side]]).max() <= 6
+    # the digit is back in cell (1, 2), and an empty cell is plain white
+    cell = side // 9
+    assert warped[cell:2 * cell, 2 * cell:3 * cell].min() < 100
+    assert warped[5 * cell + 5:6 * cell - 5, 5 * cell + 5:6 * cell - 5].min() == 255
+
+
+def test_no_grid_keeps_image():
+    img = np.full((300, 300, 3), 255, dtype=np.uint8)
+    cv2.putText(img, '3', (140, 160), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+    rectified, matrix = rectify_grid(img)
+    assert matrix is None and rectified is img
+
+
+def test_flatten_lighting_whitens_shaded_paper():
+    gray = np.full((200, 300), 255, dtype=np.uint8)
+    cv2.putText(gray, '5', (130, 120), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 0, 3)
+    shaded = (gray * np.linspace(0.6, 1.0, 300)[None, :]).astype(np.uint8)
+    flat = flatten_lighting(shaded)
+    assert flat[:20].min() == 255 and flat[:, :20].min() == 255
+    assert flat[90:120, 130:160].min() < 100
+
+
+def test_ordered_corners():
+    points = [[10, 200], [200, 190], [5, 3], [190, 8]]
+    assert ordered_corners(points).tolist() == [[5, 3], [190, 8], [200, 190], [10, 200]]
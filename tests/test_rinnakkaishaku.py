@@ -0,0 +1,68 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import random
+import pytest
+from ratkaisija import TYHJA
+from ratkaisutila import Ratkaisutila, Rakenne
+from haku import Haku
+from rinnakkaishaku import jaa_osaongelmiin, ratkaise_rinnakkain
+from yksikot import tavallinen
+
+
+def malliratkaisu(osan_koko):
+    koko = osan_koko * osan_koko
+    return [[(osan_koko * (x % osan_koko) + x // osan_koko + y) % koko + 1 for y in range(koko)]
+            for x in range(koko)]
+
+
+def tyhjenna(ruudukko, osuus, siemen=1):
+    satunnainen = random.Random(siemen)
+    return [[TYHJA if satunnainen.random() < osuus else numero for numero in rivi] for rivi in ruudukko]
+
+
+def onko_oikea_ratkaisu(ruudukko, rakenne):
+    tila = Ratkaisutila(ruudukko, rakenne)
+    return tila.valmis()
+
+
+def test_rakenne_16x16():
+    rakenne = Rakenne(tavallinen(4))
+    assert rakenne.koko == 16
+    assert all(len(naapurit) == 3 * 16 - 2 * 4 - 1 for naapurit in rakenne.naapurit)
+    assert onko_oikea_ratkaisu(malliratkaisu(4), rakenne)
+
+
+def test_osaongelmat_kattavat_koko_puun():
+    ruudukko = tyhjenna(malliratkaisu(3), 0.7)
+    kaikki = Haku(enintaan=1000).hae(Ratkaisutila(ruudukko))
+    osat = jaa_osaongelmiin(Ratkaisutila(ruudukko), 2)
+    assert len(osat) > 1
+    osista = 0
+    for paatokset in osat:
+        tila = Ratkaisutila(ruudukko)
+        for ruutu, numero in paatokset:
+            assert tila.aseta(ruutu, numero)
+        osista += len(Haku(enintaan=1000).hae(tila))
+    assert osista == len(kaikki)
+
+
+def test_ratkaise_rinnakkain_16x16():
+    rakenne = Rakenne(tavallinen(4))
+    ruudukko = tyhjenna(malliratkaisu(4), 0.6)
+    ratkaisut = ratkaise_rinnakkain(ruudukko, enintaan=1, prosessit=2, rakenne=rakenne)
+    assert len(ratkaisut) == 1
+    ratkaisu = ratkaisut[0]
+    assert onko_oikea_ratkaisu(ratkaisu, rakenne)
+    for x in range(16):
+        for y in range(16):
+            if ruudukko[x][y] != TYHJA:
+                assert ratkaisu[x][y] == ruudukko[x][y]
+
+
+def test_ratkaise_rinnakkain_yksikasitteisyys():
+    ruudukko = tyhjenna(malliratkaisu(3), 0.8)
+    ratkaisut = ratkaise_rinnakkain(ruudukko, enintaan=2, prosessit=2)
+    assert len(ratkaisut) == 2
+    assert ratkaisut[0] != ratkaisut[1]
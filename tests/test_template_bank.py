@@ -0,0 +1,74 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import cv2
+import numpy as np
+from glob import glob
+import pytest
+from cell_extract import TemplateBank, template_match_cell, preprocess_cell
+
+TEMPLATE_DIR = 'data'
+
+
+def load_templates():
+    templates = {}
+    for path in sorted(glob(os.path.join(TEMPLATE_DIR, '*.png'))):
+        digit = os.path.splitext(os.path.basename(path))[0]
+        tmpl_img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        tmpl_img = cv2.resize(tmpl_img, (64, 64), interpolation=cv2.INTER_LINEAR)
+        _, tmpl_bin = cv2.threshold(tmpl_img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        templates[digit] = tmpl_bin
+    return templates
+
+
+def grid_cells(path):
+    img = cv2.imread(path)
+    h, w = img.shape[:2]
+    ch, cw = h // 9, w // 9
+    px, py = int(cw * 0.2), int(ch * 0.2)
+    return [preprocess_cell(img[r*ch+py:(r+1)*ch-py, c*cw+px:(c+1)*cw-px]) for r in range(9) for c in range(9)]
+
+
+def loop_match(cell_img, templates):
+    # the matchTemplate loop the bank replaces
+    best_digit, best_score = None, -1
+    for digit, tmpl in templates.items():
+        score = cv2.matchTemplate(cell_img, tmpl, cv2.TM_CCOEFF_NORMED).max()
+        if score > best_score:
+            best_score, best_digit = score, digit
+    return (best_digit, True) if best_score > 0.4 else (None, False)
+
+
+def test_bank_scores_equal_match_template():
+    templates = load_templates()
+    bank = TemplateBank(templates)
+    cells = [cell for cell in grid_cells('tests/png/grid1.png') if np.any(cell == 0)]
+    scores = bank.scores(cells)
+    assert scores.shape == (len(cells), len(templates))
+    for i, cell in enumerate(cells):
+        for k, digit in enumerate(bank.digits):
+            expected = cv2.matchTemplate(cell, templates[digit], cv2.TM_CCOEFF_NORMED).max()
+            assert scores[i, k] == pytest.approx(expected, abs=1e-5)
+
+
+def test_template_match_cell_as_before():
+    templates = load_templates()
+    rng = np.random.default_rng(3)
+    cells = grid_cells('tests/png/grid2.png')
+    # cells that match above the threshold
+    cells += [255 - templates[d] for d in '123'] + [templates['7']]
+    cells += [rng.integers(0, 256, (64, 64), dtype=np.uint8)]
+    bank = TemplateBank(templates)
+    for cell in cells:
+        assert template_match_cell(cell, templates) == loop_match(cell, templates)
+        assert template_match_cell(cell, bank) == loop_match(cell, templates)
+
+
+def test_match_first():
+    templates = load_templates()
+    bank = TemplateBank(templates)
+    # a preprocessed cell has a dark digit on white, the templates the opposite
+    cells = [255 - templates['4'], 255 - templates['9'], np.full((64, 64), 255, dtype=np.uint8)]
+    assert bank.match_first(cells) == ['4', '9', None]
+    assert TemplateBank({}).match_first(cells) == [None, None, None]
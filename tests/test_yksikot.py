@@ -0,0 +1,79 @@
+from dotenv import load_dotenv
+load_dotenv()
+import sys, os
+sys.path.insert(0, os.getenv('PYTHONPATH', 'src'))
+import pytest
+from ratkaisija import TYHJA, lue_ruudukko
+from ratkaisutila import Rakenne, Ratkaisutila, VAKIO
+from haku import ratkaise
+from yksikot import tavallinen, x_sudoku, windoku, palapeli, lue_alueet, lavistajat, ikkunat
+
+# epäsäännölliset alueet, joissa jokaisessa on yhdeksän ruutua
+PALAPELI = """
+1 1 2 2 2 2 3 3 3
+1 1 1 2 2 2 2 3 3
+1 1 1 4 2 5 3 3 3
+4 1 4 4 5 5 5 6 3
+4 4 4 5 5 5 6 6 6
+4 7 4 5 5 6 6 6 6
+7 7 7 8 8 8 9 9 6
+7 7 7 8 8 8 9 9 9
+7 7 8 8 8 9 9 9 9
+"""
+
+# edellisen palapelin ratkaisu, josta on poistettu numeroita
+PALAPELI_RUUDUKKO = """
+1 - 2 - 7 - 3 - 5
+- 8 - 5 - 3 - 7 -
+3 - 7 - 4 - 1 - 8
+- 5 - 1 - 7 - 3 -
+5 - 9 - 2 - 4 - 6
+- 1 - 4 - 9 - 5 -
+7 - 5 - 3 - 8 - 1
+- 3 - 7 - 2 - 1 -
+9 - 1 - 5 - 7 - 3
+"""
+
+
+def tyhja():
+    return [[TYHJA] * 9 for _ in range(9)]
+
+
+def erit(ratkaisu, yksikot):
+    return all(len({ratkaisu[x][y] for x, y in yksikko}) == len(yksikko) for yksikko in yksikot)
+
+
+def test_tavallinen_vastaa_vakiota():
+    assert Rakenne(tavallinen()).naapurit == VAKIO.naapurit
+    assert len(VAKIO.yksikot) == 27
+
+
+def test_vaaran_kokoinen_yksikko():
+    with pytest.raises(ValueError):
+        Rakenne(tavallinen() + [[(0, 0), (0, 1)]])
+
+
+def test_x_sudoku():
+    rakenne = Rakenne(x_sudoku())
+    # keskiruudulla on kummankin lävistäjän ruudut naapureina
+    # (osan ruudut lävistäjillä ovat jo naapureita)
+    assert len(rakenne.naapurit[40]) == 20 + 16 - 4
+    ratkaisu = ratkaise(tyhja(), rakenne=rakenne)[0]
+    assert erit(ratkaisu, lavistajat(9))
+
+
+def test_windoku():
+    ratkaisu = ratkaise(tyhja(), rakenne=Rakenne(windoku()))[0]
+    assert len(ikkunat(3)) == 4
+    assert erit(ratkaisu, ikkunat(3))
+    assert erit(ratkaisu, tavallinen())
+
+
+def test_palapeli():
+    kartta = lue_alueet(PALAPELI)
+    yksikot = palapeli(kartta)
+    rakenne = Rakenne(yksikot)
+    ruudukko = lue_ruudukko(PALAPELI_RUUDUKKO)
+    ratkaisu = ratkaise(ruudukko, rakenne=rakenne)[0]
+    assert erit(ratkaisu, yksikot)
+    assert Ratkaisutila(ratkaisu, rakenne).valmis()